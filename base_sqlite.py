@@ -0,0 +1,612 @@
+"""
+Base SQLite locale, interchangeable avec le client Supabase
+Assur Defender - Cotation Santé +
+
+Les gestionnaires (DatabaseManager, SupabaseManager) ne dépendent que d'une
+petite partie du client Supabase : client.table(nom) avec select / insert /
+update / delete, les filtres eq, neq, gt, gte, lt, lte, ilike, in_, or_,
+contains, order, limit, range, puis execute() qui retourne une réponse portant
+`.data` ; et client.rpc(fonction).execute(). ClientSQLite implémente cette
+interface sur un fichier SQLite : l'application, les bancs de mesure et
+les tests de charge tournent hors ligne, sans projet Supabase.
+
+Choix du backend (supabase_config.creer_client) :
+
+    AKORA_BACKEND_BASE=sqlite  AKORA_SQLITE_CHEMIN=/tmp/akora.sqlite3
+
+(à combiner avec AKORA_STOCKAGE_DOCUMENTS=local pour les PDF).
+
+Le schéma (SCHEMA_SQLITE) reprend les tables devis, assures,
+cotations_excel, cotations, polices, clients et sinistres avec les index
+des filtres et tris des listes : numero_devis, (date_creation, id) pour
+la pagination par curseur, et statut / type_marche suivis de
+(date_creation, id) pour qu'une liste filtrée soit lue dans l'ordre de
+l'index, sans tri. Il est créé à la première connexion.
+
+Les colonnes JSON (donnees_json.COLONNES_JSON) sont stockées en texte JSON
+et relues décodées, comme jsonb ; les projections 'details->facteurs' et la
+contenance .contains('details', {...}) passent par les fonctions JSON de
+SQLite (un index d'expression sert details.bareme_special).
+
+Une connexion par thread (les lectures d'un rerun sont concurrentes, voir
+chargement.py), en mode WAL : les lectures ne bloquent pas les écritures.
+La fonction statistiques_portefeuille est servie par statistiques_sqlite.
+"""
+
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from contextlib import nullcontext
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from donnees_json import COLONNES_JSON, lire_json, texte_json_requete
+from statistiques import FONCTION_STATISTIQUES, statistiques_sqlite
+
+
+CHEMIN_SQLITE = os.environ.get(
+    "AKORA_SQLITE_CHEMIN",
+    os.path.join(tempfile.gettempdir(), "akora.sqlite3")
+)
+DELAI_VERROU_SQLITE = float(os.environ.get("AKORA_SQLITE_DELAI_VERROU_S", 5))
+
+MEMOIRE = ":memory:"
+
+SCHEMA_SQLITE = """
+create table if not exists devis (
+    id integer primary key autoincrement,
+    numero_devis text,
+    type_marche text,
+    produit text,
+    nom_client text,
+    entreprise text,
+    secteur text,
+    type_couverture text,
+    nb_adultes integer,
+    nb_enfants integer,
+    nb_enfants_supplementaires integer,
+    prime_nette real,
+    accessoires real,
+    services real,
+    taxe real,
+    prime_ttc real,
+    prime_finale real,
+    reduction_commerciale real,
+    surprime_medicale real,
+    surprime_age real,
+    duree_contrat integer,
+    statut text,
+    validateur text,
+    motif_reduction text,
+    details text,
+    pdf_data text,
+    created_by text,
+    date_creation text,
+    date_modification text
+);
+create index if not exists devis_numero_devis_idx on devis (numero_devis);
+create index if not exists devis_statut_idx on devis (statut, date_creation desc, id desc);
+create index if not exists devis_type_marche_idx on devis (type_marche, date_creation desc, id desc);
+create index if not exists devis_date_creation_id_idx on devis (date_creation desc, id desc);
+create index if not exists devis_bareme_special_idx on devis (json_extract(details, '$.bareme_special'));
+
+create table if not exists assures (
+    id integer primary key autoincrement,
+    numero_devis text,
+    type_assure text,
+    nom text,
+    prenom text,
+    date_naissance text,
+    lieu_naissance text,
+    contact text,
+    numero_cnam text,
+    nationalite text,
+    etat_civil text,
+    emploi_actuel text,
+    taille real,
+    poids real,
+    imc real,
+    tension_arterielle text,
+    affections text,
+    grossesse integer,
+    sexe text,
+    details text,
+    date_creation text
+);
+create index if not exists assures_numero_devis_idx on assures (numero_devis);
+
+create table if not exists cotations_excel (
+    id integer primary key autoincrement,
+    numero_devis text,
+    entreprise text,
+    produit text,
+    nb_total_lignes integer,
+    nb_eligibles integer,
+    nb_exclus integer,
+    nb_erreurs integer,
+    prime_nette_totale real,
+    prime_ttc_totale real,
+    prime_finale real,
+    reduction_commerciale real,
+    duree_contrat integer,
+    statut text,
+    resultats_detailles text,
+    date_creation text
+);
+create index if not exists cotations_excel_numero_devis_idx on cotations_excel (numero_devis);
+create index if not exists cotations_excel_statut_idx on cotations_excel (statut);
+create index if not exists cotations_excel_date_creation_idx on cotations_excel (date_creation desc);
+
+create table if not exists cotations (
+    id integer primary key autoincrement,
+    reference text,
+    type_client text,
+    prospect text,
+    apporteur text,
+    produit text,
+    type_couverture text,
+    prime_nette real,
+    prime_ttc real,
+    accessoires real,
+    taxe real,
+    reduction_commerciale real,
+    duree_contrat integer,
+    statut text,
+    details text,
+    date_creation text,
+    date_modification text
+);
+create index if not exists cotations_reference_idx on cotations (reference);
+create index if not exists cotations_statut_idx on cotations (statut, date_creation desc, id desc);
+create index if not exists cotations_date_creation_id_idx on cotations (date_creation desc, id desc);
+
+create table if not exists polices (
+    id integer primary key autoincrement,
+    numero_police text,
+    cotation_id integer,
+    assure_principal text,
+    type_police text,
+    produit text,
+    date_effet text,
+    date_echeance text,
+    prime_annuelle real,
+    statut text,
+    beneficiaires text,
+    documents text,
+    date_creation text,
+    date_modification text
+);
+create index if not exists polices_numero_police_idx on polices (numero_police);
+create index if not exists polices_statut_idx on polices (statut, date_creation desc, id desc);
+create index if not exists polices_date_creation_id_idx on polices (date_creation desc, id desc);
+
+create table if not exists clients (
+    id integer primary key autoincrement,
+    nom text,
+    type_client text,
+    email text,
+    telephone text,
+    adresse text,
+    ville text,
+    pays text,
+    informations_supplementaires text,
+    date_creation text,
+    date_modification text
+);
+create index if not exists clients_date_creation_idx on clients (date_creation desc);
+
+create table if not exists sinistres (
+    id integer primary key autoincrement,
+    numero_sinistre text,
+    police_id integer,
+    date_sinistre text,
+    type_sinistre text,
+    description text,
+    montant_declare real,
+    montant_indemnise real,
+    statut text,
+    documents text,
+    date_creation text,
+    date_modification text
+);
+create index if not exists sinistres_police_id_date_idx on sinistres (police_id, date_sinistre desc);
+create index if not exists sinistres_statut_idx on sinistres (statut);
+"""
+
+# SQLite n'a pas de booléen : ces colonnes sont relues en True / False
+COLONNES_BOOLEENNES = {'assures': ('grossesse',)}
+
+# Fonctions appelables par client.rpc(nom)
+FONCTIONS_SQLITE: Dict[str, Callable[[sqlite3.Connection], Any]] = {
+    FONCTION_STATISTIQUES: statistiques_sqlite,
+}
+
+OPERATEURS = {'eq': '=', 'neq': '<>', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+_IDENTIFIANT = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+# Colonne PostgREST avec alias et chemin JSON éventuels : 'alias:colonne->cle->>sous_cle'
+_COLONNE_POSTGREST = re.compile(r"^(?:([A-Za-z_]\w*):)?([A-Za-z_]\w*)((?:->>?[A-Za-z_]\w*)*)$")
+
+
+# ==================== TRADUCTION DES FILTRES ====================
+
+def _colonne(nom: str) -> str:
+    """Nom de colonne vérifié et cité (les noms viennent du code, jamais de l'utilisateur)."""
+    nom = nom.strip()
+    if not _IDENTIFIANT.match(nom):
+        raise ValueError(f"Nom de colonne invalide : {nom!r}")
+    return f'"{nom}"'
+
+
+def _expression_colonne(nom: str) -> Tuple[str, str, bool]:
+    """
+    Expression SQL d'une colonne PostgREST, nom du résultat, et s'il s'agit
+    d'un JSON à décoder : 'details->facteurs' devient details -> '$.facteurs'.
+    """
+    correspondance = _COLONNE_POSTGREST.match(nom.strip())
+    if correspondance is None:
+        raise ValueError(f"Nom de colonne invalide : {nom!r}")
+    alias, colonne, chemin = correspondance.groups()
+    if not chemin:
+        return f'"{colonne}"', alias or colonne, False
+    etapes = re.findall(r"(->>?)([A-Za-z_]\w*)", chemin)
+    operateur = etapes[-1][0]
+    sql = f"\"{colonne}\" {operateur} '$.{'.'.join(cle for _, cle in etapes)}'"
+    return sql, alias or etapes[-1][1], operateur == '->'
+
+
+def _valeur(valeur: Any) -> Any:
+    """Valeur Python convertie en valeur SQLite (dates ISO, JSON en texte)."""
+    if isinstance(valeur, bool):
+        return int(valeur)
+    if isinstance(valeur, (date, datetime)):
+        return valeur.isoformat()
+    if isinstance(valeur, Decimal):
+        return float(valeur)
+    if isinstance(valeur, (dict, list)):
+        return texte_json_requete(valeur)
+    return valeur
+
+
+def _condition(colonne: str, operateur: str, valeur: Any) -> Tuple[str, List[Any]]:
+    """Condition SQL d'un filtre PostgREST (colonne, opérateur, valeur)."""
+    colonne = _expression_colonne(colonne)[0]
+    if operateur in OPERATEURS:
+        return f"{colonne} {OPERATEURS[operateur]} ?", [_valeur(valeur)]
+    if operateur == 'ilike':
+        # LIKE de SQLite ignore la casse (ASCII) ; '*' est le joker des URL PostgREST
+        return f"{colonne} LIKE ?", [str(valeur).replace('*', '%')]
+    if operateur == 'in':
+        valeurs = list(valeur)
+        if not valeurs:
+            return "0", []
+        return f"{colonne} IN ({', '.join('?' * len(valeurs))})", [_valeur(v) for v in valeurs]
+    if operateur == 'cs':
+        # Contenance JSON (@>) : chaque clé de premier niveau doit avoir la valeur donnée
+        if not isinstance(valeur, dict):
+            raise ValueError("Contenance prise en charge pour un objet JSON uniquement")
+        conditions, parametres = [], []
+        for cle, attendu in valeur.items():
+            if not _IDENTIFIANT.match(cle):
+                raise ValueError(f"Clé JSON invalide : {cle!r}")
+            extrait = f"json_extract({colonne}, '$.{cle}')"
+            if attendu is None:
+                conditions.append(f"json_type({colonne}, '$.{cle}') = 'null'")
+            elif isinstance(attendu, (dict, list)):
+                conditions.append(f"{extrait} = json(?)")
+                parametres.append(texte_json_requete(attendu))
+            else:
+                conditions.append(f"{extrait} = ?")
+                parametres.append(_valeur(attendu))
+        return " AND ".join(conditions) or "1", parametres
+    if operateur == 'is':
+        texte = str(valeur).lower()
+        if texte in ('null', 'none'):
+            return f"{colonne} IS NULL", []
+        return f"{colonne} = ?", [1 if texte == 'true' else 0]
+    raise ValueError(f"Opérateur de filtre non pris en charge : {operateur}")
+
+
+def _decouper(liste: str) -> List[str]:
+    """Éléments d'une liste PostgREST séparés par des virgules hors parenthèses et guillemets."""
+    elements, courant, profondeur, entre_guillemets = [], [], 0, False
+    for caractere in liste:
+        if caractere == '"':
+            entre_guillemets = not entre_guillemets
+        elif not entre_guillemets:
+            if caractere == '(':
+                profondeur += 1
+            elif caractere == ')':
+                profondeur -= 1
+            elif caractere == ',' and profondeur == 0:
+                elements.append(''.join(courant))
+                courant = []
+                continue
+        courant.append(caractere)
+    elements.append(''.join(courant))
+    return [element.strip() for element in elements if element.strip()]
+
+
+def _expression(expression: str) -> Tuple[str, List[Any]]:
+    """Condition SQL d'une expression PostgREST : 'col.op.valeur', 'and(...)' ou 'or(...)'."""
+    for logique in ('and', 'or'):
+        if expression.startswith(logique + '(') and expression.endswith(')'):
+            return _combiner(logique, expression[len(logique) + 1:-1])
+    colonne, operateur, valeur = expression.split('.', 2)
+    if operateur == 'in':
+        return _condition(colonne, 'in', [v.strip('"') for v in _decouper(valeur.strip('()'))])
+    if len(valeur) >= 2 and valeur.startswith('"') and valeur.endswith('"'):
+        valeur = valeur[1:-1]
+    return _condition(colonne, operateur, valeur)
+
+
+def _combiner(logique: str, liste: str) -> Tuple[str, List[Any]]:
+    conditions = [_expression(element) for element in _decouper(liste)]
+    sql = f" {logique.upper()} ".join(f"({condition})" for condition, _ in conditions)
+    return sql, [parametre for _, parametres in conditions for parametre in parametres]
+
+
+# ==================== REQUÊTES ====================
+
+class ReponseSQLite:
+    """Réponse d'une requête, de même forme que celle du client Supabase."""
+
+    def __init__(self, data: Any, count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+class RequeteSQLite:
+    """Requête construite comme avec le client Supabase, exécutée par execute()."""
+
+    def __init__(self, client: "ClientSQLite", table: str):
+        self.client = client
+        self.table = table
+        self._operation = 'select'
+        self._colonnes = '*'
+        self._sorties_json: List[str] = []
+        self._compter = False
+        self._valeurs: Any = None
+        self._representation = True
+        self._conditions: List[Tuple[str, List[Any]]] = []
+        self._tris: List[str] = []
+        self._limite: Optional[int] = None
+        self._decalage: Optional[int] = None
+
+    # --- Opérations ---
+
+    def select(self, *colonnes: str, count: Optional[str] = None) -> "RequeteSQLite":
+        noms = [nom.strip() for liste in (colonnes or ('*',)) for nom in liste.split(',') if nom.strip()]
+        if noms == ['*']:
+            self._colonnes = '*'
+            return self
+        selection = []
+        for nom in noms:
+            sql, sortie, est_json = _expression_colonne(nom)
+            selection.append(f'{sql} AS "{sortie}"' if sql != f'"{sortie}"' else sql)
+            if est_json:
+                self._sorties_json.append(sortie)
+        self._colonnes = ", ".join(selection)
+        self._compter = count is not None
+        return self
+
+    def insert(self, lignes, count: Optional[str] = None, returning=None, **options) -> "RequeteSQLite":
+        self._operation = 'insert'
+        self._valeurs = lignes if isinstance(lignes, list) else [lignes]
+        self._representation = returning is None or str(getattr(returning, 'value', returning)) != 'minimal'
+        return self
+
+    def update(self, valeurs: Dict[str, Any], count: Optional[str] = None, **options) -> "RequeteSQLite":
+        self._operation = 'update'
+        self._valeurs = valeurs
+        return self
+
+    def delete(self, count: Optional[str] = None, **options) -> "RequeteSQLite":
+        self._operation = 'delete'
+        return self
+
+    # --- Filtres ---
+
+    def _filtrer(self, colonne: str, operateur: str, valeur: Any) -> "RequeteSQLite":
+        self._conditions.append(_condition(colonne, operateur, valeur))
+        return self
+
+    def eq(self, colonne: str, valeur: Any) -> "RequeteSQLite":
+        return self._filtrer(colonne, 'eq', valeur)
+
+    def neq(self, colonne: str, valeur: Any) -> "RequeteSQLite":
+        return self._filtrer(colonne, 'neq', valeur)
+
+    def gt(self, colonne: str, valeur: Any) -> "RequeteSQLite":
+        return self._filtrer(colonne, 'gt', valeur)
+
+    def gte(self, colonne: str, valeur: Any) -> "RequeteSQLite":
+        return self._filtrer(colonne, 'gte', valeur)
+
+    def lt(self, colonne: str, valeur: Any) -> "RequeteSQLite":
+        return self._filtrer(colonne, 'lt', valeur)
+
+    def lte(self, colonne: str, valeur: Any) -> "RequeteSQLite":
+        return self._filtrer(colonne, 'lte', valeur)
+
+    def ilike(self, colonne: str, motif: str) -> "RequeteSQLite":
+        return self._filtrer(colonne, 'ilike', motif)
+
+    def in_(self, colonne: str, valeurs) -> "RequeteSQLite":
+        return self._filtrer(colonne, 'in', valeurs)
+
+    def contains(self, colonne: str, valeur: Dict[str, Any]) -> "RequeteSQLite":
+        return self._filtrer(colonne, 'cs', valeur)
+
+    def is_(self, colonne: str, valeur: Any) -> "RequeteSQLite":
+        return self._filtrer(colonne, 'is', valeur)
+
+    def or_(self, filtres: str, reference_table: Optional[str] = None) -> "RequeteSQLite":
+        """Disjonction au format PostgREST (ex: 'nom.ilike.%x%,and(a.eq.1,b.lt.2)')."""
+        self._conditions.append(_combiner('or', filtres))
+        return self
+
+    # --- Tri et limites ---
+
+    def order(self, colonne: str, desc: bool = False, nullsfirst: Optional[bool] = None, **options) -> "RequeteSQLite":
+        tri = f"{_colonne(colonne)} {'DESC' if desc else 'ASC'}"
+        if nullsfirst is not None:
+            tri += " NULLS FIRST" if nullsfirst else " NULLS LAST"
+        self._tris.append(tri)
+        return self
+
+    def limit(self, taille: int, **options) -> "RequeteSQLite":
+        self._limite = int(taille)
+        return self
+
+    def range(self, debut: int, fin: int, **options) -> "RequeteSQLite":
+        self._decalage = int(debut)
+        self._limite = int(fin) - int(debut) + 1
+        return self
+
+    # --- Exécution ---
+
+    def _where(self) -> Tuple[str, List[Any]]:
+        if not self._conditions:
+            return "", []
+        sql = " WHERE " + " AND ".join(f"({condition})" for condition, _ in self._conditions)
+        return sql, [parametre for _, parametres in self._conditions for parametre in parametres]
+
+    def execute(self) -> ReponseSQLite:
+        table = _colonne(self.table)
+        where, parametres = self._where()
+        with self.client.connexion() as connexion:
+            if self._operation == 'select':
+                sql = f"SELECT {self._colonnes} FROM {table}{where}"
+                if self._tris:
+                    sql += " ORDER BY " + ", ".join(self._tris)
+                if self._limite is not None or self._decalage is not None:
+                    sql += f" LIMIT {self._limite if self._limite is not None else -1} OFFSET {self._decalage or 0}"
+                lignes = connexion.execute(sql, parametres).fetchall()
+                nombre = None
+                if self._compter:
+                    nombre = connexion.execute(f"SELECT count(*) FROM {table}{where}", parametres).fetchone()[0]
+                return ReponseSQLite(self.client.lignes(self.table, lignes, self._sorties_json), nombre)
+
+            with connexion:
+                if self._operation == 'insert':
+                    lignes = self._inserer(connexion, table)
+                elif self._operation == 'update':
+                    if not self._valeurs:
+                        return ReponseSQLite([])
+                    affectations = ", ".join(f"{_colonne(nom)} = ?" for nom in self._valeurs)
+                    lignes = connexion.execute(
+                        f"UPDATE {table} SET {affectations}{where} RETURNING *",
+                        [_valeur(v) for v in self._valeurs.values()] + parametres
+                    ).fetchall()
+                else:
+                    lignes = connexion.execute(f"DELETE FROM {table}{where} RETURNING *", parametres).fetchall()
+            return ReponseSQLite(self.client.lignes(self.table, lignes))
+
+    def _inserer(self, connexion: sqlite3.Connection, table: str) -> List[sqlite3.Row]:
+        lignes: List[sqlite3.Row] = []
+        # Lignes de mêmes colonnes insérées par un seul executemany quand rien n'est retourné
+        groupes: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for ligne in self._valeurs:
+            groupes.setdefault(tuple(ligne), []).append(ligne)
+        for noms, groupe in groupes.items():
+            sql = (
+                f"INSERT INTO {table} ({', '.join(_colonne(nom) for nom in noms)}) "
+                f"VALUES ({', '.join('?' * len(noms))})"
+            )
+            if self._representation:
+                for ligne in groupe:
+                    lignes.extend(connexion.execute(sql + " RETURNING *", [_valeur(v) for v in ligne.values()]).fetchall())
+            else:
+                connexion.executemany(sql, ([_valeur(v) for v in ligne.values()] for ligne in groupe))
+        return lignes
+
+
+class AppelFonctionSQLite:
+    """Appel d'une fonction (client.rpc), servie par FONCTIONS_SQLITE."""
+
+    def __init__(self, client: "ClientSQLite", fonction: str):
+        if fonction not in FONCTIONS_SQLITE:
+            raise ValueError(f"Fonction inconnue de la base SQLite : {fonction}")
+        self.client = client
+        self.fonction = fonction
+
+    def execute(self) -> ReponseSQLite:
+        with self.client.connexion() as connexion:
+            return ReponseSQLite(FONCTIONS_SQLITE[self.fonction](connexion))
+
+
+# ==================== CLIENT ====================
+
+class ClientSQLite:
+    """Client de base sur un fichier SQLite, à la place du client Supabase."""
+
+    nom = 'sqlite'
+
+    def __init__(self, chemin: str = CHEMIN_SQLITE):
+        self.chemin = chemin
+        self._local = threading.local()
+        # Base en mémoire : une seule connexion, partagée sous verrou
+        self._partagee: Optional[sqlite3.Connection] = None
+        self._verrou = threading.RLock() if chemin == MEMOIRE else None
+
+    def _ouvrir(self) -> sqlite3.Connection:
+        connexion = sqlite3.connect(
+            self.chemin, timeout=DELAI_VERROU_SQLITE, check_same_thread=self._verrou is None
+        )
+        connexion.row_factory = sqlite3.Row
+        if self.chemin != MEMOIRE:
+            connexion.execute("PRAGMA journal_mode=WAL")
+            connexion.execute("PRAGMA synchronous=NORMAL")
+        connexion.executescript(SCHEMA_SQLITE)
+        return connexion
+
+    def connexion(self):
+        """Contexte donnant la connexion du thread courant (ou la connexion partagée, sous verrou)."""
+        if self._verrou is not None:
+            if self._partagee is None:
+                self._partagee = self._ouvrir()
+            return _AvecVerrou(self._partagee, self._verrou)
+        connexion = getattr(self._local, 'connexion', None)
+        if connexion is None:
+            connexion = self._local.connexion = self._ouvrir()
+        return nullcontext(connexion)
+
+    def lignes(self, table: str, lignes: List[sqlite3.Row], sorties_json: Tuple[str, ...] = ()) -> List[Dict[str, Any]]:
+        """Lignes SQLite converties en dictionnaires (booléens restaurés, JSON décodé comme jsonb)."""
+        resultat = [dict(ligne) for ligne in lignes]
+        for colonne in COLONNES_BOOLEENNES.get(table, ()):
+            for ligne in resultat:
+                if ligne.get(colonne) is not None:
+                    ligne[colonne] = bool(ligne[colonne])
+        for colonne in (*COLONNES_JSON.get(table, ()), *sorties_json):
+            for ligne in resultat:
+                if isinstance(ligne.get(colonne), str):
+                    ligne[colonne] = lire_json(ligne[colonne])
+        return resultat
+
+    def table(self, nom: str) -> RequeteSQLite:
+        return RequeteSQLite(self, nom)
+
+    def from_(self, nom: str) -> RequeteSQLite:
+        return self.table(nom)
+
+    def rpc(self, fonction: str, params: Optional[Dict[str, Any]] = None, **options) -> AppelFonctionSQLite:
+        return AppelFonctionSQLite(self, fonction)
+
+
+class _AvecVerrou:
+    def __init__(self, connexion: sqlite3.Connection, verrou):
+        self.connexion = connexion
+        self.verrou = verrou
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.verrou.acquire()
+        return self.connexion
+
+    def __exit__(self, *exc):
+        self.verrou.release()
+        return False
@@ -0,0 +1,162 @@
+"""
+Banc de mesure de l'enregistrement en masse des assurés
+Assur Defender - Cotation Santé +
+
+Compare, pour un recensement corporate synthétique (principal, conjoint,
+enfants), l'insertion assuré par assuré (sauvegarder_assure) et
+l'insertion par lots (sauvegarder_assures_bulk) pour plusieurs tailles de
+lot et niveaux de parallélisme.
+
+Fonctionne hors ligne : les requêtes vont vers une base locale qui simule
+le coût d'un aller-retour PostgREST (latence fixe par requête + coût par
+ligne) et peut faire échouer une partie des lots pour vérifier le rapport
+d'échecs partiels.
+
+Usage :
+    python bench_assures.py
+    python bench_assures.py --membres 8000 --latence-ms 40 --taux-echec 0.05
+"""
+
+import argparse
+import random
+import threading
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+
+# ==================== BASE LOCALE ====================
+
+class _RequeteInsertion:
+    def __init__(self, base: "BaseLocale", table: str, lignes: List[Dict[str, Any]]):
+        self.base = base
+        self.table = table
+        self.lignes = lignes
+
+    def execute(self):
+        return self.base.inserer(self.table, self.lignes)
+
+
+class _Table:
+    def __init__(self, base: "BaseLocale", nom: str):
+        self.base = base
+        self.nom = nom
+
+    def insert(self, lignes, **options):
+        return _RequeteInsertion(self.base, self.nom, lignes if isinstance(lignes, list) else [lignes])
+
+
+class BaseLocale:
+    """
+    Remplaçant local du client Supabase pour les insertions : chaque requête
+    coûte `latence` secondes plus `cout_ligne` par ligne, et échoue avec la
+    probabilité `taux_echec`.
+    """
+
+    def __init__(self, latence: float, cout_ligne: float, taux_echec: float = 0.0, graine: int = 0):
+        self.latence = latence
+        self.cout_ligne = cout_ligne
+        self.taux_echec = taux_echec
+        self._hasard = random.Random(graine)
+        self._verrou = threading.Lock()
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self.nb_requetes = 0
+
+    def table(self, nom: str) -> _Table:
+        return _Table(self, nom)
+
+    def inserer(self, table: str, lignes: List[Dict[str, Any]]):
+        with self._verrou:
+            self.nb_requetes += 1
+            echec = self._hasard.random() < self.taux_echec
+        time.sleep(self.latence + self.cout_ligne * len(lignes))
+        if echec:
+            raise RuntimeError("503 Service Unavailable (simulé)")
+        with self._verrou:
+            self.tables.setdefault(table, []).extend(lignes)
+        return type("Reponse", (), {"data": lignes})()
+
+
+# ==================== DONNÉES DE TEST ====================
+
+def recensement(nb_membres: int, graine: int = 0) -> List[Dict[str, Any]]:
+    """Recensement corporate : familles d'un principal, d'un conjoint éventuel et d'enfants."""
+    hasard = random.Random(graine)
+    membres: List[Dict[str, Any]] = []
+    famille = 0
+    while len(membres) < nb_membres:
+        famille += 1
+        composition = ['Principal'] + (['Conjoint'] if hasard.random() < 0.6 else []) + ['Enfant'] * hasard.randint(0, 4)
+        for type_assure in composition:
+            age = hasard.randint(25, 60) if type_assure != 'Enfant' else hasard.randint(0, 20)
+            membres.append({
+                'numero_devis': 'CORP-BENCH-0001',
+                'type_assure': type_assure,
+                'nom': f"FAMILLE{famille:05d}",
+                'prenom': f"{type_assure} {len(membres)}",
+                'date_naissance': date(2025 - age, hasard.randint(1, 12), hasard.randint(1, 28)),
+                'sexe': hasard.choice(['M', 'F']),
+                'affections': [],
+                'details': {'matricule': f"MAT{famille:05d}"},
+            })
+    return membres[:nb_membres]
+
+
+# ==================== MESURE ====================
+
+def mesurer_unitaire(membres: List[Dict[str, Any]], base: BaseLocale) -> Dict[str, Any]:
+    """Une requête par assuré, comme sauvegarder_assure."""
+    from database import DatabaseManager
+
+    gestionnaire = DatabaseManager(client=base)
+    debut = time.perf_counter()
+    nb_inseres = sum(1 for m in membres if gestionnaire.sauvegarder_assure(m) is not None)
+    duree = time.perf_counter() - debut
+    return {'nb_inseres': nb_inseres, 'duree': duree, 'debit': nb_inseres / duree, 'echecs': []}
+
+
+def mesurer_bulk(membres: List[Dict[str, Any]], base: BaseLocale, taille_lot: int, nb_paralleles: int) -> Dict[str, Any]:
+    from database import DatabaseManager
+
+    return DatabaseManager(client=base).sauvegarder_assures_bulk(membres, taille_lot=taille_lot, nb_paralleles=nb_paralleles)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--membres", type=int, default=8000, help="taille du recensement")
+    parser.add_argument("--latence-ms", type=float, default=40.0, help="latence simulée par requête")
+    parser.add_argument("--cout-ligne-ms", type=float, default=0.05, help="coût simulé par ligne insérée")
+    parser.add_argument("--taux-echec", type=float, default=0.0, help="probabilité d'échec d'une requête")
+    parser.add_argument("--unitaire", type=int, default=200,
+                        help="nombre d'assurés insérés un par un (le débit est extrapolé)")
+    args = parser.parse_args(argv)
+
+    membres = recensement(args.membres)
+    latence, cout_ligne = args.latence_ms / 1000, args.cout_ligne_ms / 1000
+
+    print(f"{args.membres} assurés, latence {args.latence_ms:.0f} ms/requête, "
+          f"{args.cout_ligne_ms} ms/ligne, taux d'échec {args.taux_echec:.0%}")
+    print(f"{'mode':<28}{'requêtes':>10}{'insérés':>10}{'lots KO':>9}{'durée (s)':>11}{'assurés/s':>11}")
+
+    base = BaseLocale(latence, cout_ligne, args.taux_echec)
+    unitaire = mesurer_unitaire(membres[:args.unitaire], base)
+    duree_extrapolee = args.membres / unitaire['debit']
+    print(f"{'un par un (extrapolé)':<28}{args.membres:>10}{'-':>10}{'-':>9}{duree_extrapolee:>11.1f}{unitaire['debit']:>11.0f}")
+
+    for taille_lot, nb_paralleles in ((100, 1), (500, 1), (500, 4), (1000, 4), (500, 8)):
+        base = BaseLocale(latence, cout_ligne, args.taux_echec)
+        rapport = mesurer_bulk(membres, base, taille_lot, nb_paralleles)
+        mode = f"lots de {taille_lot} x{nb_paralleles}"
+        print(f"{mode:<28}{base.nb_requetes:>10}{rapport['nb_inseres']:>10}{len(rapport['echecs']):>9}"
+              f"{rapport['duree']:>11.2f}{rapport['debit']:>11.0f}")
+        inseres = len(base.tables.get('assures', []))
+        if inseres != rapport['nb_inseres']:
+            print(f"  incohérence : {inseres} lignes en base pour {rapport['nb_inseres']} annoncées")
+            return 1
+        for echec in rapport['echecs'][:3]:
+            print(f"  lot {echec['lot']} (assurés {echec['debut']} à {echec['fin'] - 1}) : {echec['erreur']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
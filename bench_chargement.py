@@ -0,0 +1,217 @@
+"""
+Banc de mesure du chargement concurrent des données d'une page
+Assur Defender - Cotation Santé +
+
+Rejoue les lectures d'un rerun de l'application (page de polices, page de
+cotations, statistiques du portefeuille) de deux façons :
+
+- l'une après l'autre, comme les onglets le faisaient ;
+- lancées ensemble en début de rerun (ChargementPage), chaque onglet
+  récupérant ensuite son résultat.
+
+Fonctionne hors ligne : un serveur HTTP local joue le rôle de PostgREST
+(mêmes routes /rest/v1/..., réponses JSON) et ajoute à chaque route une
+latence choisie. Les gestionnaires utilisent un vrai client Supabase pointé
+sur ce serveur : construction des requêtes, transport et décodage sont ceux
+de l'application.
+
+Usage :
+    python bench_chargement.py
+    python bench_chargement.py --latence-devis-ms 200 --latence-polices-ms 80 --repetitions 20
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+
+# ==================== POSTGREST LOCAL ====================
+
+def _lignes_devis(nombre: int) -> List[Dict[str, Any]]:
+    debut = datetime(2025, 1, 1)
+    return [{
+        'id': i,
+        'numero_devis': f"DEV-{i:06d}",
+        'type_marche': 'Individuel' if i % 3 else 'Corporate',
+        'nom_client': f"CLIENT {i}",
+        'entreprise': None,
+        'produit': 'Santé +',
+        'statut': 'En cours',
+        'prime_ttc': 250000.0 + i,
+        'date_creation': (debut + timedelta(minutes=i)).isoformat(),
+    } for i in range(nombre, 0, -1)]
+
+
+def _lignes_polices(nombre: int) -> List[Dict[str, Any]]:
+    debut = datetime(2025, 1, 1)
+    return [{
+        'id': i,
+        'numero_police': f"POL-{i:06d}",
+        'type_police': 'individuelle',
+        'assure_principal': f"ASSURE {i}",
+        'statut': 'en_cours',
+        'prime_annuelle': 300000.0 + i,
+        'date_debut': '2025-01-01',
+        'date_fin': '2025-12-31',
+        'date_creation': (debut + timedelta(minutes=i)).isoformat(),
+    } for i in range(nombre, 0, -1)]
+
+
+AGREGAT = {
+    'devis': [{'type_marche': 'Individuel', 'statut': 'En cours', 'nombre': 120, 'total_primes': 3.0e7}],
+    'polices': [{'type_police': 'individuelle', 'statut': 'en_cours', 'nombre': 80, 'total_primes': 2.4e7}],
+    'nb_cotations': 40,
+    'nb_clients': 95,
+    'nb_sinistres_en_cours': 3,
+}
+
+
+class PostgrestLocal(ThreadingHTTPServer):
+    """
+    Remplaçant local de PostgREST : sert les tables devis et polices et la
+    fonction statistiques_portefeuille, chaque route avec sa latence.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latences: Dict[str, float], nb_lignes: int = 50):
+        super().__init__(("127.0.0.1", 0), _Gestionnaire)
+        self.latences = latences
+        self.reponses = {
+            '/rest/v1/devis': json.dumps(_lignes_devis(nb_lignes + 1)).encode(),
+            '/rest/v1/polices': json.dumps(_lignes_polices(nb_lignes + 1)).encode(),
+            '/rest/v1/rpc/statistiques_portefeuille': json.dumps(AGREGAT).encode(),
+        }
+        self.nb_requetes = 0
+        self._verrou = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _Gestionnaire(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # En-têtes et corps envoyés ensemble (sinon Nagle + ACK retardé ajoutent ~40 ms)
+    wbufsize = 1 << 16
+
+    def _repondre(self):
+        longueur = int(self.headers.get('Content-Length') or 0)
+        if longueur:
+            self.rfile.read(longueur)
+        chemin = urlsplit(self.path).path
+        corps = self.server.reponses.get(chemin)
+        with self.server._verrou:
+            self.server.nb_requetes += 1
+        time.sleep(self.server.latences.get(chemin, 0.0))
+        if corps is None:
+            corps = b'{"code":"PGRST205","message":"table inconnue","details":null,"hint":null}'
+            self.send_response(404)
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    do_GET = _repondre
+    do_POST = _repondre
+
+    def log_message(self, format, *args):
+        pass
+
+
+# ==================== MESURE ====================
+
+PARAMETRES_POLICES = {'filtre': {}, 'limite': 50, 'apres': None, 'avant': None}
+PARAMETRES_DEVIS = {'type_marche': None, 'statut': None, 'texte': None, 'limit': 50, 'apres': None, 'avant': None}
+
+
+def rerun_sequentiel(db, db_manager) -> None:
+    """Lectures dans l'ordre des onglets, chacune attendant la précédente."""
+    db.lister_polices(**PARAMETRES_POLICES)
+    db.obtenir_statistiques_generales()
+    db_manager.rechercher_devis(**PARAMETRES_DEVIS)
+    db_manager.get_statistiques_globales()
+
+
+def rerun_concurrent(db, db_manager) -> None:
+    """Lectures lancées ensemble en début de rerun, récupérées par les onglets."""
+    from chargement import ChargementPage
+
+    chargement = ChargementPage()
+    chargement.lancer("polices", PARAMETRES_POLICES, lambda: db.lister_polices(**PARAMETRES_POLICES))
+    chargement.lancer("devis", PARAMETRES_DEVIS, lambda: db_manager.rechercher_devis(**PARAMETRES_DEVIS))
+    chargement.lancer("statistiques", None, db_manager.get_statistiques_globales)
+
+    chargement.obtenir("polices", PARAMETRES_POLICES, lambda: db.lister_polices(**PARAMETRES_POLICES))
+    db.obtenir_statistiques_generales()
+    chargement.obtenir("devis", PARAMETRES_DEVIS, lambda: db_manager.rechercher_devis(**PARAMETRES_DEVIS))
+    chargement.obtenir("statistiques", None, db_manager.get_statistiques_globales)
+
+
+def mesurer_reruns(rerun, db, db_manager, repetitions: int) -> List[float]:
+    from statistiques import cache_statistiques
+
+    durees = []
+    for _ in range(repetitions):
+        # Chaque rerun relit l'agrégat, comme après une écriture
+        cache_statistiques.invalider()
+        debut = time.perf_counter()
+        rerun(db, db_manager)
+        durees.append(time.perf_counter() - debut)
+    return durees
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--latence-devis-ms", type=float, default=120.0)
+    parser.add_argument("--latence-polices-ms", type=float, default=80.0)
+    parser.add_argument("--latence-statistiques-ms", type=float, default=150.0)
+    parser.add_argument("--repetitions", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    latences = {
+        '/rest/v1/devis': args.latence_devis_ms / 1000,
+        '/rest/v1/polices': args.latence_polices_ms / 1000,
+        '/rest/v1/rpc/statistiques_portefeuille': args.latence_statistiques_ms / 1000,
+    }
+    serveur = PostgrestLocal(latences)
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+
+    from supabase import create_client
+    from database import DatabaseManager
+    from supabase_config import SupabaseManager
+
+    client = create_client(serveur.url, "cle-locale")
+    db, db_manager = SupabaseManager(client=client), DatabaseManager(client=client)
+
+    # Premier aller-retour hors mesure (connexion HTTP)
+    rerun_sequentiel(db, db_manager)
+
+    somme = sum(latences.values()) * 1000
+    plus_lente = max(latences.values()) * 1000
+    print(f"latences injectées : devis {args.latence_devis_ms:.0f} ms, polices {args.latence_polices_ms:.0f} ms, "
+          f"statistiques {args.latence_statistiques_ms:.0f} ms (somme {somme:.0f} ms, plus lente {plus_lente:.0f} ms)")
+    print(f"{'mode':<14}{'requêtes':>10}{'p50 (ms)':>10}{'max (ms)':>10}")
+    resultats = {}
+    for mode, rerun in (("séquentiel", rerun_sequentiel), ("concurrent", rerun_concurrent)):
+        avant = serveur.nb_requetes
+        durees = mesurer_reruns(rerun, db, db_manager, args.repetitions)
+        resultats[mode] = statistics.median(durees) * 1000
+        nb_requetes = (serveur.nb_requetes - avant) / args.repetitions
+        print(f"{mode:<14}{nb_requetes:>10.0f}{resultats[mode]:>10.0f}{max(durees) * 1000:>10.0f}")
+    print(f"gain : x{resultats['séquentiel'] / resultats['concurrent']:.2f}")
+
+    serveur.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
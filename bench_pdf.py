@@ -0,0 +1,238 @@
+"""
+Banc de mesure du rendu PDF (temps, mémoire, taille) avec budgets
+Assur Defender - Cotation Santé +
+
+Mesure chaque type de document (proposition de 1 à 3 options, avec ou sans
+image de barème importée, cotation particulier, cotation corporate) :
+temps de rendu médian, pic de mémoire Python (tracemalloc) et taille du PDF.
+Le script échoue (code de sortie 1) dès qu'une mesure dépasse son budget.
+
+Fonctionne hors ligne : les données des documents sont construites ici,
+sans Supabase ni Streamlit.
+
+Usage :
+    python bench_pdf.py
+    python bench_pdf.py --repetitions 10 --budgets budgets.json --json resultats.json
+
+Le fichier de budgets (JSON) surcharge tout ou partie des budgets par défaut :
+    {"proposition_3_options_bareme": {"temps_ms": 250, "octets": 400000}}
+"""
+
+import argparse
+import io
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+
+# Une proposition compte au plus 3 options (en-tête du tableau récapitulatif)
+NB_OPTIONS_MESURES = (1, 2, 3)
+REPETITIONS_PAR_DEFAUT = 5
+
+# Budgets par défaut : environ 3x le temps médian et 1,5 à 3x le pic mémoire
+# mesurés sur un poste de développement, taille du PDF à +20 %
+BUDGETS_PAR_DEFAUT: Dict[str, Dict[str, float]] = {
+    **{
+        f"proposition_{n}_options": {"temps_ms": 50 + 5 * n, "memoire_ko": 1024, "octets": 52_000 + 500 * n}
+        for n in NB_OPTIONS_MESURES
+    },
+    **{
+        f"proposition_{n}_options_bareme": {"temps_ms": 450, "memoire_ko": 40_960, "octets": 200_000}
+        for n in NB_OPTIONS_MESURES
+    },
+    "cotation_particulier": {"temps_ms": 25, "memoire_ko": 1024, "octets": 5_000},
+    "cotation_corporate": {"temps_ms": 30, "memoire_ko": 1024, "octets": 7_500},
+}
+
+
+# ==================== DONNÉES DE TEST ====================
+
+DESIGNATIONS_RECAPITULATIF = [
+    'PLAFOND ANNUEL / PERS', 'PLAFOND ANNUEL / FAM', 'GESTIONNAIRE', 'TERRITORIALITÉ',
+    'GARANTIES', 'TYPE DE PROPOSITION', 'POPULATION', 'PRIME NETTE / PERSONNE',
+    'SURPRIME AFFECTION', 'SURPRIME GROSSESSE', 'PRIME TOTALE LSP', 'PRIME ASSISTANCE PSY',
+    'PRIME NETTE TOTALE', 'ACCESSOIRES', 'TAXES', 'PRIME TTC ANNUELLE', 'TROP PERÇU',
+    'MONTANT TOTAL À PAYER',
+]
+
+
+def _montant(valeur: float) -> str:
+    return f"{round(valeur):,.0f} FCFA".replace(",", " ")
+
+
+def recapitulatif_proposition(nb_options: int) -> pd.DataFrame:
+    """Tableau récapitulatif semblable à celui de generer_recapitulatif_particulier."""
+    df_dict = {'Désignation': DESIGNATIONS_RECAPITULATIF}
+    for i in range(nb_options):
+        prime = 250_000 + 75_000 * i
+        df_dict[f'OPTION {i + 1}'] = [
+            _montant(5_000_000), _montant(15_000_000), 'ANKARA SERVICE', "COTE D'IVOIRE",
+            f"{70 + 10 * (i % 4)}%", 'Famille' if i % 2 else 'Individuel', str(1 + i % 3),
+            _montant(prime), _montant(prime * 0.1), '0 FCFA', _montant(20_000), _montant(35_000),
+            _montant(prime * 1.1), _montant(15_000), _montant(prime * 0.08), _montant(prime * 1.3),
+            '0 FCFA', _montant(prime * 1.3),
+        ]
+    return pd.DataFrame(df_dict)
+
+
+def image_bareme() -> bytes:
+    """Image de barème importée typique : capture PNG d'un tableau de garanties."""
+    from PIL import Image as PILImage, ImageDraw
+
+    image = PILImage.new('RGB', (1654, 2339), 'white')
+    dessin = ImageDraw.Draw(image)
+    for ligne in range(60):
+        y = 80 + ligne * 36
+        dessin.line([(60, y), (1594, y)], fill=(120, 120, 120), width=2)
+        fond = (230, 240, 250) if ligne % 2 else (255, 255, 255)
+        dessin.rectangle([(62, y + 2), (1592, y + 34)], fill=fond)
+        for colonne in range(5):
+            dessin.text((80 + colonne * 300, y + 10), f"Garantie {ligne}.{colonne} - 80 % - 500 000", fill='black')
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+RESULTAT_PARTICULIER = {
+    'type_couverture': 'Famille',
+    'prime_nette_base': 300_000,
+    'prime_nette_finale': 320_250,
+    'accessoires': 15_000,
+    'taxe': 26_820,
+    'prime_lsp': 20_000,
+    'prime_assist_psy': 35_000,
+    'prime_ttc_totale': 417_070,
+    'surprime_age_taux': 6.75,
+    'surprime_risques_taux': 0,
+    'duree_contrat': 12,
+    'facteurs': {'taux_taxe': 0.08},
+}
+
+RESULTAT_CORPORATE = {
+    'type_calcul': 'estimation_rapide',
+    'nb_familles': 25,
+    'nb_personnes_seules': 40,
+    'nb_enfants_supplementaires': 6,
+    'prime_nette_finale': 18_500_000,
+    'accessoires': 975_000,
+    'taxe': 584_250,
+    'prime_lsp': 1_300_000,
+    'prime_assist_psy': 2_275_000,
+    'prime_ttc_totale': 23_634_250,
+    'facteurs': {'taux_taxe': 0.03},
+}
+
+CLIENT = {'nom': 'KOUAME', 'prenom': 'Jean', 'contact': '+225 07 12 34 56 78'}
+ENTREPRISE = {'nom': 'SOCIETE IVOIRIENNE DE NEGOCE', 'secteur': 'Commerce'}
+REFERENCES = {'reference': 'PROP-2025-0001', 'apporteur': 'AGENCE PLATEAU', 'prospect': 'KOUAME Jean'}
+
+
+def cas_de_mesure() -> Dict[str, Callable[[], bytes]]:
+    """Un générateur de document par cas mesuré."""
+    from pdf_generator import PDFGenerator
+    from pdf_proposition import generer_pdf_proposition
+
+    bareme = image_bareme()
+    cas: Dict[str, Callable[[], bytes]] = {}
+    for nb_options in NB_OPTIONS_MESURES:
+        recapitulatif = recapitulatif_proposition(nb_options)
+        options = [{}] * nb_options
+        cas[f"proposition_{nb_options}_options"] = (
+            lambda r=recapitulatif, o=options, n=nb_options: generer_pdf_proposition(r, o, n, REFERENCES)
+        )
+        cas[f"proposition_{nb_options}_options_bareme"] = (
+            lambda r=recapitulatif, o=options, n=nb_options: generer_pdf_proposition(r, o, n, REFERENCES, bareme)
+        )
+    cas["cotation_particulier"] = lambda: PDFGenerator().generer_pdf_particulier(
+        RESULTAT_PARTICULIER, '80% CI RUBIS', CLIENT, 'DEV-0001'
+    )
+    cas["cotation_corporate"] = lambda: PDFGenerator().generer_pdf_corporate(
+        RESULTAT_CORPORATE, '80% CI', ENTREPRISE, 'DEV-0002'
+    )
+    return cas
+
+
+# ==================== MESURE ====================
+
+def mesurer_cas(generer: Callable[[], bytes], repetitions: int) -> Dict[str, float]:
+    """Temps médian (après un rendu d'échauffement), pic mémoire et taille du PDF."""
+    generer()
+    durees = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        pdf_bytes = generer()
+        durees.append(time.perf_counter() - debut)
+
+    # Mesure mémoire séparée : tracemalloc ralentit le rendu
+    tracemalloc.start()
+    try:
+        generer()
+        _, pic = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "temps_ms": statistics.median(durees) * 1000,
+        "memoire_ko": pic / 1024,
+        "octets": len(pdf_bytes),
+    }
+
+
+def charger_budgets(chemin: Optional[str]) -> Dict[str, Dict[str, float]]:
+    """Budgets par défaut, surchargés par le fichier JSON éventuel."""
+    budgets = {nom: dict(valeurs) for nom, valeurs in BUDGETS_PAR_DEFAUT.items()}
+    if chemin:
+        with open(chemin, encoding='utf-8') as fichier:
+            for nom, valeurs in json.load(fichier).items():
+                budgets.setdefault(nom, {}).update(valeurs)
+    return budgets
+
+
+def executer(repetitions: int, budgets: Dict[str, Dict[str, float]], filtre: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Mesure chaque cas et le compare à son budget."""
+    lignes = []
+    for nom, generer in cas_de_mesure().items():
+        if filtre and filtre not in nom:
+            continue
+        mesures = mesurer_cas(generer, repetitions)
+        budget = budgets.get(nom, {})
+        depassements = [
+            critere for critere, limite in budget.items()
+            if critere in mesures and mesures[critere] > limite
+        ]
+        lignes.append({"cas": nom, **mesures, "budget": budget, "depassements": depassements})
+    return lignes
+
+
+def main(arguments: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Banc de mesure du rendu PDF")
+    parser.add_argument("--repetitions", type=int, default=REPETITIONS_PAR_DEFAUT)
+    parser.add_argument("--budgets", help="Fichier JSON surchargeant les budgets par défaut")
+    parser.add_argument("--json", help="Écrit les résultats dans ce fichier JSON")
+    parser.add_argument("--filtre", help="Ne mesure que les cas dont le nom contient ce texte")
+    options = parser.parse_args(arguments)
+
+    lignes = executer(options.repetitions, charger_budgets(options.budgets), options.filtre)
+
+    print(f"{'Cas':<32}{'Temps':>10}{'Mémoire':>12}{'Taille':>11}  Budget")
+    for ligne in lignes:
+        etat = "DÉPASSÉ (" + ", ".join(ligne['depassements']) + ")" if ligne['depassements'] else "ok"
+        print(
+            f"{ligne['cas']:<32}{ligne['temps_ms']:>8.1f}ms{ligne['memoire_ko']:>9.0f} Ko"
+            f"{ligne['octets'] / 1024:>8.1f} Ko  {etat}"
+        )
+
+    if options.json:
+        with open(options.json, 'w', encoding='utf-8') as fichier:
+            json.dump(lignes, fichier, ensure_ascii=False, indent=2)
+
+    return 1 if any(ligne['depassements'] for ligne in lignes) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""
+Cache process-wide des cotations et des propositions PDF identiques
+Assur Defender - Cotation Santé +
+
+Plusieurs agents cotent souvent exactement la même configuration standard
+(ex: 80% CI RUBIS, Famille, 2 adultes de moins de 51 ans, 12 mois). Les
+résultats de calcul et les PDF rendus sont partagés entre les sessions,
+indexés par une empreinte canonique des paramètres et de la version des tarifs.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional
+
+from data import (
+    TARIFS_PARTICULIERS,
+    TARIFS_CORPORATE,
+    TAUX_TAXE_PARTICULIER,
+    TAUX_TAXE_CORPORATE,
+    SURPRIME_FORFAITAIRE_GROSSESSE,
+    SURPRIME_AGE_PLUS_51,
+    TAUX_MAJORATION_MEDICALE,
+)
+
+
+BUDGET_CACHE_RESULTATS_OCTETS = int(os.environ.get("AKORA_CACHE_RESULTATS_MO", 32)) * 1024 * 1024
+BUDGET_CACHE_PDF_OCTETS = int(os.environ.get("AKORA_CACHE_PDF_MO", 256)) * 1024 * 1024
+
+# Paramètres qui rendent une cotation non standard (saisies manuelles)
+PARAMETRES_MANUELS = (
+    'prime_nette_manuelle',
+    'accessoires_manuels',
+    'montant_grossesse_manuel',
+    'prime_lsp_manuelle',
+    'prime_assist_psy_manuelle',
+)
+
+
+def _normaliser(valeur: Any) -> Any:
+    """Convertit une valeur en structure JSON stable (dates, DataFrames, tuples...)."""
+    if isinstance(valeur, dict):
+        return {str(k): _normaliser(v) for k, v in valeur.items()}
+    if isinstance(valeur, (list, tuple)):
+        return [_normaliser(v) for v in valeur]
+    if isinstance(valeur, (datetime, date)):
+        return valeur.isoformat()
+    if isinstance(valeur, float) and valeur.is_integer():
+        return int(valeur)
+    if isinstance(valeur, (bytes, bytearray)):
+        return hashlib.sha256(valeur).hexdigest()
+    if hasattr(valeur, 'to_dict') and hasattr(valeur, 'columns'):
+        # DataFrame pandas
+        return _normaliser(valeur.to_dict(orient='split'))
+    if hasattr(valeur, 'item'):
+        # Scalaire numpy
+        return _normaliser(valeur.item())
+    return valeur
+
+
+def empreinte_canonique(*elements: Any) -> str:
+    """Empreinte SHA-256 d'une représentation canonique des éléments."""
+    texte = json.dumps(_normaliser(list(elements)), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(texte.encode('utf-8')).hexdigest()
+
+
+# Version des tarifs : change dès qu'un barème, une taxe ou une surprime est modifié
+VERSION_TARIFS = empreinte_canonique(
+    TARIFS_PARTICULIERS,
+    TARIFS_CORPORATE,
+    TAUX_TAXE_PARTICULIER,
+    TAUX_TAXE_CORPORATE,
+    SURPRIME_FORFAITAIRE_GROSSESSE,
+    SURPRIME_AGE_PLUS_51,
+    TAUX_MAJORATION_MEDICALE,
+)[:12]
+
+
+class CacheProcessus:
+    """Cache LRU thread-safe, borné en octets, partagé par toutes les sessions."""
+
+    def __init__(self, nom: str, budget_octets: int):
+        self.nom = nom
+        self.budget_octets = budget_octets
+        self._entrees: "OrderedDict[str, Any]" = OrderedDict()
+        self._tailles: Dict[str, int] = {}
+        self._octets = 0
+        self._succes = 0
+        self._echecs = 0
+        self._verrou = threading.Lock()
+        self._calculs_en_cours: Dict[str, threading.Lock] = {}
+
+    def lire(self, cle: str) -> Optional[Any]:
+        """Retourne une copie de la valeur en cache, ou None."""
+        with self._verrou:
+            if cle not in self._entrees:
+                self._echecs += 1
+                return None
+            self._entrees.move_to_end(cle)
+            self._succes += 1
+            valeur = self._entrees[cle]
+        return valeur if isinstance(valeur, bytes) else copy.deepcopy(valeur)
+
+    def contient(self, cle: str) -> bool:
+        """Indique si la clé est en cache (sans compter de succès ni d'échec)."""
+        with self._verrou:
+            return cle in self._entrees
+
+    def stocker(self, cle: str, valeur: Any):
+        """Ajoute une valeur (copiée) au cache en évinçant les plus anciennes si besoin."""
+        if isinstance(valeur, (bytes, bytearray)):
+            valeur, taille = bytes(valeur), len(valeur)
+        else:
+            valeur = copy.deepcopy(valeur)
+            taille = len(json.dumps(_normaliser(valeur), default=str))
+        if taille > self.budget_octets:
+            return
+        with self._verrou:
+            if cle in self._entrees:
+                self._octets -= self._tailles.pop(cle)
+                del self._entrees[cle]
+            self._entrees[cle] = valeur
+            self._tailles[cle] = taille
+            self._octets += taille
+            while self._octets > self.budget_octets:
+                ancienne, _ = self._entrees.popitem(last=False)
+                self._octets -= self._tailles.pop(ancienne)
+
+    def obtenir_ou_calculer(self, cle: str, calcul: Callable[[], Any]) -> Any:
+        """
+        Retourne la valeur en cache ou la calcule. Deux sessions demandant la
+        même clé simultanément ne déclenchent qu'un seul calcul.
+        """
+        valeur = self.lire(cle)
+        if valeur is not None:
+            return valeur
+        with self._verrou:
+            verrou_cle = self._calculs_en_cours.setdefault(cle, threading.Lock())
+        with verrou_cle:
+            with self._verrou:
+                deja_calcule = cle in self._entrees
+            if deja_calcule:
+                return self.lire(cle)
+            try:
+                valeur = calcul()
+                self.stocker(cle, valeur)
+            finally:
+                with self._verrou:
+                    self._calculs_en_cours.pop(cle, None)
+        return copy.deepcopy(valeur) if not isinstance(valeur, bytes) else valeur
+
+    def vider(self):
+        """Vide le cache (ex: après modification des tarifs)."""
+        with self._verrou:
+            self._entrees.clear()
+            self._tailles.clear()
+            self._octets = 0
+
+    def statistiques(self) -> Dict[str, Any]:
+        """Nombre d'entrées, occupation et taux de succès du cache."""
+        with self._verrou:
+            total = self._succes + self._echecs
+            return {
+                'nom': self.nom,
+                'nb_entrees': len(self._entrees),
+                'octets': self._octets,
+                'budget_octets': self.budget_octets,
+                'succes': self._succes,
+                'echecs': self._echecs,
+                'taux_succes': (self._succes / total) if total else 0.0,
+            }
+
+
+def cle_cotation_particulier(parametres: Dict[str, Any]) -> Optional[str]:
+    """
+    Clé de cache d'une cotation particulier, ou None si elle n'est pas standard
+    (barème spécial, primes/accessoires saisis manuellement, surprime manuelle).
+
+    Les dates de naissance n'interviennent dans le tarif que via le seuil de
+    51 ans : elles sont remplacées par ce seuil pour que deux familles de même
+    profil partagent la même entrée.
+    """
+    from calculations import calculer_age
+
+    if parametres.get('produit_key') == 'bareme_special':
+        return None
+    if any(parametres.get(p) is not None for p in PARAMETRES_MANUELS):
+        return None
+    if parametres.get('accessoire_plus') or parametres.get('surprime_manuelle_pourcent'):
+        return None
+
+    cle = {k: v for k, v in parametres.items() if not k.startswith('date_naissance')}
+    for nom in ('date_naissance_principale', 'date_naissance_conjoint'):
+        date_naissance = parametres.get(nom)
+        cle[f"{nom}_plus_51"] = calculer_age(date_naissance) > 51 if date_naissance else None
+    cle['affections_declarees'] = sorted(parametres.get('affections_declarees') or [])
+    return empreinte_canonique('particulier', VERSION_TARIFS, cle)
+
+
+# Instances globales des caches
+cache_resultats = CacheProcessus('resultats', BUDGET_CACHE_RESULTATS_OCTETS)
+cache_pdf = CacheProcessus('pdf', BUDGET_CACHE_PDF_OCTETS)
@@ -2,9 +2,10 @@ import streamlit as st
 import math
 import pandas as pd
 import io
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple, Callable
 from datetime import datetime, date
 from data import *
+from instrumentation import mesurer
 
 def format_currency(amount: float) -> str:
     """Formate un montant en FCFA avec arrondi mathématique standard."""
@@ -218,6 +219,7 @@ def calculer_prime_avec_parametres(
         }
     }
 
+@mesurer("tarification.particulier")
 def calculer_prime_particuliers(
     produit_key: str, 
     type_couverture: str, 
@@ -412,6 +414,7 @@ def calculer_prime_particuliers(
     
     return resultat
 
+@mesurer("tarification.corporate_rapide")
 def calculer_prime_corporate_rapide(
     produit_key: str, 
     nb_familles: int = 0, 
@@ -674,14 +677,20 @@ def traiter_ligne_assure(
         }
 
 
+@mesurer("tarification.micro_excel")
 def micro_tarification_excel(
     df: pd.DataFrame,
     produit_key: str,
-    duree_contrat: int
+    duree_contrat: int,
+    progression: Optional[Callable[[int, int], None]] = None
 ) -> Dict[str, Any]:
     """
     Effectue la micro-tarification complète du fichier Excel.
     Analyse chaque assuré ligne par ligne.
+    
+    Args:
+        progression: Callback optionnel appelé avec (lignes traitées, total)
+            toutes les 100 lignes (utilisé par les tâches en arrière-plan)
     """
     resultats_lignes = []
     total_prime_nette = 0
@@ -695,7 +704,11 @@ def micro_tarification_excel(
     assures_exclus = []
     assures_erreurs = []
     
-    for _, ligne in df.iterrows():
+    nb_total = len(df)
+    for num_ligne, (_, ligne) in enumerate(df.iterrows()):
+        if progression is not None and num_ligne % 100 == 0:
+            progression(num_ligne, nb_total)
+        
         resultat_ligne = traiter_ligne_assure(ligne, produit_key, duree_contrat)
         resultats_lignes.append(resultat_ligne)
         
@@ -761,6 +774,36 @@ def micro_tarification_excel(
     }
 
 
+def resultat_corporate_assure(resultat_ligne: Dict[str, Any], produit_key: str) -> Dict[str, Any]:
+    """
+    Résultat individuel d'un assuré éligible de la micro-tarification, au format
+    de generer_pdf_corporate (même répartition accessoires / taxe / services
+    que les totaux de micro_tarification_excel).
+    """
+    tarif = TARIFS_CORPORATE[produit_key]
+    famille = resultat_ligne['ligne']['type_couverture'] == 'Famille'
+    nb_enfants_supp = resultat_ligne.get('nb_enfants_supp', 0) if famille else 0
+    config = tarif['famille'] if famille else tarif['personne_seule']
+    
+    accessoires = config['accessoires'] + tarif['enfant_supplementaire']['accessoires'] * nb_enfants_supp
+    taxe = (resultat_ligne['prime_nette'] + accessoires) * TAUX_TAXE_CORPORATE
+    prime_ttc_totale = resultat_ligne['prime_nette'] + accessoires + taxe + config['prime_lsp'] + config['prime_assist_psy']
+    
+    return {
+        'type_calcul': 'micro_tarification',
+        'nb_familles': 1 if famille else 0,
+        'nb_personnes_seules': 0 if famille else 1,
+        'nb_enfants_supplementaires': nb_enfants_supp,
+        'prime_nette_finale': resultat_ligne['prime_nette'],
+        'accessoires': accessoires,
+        'taxe': taxe,
+        'prime_lsp': config['prime_lsp'],
+        'prime_assist_psy': config['prime_assist_psy'],
+        'prime_ttc_totale': prime_ttc_totale,
+        'facteurs': {'taux_taxe': TAUX_TAXE_CORPORATE},
+    }
+
+
 def generer_template_excel() -> bytes:
     """Génère un template Excel pour la saisie des données Corporate."""
     df_template = pd.DataFrame({
@@ -0,0 +1,83 @@
+"""
+Chargement concurrent des données d'une page
+Assur Defender - Cotation Santé +
+
+Un rerun lit plusieurs listes indépendantes (page de polices, page de
+cotations, statistiques du portefeuille). Lues l'une après l'autre, la
+latence de la page est la somme des requêtes ; lancées ensemble en début
+de rerun, elle se rapproche de la plus lente.
+
+Le rerun lance les requêtes (lancer) avant de dessiner les onglets ; chaque
+onglet récupère ensuite son résultat (obtenir) avec les paramètres de ses
+widgets. Si les paramètres diffèrent de ceux du lancement (widget modifié
+entre-temps), l'onglet refait simplement l'appel lui-même.
+
+Chaque appel s'exécute dans un thread dédié, sans contexte Streamlit : il
+n'écrit rien dans la page (Streamlit n'accepte pas d'écritures depuis
+plusieurs threads) et relève ses erreurs. obtenir les reçoit dans le thread
+du script et les confie à `en_erreur`, qui les affiche à la place de
+l'onglet. AKORA_CHARGEMENTS_PARALLELES borne le nombre d'appels simultanés
+pour l'ensemble des sessions.
+"""
+
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from instrumentation import chronometre
+
+
+NB_CHARGEMENTS_PARALLELES = int(os.environ.get("AKORA_CHARGEMENTS_PARALLELES", 16))
+
+# Partagé par toutes les sessions : borne la charge envoyée au backend
+_creneaux = threading.BoundedSemaphore(NB_CHARGEMENTS_PARALLELES)
+
+
+def _executer(nom: str, fonction: Callable[[], Any], envoi: Future):
+    with _creneaux:
+        if not envoi.set_running_or_notify_cancel():
+            return
+        try:
+            with chronometre.section(f"chargement.{nom}"):
+                envoi.set_result(fonction())
+        except BaseException as e:
+            envoi.set_exception(e)
+
+
+class ChargementPage:
+    """Requêtes d'un rerun lancées ensemble, récupérées par les onglets."""
+
+    def __init__(self):
+        self._envois: Dict[str, Tuple[Any, Future]] = {}
+
+    def lancer(self, nom: str, parametres: Any, fonction: Callable[[], Any]):
+        """
+        Lance `fonction()` en arrière-plan ; `parametres` identifie la requête.
+        `fonction` ne doit rien afficher : elle retourne son résultat ou lève.
+        """
+        envoi: Future = Future()
+        thread = threading.Thread(
+            target=_executer, args=(nom, fonction, envoi),
+            name=f"akora-chargement-{nom}", daemon=True
+        )
+        thread.start()
+        self._envois[nom] = (parametres, envoi)
+
+    def obtenir(self, nom: str, parametres: Any, fonction: Callable[[], Any],
+                en_erreur: Optional[Callable[[Exception], Any]] = None) -> Any:
+        """
+        Résultat de la requête lancée sous ce nom avec les mêmes paramètres
+        (en attendant sa fin si besoin), sinon résultat d'un appel direct.
+        Si la requête lancée a échoué, retourne `en_erreur(exception)`
+        (exécuté ici, dans le thread du script), ou relève l'exception.
+        """
+        lance = self._envois.pop(nom, None)
+        if lance is not None and lance[0] == parametres:
+            try:
+                return lance[1].result()
+            except Exception as e:
+                if en_erreur is None:
+                    raise
+                return en_erreur(e)
+        return fonction()
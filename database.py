@@ -1,61 +1,161 @@
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Callable
 from datetime import datetime, date
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+import time
 import streamlit as st
+from postgrest import ReturnMethod
 from supabase_config import get_supabase_client
-import json
+
+from instrumentation import chronometre, mesurer
+from pagination import Curseur, Page, TAILLE_PAGE_DEFAUT, paginer
+from statistiques import cache_statistiques, cumuler, statistiques_supabase
+from transport import ServiceIndisponible, est_transitoire, transport_base
+from stockage_documents import est_reference, stockage_documents
+from file_sauvegardes import SAUVEGARDE_DIFFEREE, file_sauvegardes, journal_envois
+from donnees_json import COLONNES_JSON, champ_json, decoder_colonnes
+
+
+# Colonnes des devis hors PDF : la liste des cotations ne transporte pas les documents
+COLONNES_DEVIS = ", ".join([
+    'id', 'numero_devis', 'type_marche', 'produit', 'nom_client', 'entreprise', 'secteur',
+    'type_couverture', 'nb_adultes', 'nb_enfants', 'nb_enfants_supplementaires',
+    'prime_nette', 'accessoires', 'services', 'taxe', 'prime_ttc', 'prime_finale',
+    'reduction_commerciale', 'surprime_medicale', 'surprime_age', 'duree_contrat',
+    'statut', 'validateur', 'motif_reduction', 'details', 'created_by',
+    'date_creation', 'date_modification',
+])
+
+# Projection des listes (tab_liste) : seules les colonnes affichées, sans `details`
+COLONNES_LISTE_DEVIS = ", ".join([
+    'id', 'numero_devis', 'type_marche', 'nom_client', 'entreprise', 'produit',
+    'duree_contrat', 'prime_finale', 'date_creation', 'statut',
+])
+
+
+# Insertion en masse des assurés (recensements corporate)
+TAILLE_LOT_ASSURES = int(os.environ.get("AKORA_TAILLE_LOT_ASSURES", 500))
+ENVOIS_PARALLELES_ASSURES = int(os.environ.get("AKORA_ENVOIS_PARALLELES", 4))
+
+# Opération du journal des sauvegardes différées (file_sauvegardes)
+OPERATION_DEVIS = "sauvegarder_devis"
+
+
+def _ligne_devis(devis_data: Dict[str, Any], pdf_data: Optional[str]) -> Dict[str, Any]:
+    """Ligne de la table `devis` correspondant aux infos d'un devis."""
+    return {
+        'numero_devis': devis_data.get('numero_devis'),
+        'type_marche': devis_data.get('type_marche'),  # 'Particulier' ou 'Corporate'
+        'produit': devis_data.get('produit'),
+        'nom_client': devis_data.get('nom_client'),
+        'entreprise': devis_data.get('entreprise'),  # Pour Corporate
+        'secteur': devis_data.get('secteur'),  # Pour Corporate
+        'type_couverture': devis_data.get('type_couverture'),
+        'nb_adultes': devis_data.get('nb_adultes', 1),
+        'nb_enfants': devis_data.get('nb_enfants', 0),
+        'nb_enfants_supplementaires': devis_data.get('nb_enfants_supplementaires', 0),
+        'prime_nette': devis_data.get('prime_nette', 0),
+        'accessoires': devis_data.get('accessoires', 0),
+        'services': devis_data.get('services', 0),
+        'taxe': devis_data.get('taxe', 0),
+        'prime_ttc': devis_data.get('prime_ttc', 0),
+        'prime_finale': devis_data.get('prime_finale', 0),
+        'reduction_commerciale': devis_data.get('reduction_commerciale', 0),
+        'surprime_medicale': devis_data.get('surprime_medicale', 0),
+        'surprime_age': devis_data.get('surprime_age', 0),
+        'duree_contrat': devis_data.get('duree_contrat', 12),
+        'statut': devis_data.get('statut', 'En attente'),  # En attente, Finalisé, Annulé
+        'validateur': devis_data.get('validateur'),
+        'motif_reduction': devis_data.get('motif_reduction'),
+        'details': devis_data.get('details', {}),  # JSON (jsonb) pour infos complémentaires
+        'pdf_data': pdf_data,  # Référence du PDF dans le stockage de documents
+        'created_by': devis_data.get('created_by', 'Système'),
+        'date_creation': datetime.now().isoformat()
+    }
+
+
+def _ligne_assure(assure_data: Dict[str, Any], date_creation: str) -> Dict[str, Any]:
+    """Ligne de la table `assures` correspondant aux infos d'un assuré."""
+    date_naissance = assure_data.get('date_naissance')
+    return {
+        'numero_devis': assure_data.get('numero_devis'),
+        'type_assure': assure_data.get('type_assure'),  # Principal, Conjoint, Enfant
+        'nom': assure_data.get('nom'),
+        'prenom': assure_data.get('prenom'),
+        'date_naissance': date_naissance.isoformat() if isinstance(date_naissance, date) else date_naissance,
+        'lieu_naissance': assure_data.get('lieu_naissance'),
+        'contact': assure_data.get('contact'),
+        'numero_cnam': assure_data.get('numero_cnam'),
+        'nationalite': assure_data.get('nationalite'),
+        'etat_civil': assure_data.get('etat_civil'),
+        'emploi_actuel': assure_data.get('emploi_actuel'),
+        'taille': assure_data.get('taille'),
+        'poids': assure_data.get('poids'),
+        'imc': assure_data.get('imc'),
+        'tension_arterielle': assure_data.get('tension_arterielle'),
+        'affections': assure_data.get('affections', []),
+        'grossesse': assure_data.get('grossesse', False),
+        'sexe': assure_data.get('sexe'),
+        'details': assure_data.get('details', {}),
+        'date_creation': date_creation
+    }
+
+
+def _decoder_details(devis_list: List[Dict]) -> List[Dict]:
+    """Décode `details` lorsqu'il est encore une chaîne JSON (devis antérieurs à la colonne jsonb)."""
+    return decoder_colonnes(devis_list, COLONNES_JSON['devis'])
 
 
 class DatabaseManager:
     """Gestionnaire de base de données pour Assur Defender."""
     
-    def __init__(self):
-        self.client = get_supabase_client()
+    def __init__(self, client=None):
+        # Un client peut être fourni (banc de mesure, base locale)
+        self.client = client if client is not None else get_supabase_client()
     
     # ==================== DEVIS ====================
     
+    @mesurer("supabase.sauvegarder_devis")
     def sauvegarder_devis(self, devis_data: Dict[str, Any]) -> Optional[Dict]:
         """
         Sauvegarde un devis dans la base de données.
-        
+
+        Avec AKORA_SAUVEGARDE_DIFFEREE (par défaut), le devis et son PDF sont
+        écrits dans le journal local et acquittés aussitôt ; l'envoi à la
+        base suit en arrière-plan (voir file_sauvegardes.py). Si le journal
+        est inaccessible, la sauvegarde est faite directement.
+
         Args:
-            devis_data: Dictionnaire contenant toutes les informations du devis
-            
+            devis_data: Dictionnaire contenant toutes les informations du devis ;
+                le PDF éventuel ('pdf_bytes') est déposé dans le stockage de
+                documents, la ligne n'en garde que la référence
+
         Returns:
-            Le devis créé ou None en cas d'erreur
+            Le devis créé (ou mis en file, avec 'envoi' = 'en_attente'),
+            None en cas d'erreur
         """
         try:
-            # Préparer les données pour Supabase
-            data = {
-                'numero_devis': devis_data.get('numero_devis'),
-                'type_marche': devis_data.get('type_marche'),  # 'Particulier' ou 'Corporate'
-                'produit': devis_data.get('produit'),
-                'nom_client': devis_data.get('nom_client'),
-                'entreprise': devis_data.get('entreprise'),  # Pour Corporate
-                'secteur': devis_data.get('secteur'),  # Pour Corporate
-                'type_couverture': devis_data.get('type_couverture'),
-                'nb_adultes': devis_data.get('nb_adultes', 1),
-                'nb_enfants': devis_data.get('nb_enfants', 0),
-                'nb_enfants_supplementaires': devis_data.get('nb_enfants_supplementaires', 0),
-                'prime_nette': devis_data.get('prime_nette', 0),
-                'accessoires': devis_data.get('accessoires', 0),
-                'services': devis_data.get('services', 0),
-                'taxe': devis_data.get('taxe', 0),
-                'prime_ttc': devis_data.get('prime_ttc', 0),
-                'prime_finale': devis_data.get('prime_finale', 0),
-                'reduction_commerciale': devis_data.get('reduction_commerciale', 0),
-                'surprime_medicale': devis_data.get('surprime_medicale', 0),
-                'surprime_age': devis_data.get('surprime_age', 0),
-                'duree_contrat': devis_data.get('duree_contrat', 12),
-                'statut': devis_data.get('statut', 'En attente'),  # En attente, Finalisé, Annulé
-                'validateur': devis_data.get('validateur'),
-                'motif_reduction': devis_data.get('motif_reduction'),
-                'details': json.dumps(devis_data.get('details', {})),  # JSON pour infos complémentaires
-                'pdf_data': devis_data.get('pdf_data'),  # PDF stocké en base64
-                'created_by': devis_data.get('created_by', 'Système'),
-                'date_creation': datetime.now().isoformat()
-            }
-            
-            response = self.client.table('devis').insert(data).execute()
+            if SAUVEGARDE_DIFFEREE:
+                data = _ligne_devis(devis_data, devis_data.get('pdf_data'))
+                try:
+                    file_sauvegardes.ajouter(OPERATION_DEVIS, data, devis_data.get('pdf_bytes'))
+                except (TypeError, ValueError):
+                    # Données non encodables : refusées comme par l'insertion directe
+                    raise
+                except Exception as e:
+                    journal_envois.error("evenement=sauvegarde_directe operation=%s erreur=%s", OPERATION_DEVIS, e)
+                    st.warning(f"⚠️ Journal des sauvegardes indisponible : devis envoyé directement à la base ({e})")
+                else:
+                    st.success(f"✅ Devis {data['numero_devis']} enregistré ! Envoi vers la base en arrière-plan.")
+                    return {**data, 'envoi': 'en_attente'}
+
+            pdf_data = devis_data.get('pdf_data')
+            if devis_data.get('pdf_bytes'):
+                pdf_data = self._deposer_pdf(devis_data['pdf_bytes'])
+            data = _ligne_devis(devis_data, pdf_data)
+
+            response = transport_base.ecrire("sauvegarder_devis", self.client.table('devis').insert(data))
+            cache_statistiques.invalider()
             
             if response.data:
                 st.success(f"✅ Devis {data['numero_devis']} sauvegardé avec succès !")
@@ -68,38 +168,147 @@ class DatabaseManager:
             st.error(f"❌ Erreur lors de la sauvegarde : {str(e)}")
             return None
     
-    def recuperer_devis(self, numero_devis: str = None, limit: int = 100) -> List[Dict]:
+    def envoyer_devis(self, data: Dict[str, Any], pdf_bytes: Optional[bytes] = None) -> None:
         """
-        Récupère les devis depuis la base de données.
+        Applique à la base un devis sorti du journal des sauvegardes (thread
+        d'envoi, sans affichage). Les erreurs sont relevées pour que la file
+        décide de réessayer (transitoires) ou de rejeter l'entrée.
+
+        Un devis déjà présent (même numero_devis) n'est pas réinséré : l'entrée
+        a pu être appliquée sans être marquée envoyée (réponse perdue, arrêt du
+        processus entre l'insertion et l'acquittement du journal).
+        """
+        existant = transport_base.lire(
+            "envoyer_devis.verifier",
+            self.client.table('devis').select('id').eq('numero_devis', data['numero_devis']).limit(1)
+        )
+        if existant.data:
+            return
+        if pdf_bytes:
+            try:
+                data = {**data, 'pdf_data': stockage_documents.deposer(pdf_bytes, 'pdf')}
+            except Exception as e:
+                if est_transitoire(e) or isinstance(e, ServiceIndisponible):
+                    raise
+                # Stockage refusé : PDF conservé en base64 dans la ligne, comme _deposer_pdf
+                import base64
+                data = {**data, 'pdf_data': base64.b64encode(pdf_bytes).decode('utf-8')}
+        transport_base.ecrire("envoyer_devis", self.client.table('devis').insert(data, returning=ReturnMethod.minimal))
+        cache_statistiques.invalider()
+
+    def _deposer_pdf(self, pdf_bytes: bytes) -> str:
+        """
+        Dépose le PDF dans le stockage de documents et retourne sa référence.
+        Si le stockage est indisponible, le PDF est conservé en base64 dans la
+        ligne (ancien format) plutôt que perdu.
+        """
+        try:
+            return stockage_documents.deposer(pdf_bytes, 'pdf')
+        except Exception as e:
+            import base64
+            st.warning(f"⚠️ Stockage des documents indisponible, PDF conservé dans le devis : {str(e)}")
+            return base64.b64encode(pdf_bytes).decode('utf-8')
+    
+    @mesurer("supabase.recuperer_pdf_devis")
+    def recuperer_pdf_devis(self, numero_devis: str) -> Optional[bytes]:
+        """
+        Récupère le PDF d'un devis, à la demande.
+        
+        Args:
+            numero_devis: Numéro du devis
+            
+        Returns:
+            Contenu du PDF, ou None si le devis n'a pas de PDF enregistré
+        """
+        try:
+            response = transport_base.lire("recuperer_pdf_devis", self.client.table('devis').select('pdf_data').eq('numero_devis', numero_devis).limit(1))
+            if not response.data or not response.data[0].get('pdf_data'):
+                return None
+            pdf_data = response.data[0]['pdf_data']
+            if est_reference(pdf_data):
+                return stockage_documents.lire(pdf_data)
+            # Anciens devis : PDF encodé en base64 dans la ligne
+            import base64
+            return base64.b64decode(pdf_data)
+            
+        except Exception as e:
+            st.error(f"❌ Erreur lors de la récupération du PDF : {str(e)}")
+            return None
+    
+    @mesurer("supabase.recuperer_devis")
+    def recuperer_devis(self, numero_devis: str = None, limit: int = TAILLE_PAGE_DEFAUT,
+                        colonnes: str = COLONNES_LISTE_DEVIS,
+                        apres: Optional[Curseur] = None, avant: Optional[Curseur] = None) -> Page:
+        """
+        Récupère une page de devis depuis la base de données, les plus récents d'abord.
         
         Args:
             numero_devis: Numéro spécifique de devis (optionnel)
-            limit: Nombre maximum de résultats
+            limit: Nombre de devis par page
+            colonnes: Projection (par défaut les colonnes de la liste ;
+                      COLONNES_DEVIS pour le détail complet)
+            apres: Curseur de la page suivante (page.curseur_suivant)
+            avant: Curseur de la page précédente (page.curseur_precedent)
             
         Returns:
-            Liste des devis
+            Page des devis (liste portant les curseurs de navigation)
         """
         try:
-            query = self.client.table('devis').select("*")
+            query = self.client.table('devis').select(colonnes)
             
             if numero_devis:
                 query = query.eq('numero_devis', numero_devis)
             
-            query = query.order('date_creation', desc=True).limit(limit)
-            response = query.execute()
+            page = paginer(query, limit, apres=apres, avant=avant, nom="recuperer_devis")
             
-            if response.data:
-                # Convertir les détails JSON en dict
-                for devis in response.data:
-                    if devis.get('details'):
-                        devis['details'] = json.loads(devis['details'])
-                return response.data
-            return []
+            if page:
+                chronometre.enregistrer_volume_reponse("supabase.recuperer_devis", page)
+                _decoder_details(page)
+            return page
             
         except Exception as e:
             st.error(f"❌ Erreur lors de la récupération : {str(e)}")
-            return []
+            return Page()
     
+    @mesurer("supabase.obtenir_devis")
+    def obtenir_devis(self, devis_id: int) -> Optional[Dict]:
+        """
+        Détail complet d'un devis (détails JSON compris, hors PDF), lu
+        uniquement lorsqu'une action sur la ligne en a besoin.
+        """
+        try:
+            response = transport_base.lire("obtenir_devis", self.client.table('devis').select(COLONNES_DEVIS).eq('id', devis_id).limit(1))
+            if response.data:
+                chronometre.enregistrer_volume_reponse("supabase.obtenir_devis", response.data)
+                return _decoder_details(response.data)[0]
+            return None
+            
+        except Exception as e:
+            st.error(f"❌ Erreur lors de la récupération du devis : {str(e)}")
+            return None
+    
+    @mesurer("supabase.obtenir_champs_details")
+    def obtenir_champs_details(self, devis_id: int, *champs: str) -> Dict[str, Any]:
+        """
+        Sous-champs de `details` d'un devis, extraits par la base : seuls les
+        champs demandés sont transférés (ex: obtenir_champs_details(id, 'pdf_options_data')).
+        """
+        try:
+            colonnes = ", ".join(champ_json('details', champ) for champ in champs)
+            response = transport_base.lire(
+                "obtenir_champs_details",
+                self.client.table('devis').select(colonnes).eq('id', devis_id).limit(1)
+            )
+            if response.data:
+                chronometre.enregistrer_volume_reponse("supabase.obtenir_champs_details", response.data)
+                return response.data[0]
+            return {}
+            
+        except Exception as e:
+            st.error(f"❌ Erreur lors de la récupération du devis : {str(e)}")
+            return {}
+    
+    @mesurer("supabase.mettre_a_jour_statut_devis")
     def mettre_a_jour_statut_devis(self, numero_devis: str, nouveau_statut: str) -> bool:
         """
         Met à jour le statut d'un devis.
@@ -112,10 +321,11 @@ class DatabaseManager:
             True si succès, False sinon
         """
         try:
-            response = self.client.table('devis').update({
+            response = transport_base.ecrire("mettre_a_jour_statut_devis", self.client.table('devis').update({
                 'statut': nouveau_statut,
                 'date_modification': datetime.now().isoformat()
-            }).eq('numero_devis', numero_devis).execute()
+            }).eq('numero_devis', numero_devis))
+            cache_statistiques.invalider()
             
             if response.data:
                 st.success(f"✅ Statut du devis {numero_devis} mis à jour : {nouveau_statut}")
@@ -126,6 +336,7 @@ class DatabaseManager:
             st.error(f"❌ Erreur lors de la mise à jour : {str(e)}")
             return False
     
+    @mesurer("supabase.supprimer_devis")
     def supprimer_devis(self, numero_devis: str) -> bool:
         """
         Supprime un devis de la base de données.
@@ -137,7 +348,8 @@ class DatabaseManager:
             True si succès, False sinon
         """
         try:
-            response = self.client.table('devis').delete().eq('numero_devis', numero_devis).execute()
+            response = transport_base.ecrire("supprimer_devis", self.client.table('devis').delete().eq('numero_devis', numero_devis))
+            cache_statistiques.invalider()
             
             if response.data:
                 return True
@@ -149,6 +361,7 @@ class DatabaseManager:
     
     # ==================== ASSURÉS ====================
     
+    @mesurer("supabase.sauvegarder_assure")
     def sauvegarder_assure(self, assure_data: Dict[str, Any]) -> Optional[Dict]:
         """
         Sauvegarde les informations d'un assuré.
@@ -160,30 +373,9 @@ class DatabaseManager:
             L'assuré créé ou None en cas d'erreur
         """
         try:
-            data = {
-                'numero_devis': assure_data.get('numero_devis'),
-                'type_assure': assure_data.get('type_assure'),  # Principal, Conjoint, Enfant
-                'nom': assure_data.get('nom'),
-                'prenom': assure_data.get('prenom'),
-                'date_naissance': assure_data.get('date_naissance').isoformat() if isinstance(assure_data.get('date_naissance'), date) else assure_data.get('date_naissance'),
-                'lieu_naissance': assure_data.get('lieu_naissance'),
-                'contact': assure_data.get('contact'),
-                'numero_cnam': assure_data.get('numero_cnam'),
-                'nationalite': assure_data.get('nationalite'),
-                'etat_civil': assure_data.get('etat_civil'),
-                'emploi_actuel': assure_data.get('emploi_actuel'),
-                'taille': assure_data.get('taille'),
-                'poids': assure_data.get('poids'),
-                'imc': assure_data.get('imc'),
-                'tension_arterielle': assure_data.get('tension_arterielle'),
-                'affections': json.dumps(assure_data.get('affections', [])),
-                'grossesse': assure_data.get('grossesse', False),
-                'sexe': assure_data.get('sexe'),
-                'details': json.dumps(assure_data.get('details', {})),
-                'date_creation': datetime.now().isoformat()
-            }
+            data = _ligne_assure(assure_data, datetime.now().isoformat())
             
-            response = self.client.table('assures').insert(data).execute()
+            response = transport_base.ecrire("sauvegarder_assure", self.client.table('assures').insert(data))
             
             if response.data:
                 return response.data[0]
@@ -193,18 +385,82 @@ class DatabaseManager:
             st.error(f"❌ Erreur lors de la sauvegarde de l'assuré : {str(e)}")
             return None
     
+    @mesurer("supabase.sauvegarder_assures_bulk")
+    def sauvegarder_assures_bulk(self,
+                                 assures: List[Dict[str, Any]],
+                                 taille_lot: int = TAILLE_LOT_ASSURES,
+                                 nb_paralleles: int = ENVOIS_PARALLELES_ASSURES,
+                                 progression: Optional[Callable[[float], None]] = None) -> Dict[str, Any]:
+        """
+        Sauvegarde une liste d'assurés (ex: recensement corporate de plusieurs
+        milliers de membres) par insertions multi-lignes.
+        
+        Les assurés sont découpés en lots de `taille_lot` lignes, envoyés avec
+        au plus `nb_paralleles` requêtes simultanées. Un lot en échec
+        n'interrompt pas les autres : il est signalé dans le rapport.
+        
+        Args:
+            assures: Infos des assurés (mêmes clés que sauvegarder_assure)
+            taille_lot: Nombre de lignes par requête d'insertion
+            nb_paralleles: Nombre maximal de requêtes simultanées
+            progression: Appelée avec la fraction des lots traités (0 à 1)
+            
+        Returns:
+            Rapport : nb_assures, nb_inseres, nb_lots, duree (s), debit
+            (assurés insérés par seconde) et echecs, une entrée par lot en
+            échec {lot, debut, fin, erreur} où assures[debut:fin] sont les
+            assurés à renvoyer.
+        """
+        debut_envoi = time.perf_counter()
+        date_creation = datetime.now().isoformat()
+        taille_lot = max(1, taille_lot)
+        lots = [
+            (debut, [_ligne_assure(a, date_creation) for a in assures[debut:debut + taille_lot]])
+            for debut in range(0, len(assures), taille_lot)
+        ]
+        
+        def inserer(lignes: List[Dict[str, Any]]) -> int:
+            # Retour minimal : la base ne renvoie pas les lignes insérées
+            transport_base.ecrire("sauvegarder_assures_bulk", self.client.table('assures').insert(lignes, returning=ReturnMethod.minimal))
+            return len(lignes)
+        
+        nb_inseres = 0
+        echecs = []
+        if lots:
+            nb_workers = max(1, min(nb_paralleles, len(lots)))
+            with ThreadPoolExecutor(max_workers=nb_workers, thread_name_prefix="akora-assures") as executor:
+                envois = {
+                    executor.submit(inserer, lignes): (numero, debut, len(lignes))
+                    for numero, (debut, lignes) in enumerate(lots)
+                }
+                for nb_traites, envoi in enumerate(as_completed(envois), start=1):
+                    numero, debut, nb_lignes = envois[envoi]
+                    try:
+                        nb_inseres += envoi.result()
+                    except Exception as e:
+                        echecs.append({'lot': numero, 'debut': debut, 'fin': debut + nb_lignes, 'erreur': str(e)})
+                    if progression is not None:
+                        progression(nb_traites / len(lots))
+        
+        duree = time.perf_counter() - debut_envoi
+        echecs.sort(key=lambda echec: echec['lot'])
+        return {
+            'nb_assures': len(assures),
+            'nb_inseres': nb_inseres,
+            'nb_lots': len(lots),
+            'echecs': echecs,
+            'duree': duree,
+            'debit': nb_inseres / duree if duree > 0 else 0.0
+        }
+    
+    @mesurer("supabase.recuperer_assures_par_devis")
     def recuperer_assures_par_devis(self, numero_devis: str) -> List[Dict]:
         """Récupère tous les assurés d'un devis."""
         try:
-            response = self.client.table('assures').select("*").eq('numero_devis', numero_devis).execute()
+            response = transport_base.lire("recuperer_assures_par_devis", self.client.table('assures').select("*").eq('numero_devis', numero_devis))
             
             if response.data:
-                for assure in response.data:
-                    if assure.get('affections'):
-                        assure['affections'] = json.loads(assure['affections'])
-                    if assure.get('details'):
-                        assure['details'] = json.loads(assure['details'])
-                return response.data
+                return decoder_colonnes(response.data, COLONNES_JSON['assures'])
             return []
             
         except Exception as e:
@@ -213,6 +469,7 @@ class DatabaseManager:
     
     # ==================== COTATIONS CORPORATE EXCEL ====================
     
+    @mesurer("supabase.sauvegarder_cotation_excel")
     def sauvegarder_cotation_excel(self, cotation_data: Dict[str, Any]) -> Optional[Dict]:
         """Sauvegarde une cotation Excel (micro-tarification)."""
         try:
@@ -230,11 +487,11 @@ class DatabaseManager:
                 'reduction_commerciale': cotation_data.get('reduction_commerciale', 0),
                 'duree_contrat': cotation_data.get('duree_contrat', 12),
                 'statut': cotation_data.get('statut', 'En cours'),
-                'resultats_detailles': json.dumps(cotation_data.get('resultats_detailles', {})),
+                'resultats_detailles': cotation_data.get('resultats_detailles', {}),
                 'date_creation': datetime.now().isoformat()
             }
             
-            response = self.client.table('cotations_excel').insert(data).execute()
+            response = transport_base.ecrire("sauvegarder_cotation_excel", self.client.table('cotations_excel').insert(data))
             
             if response.data:
                 st.success(f"✅ Cotation Excel sauvegardée !")
@@ -247,48 +504,60 @@ class DatabaseManager:
     
     # ==================== STATISTIQUES ====================
     
-    def get_statistiques_globales(self) -> Dict[str, Any]:
-        """Récupère les statistiques globales."""
+    @mesurer("supabase.get_statistiques_globales")
+    def get_statistiques_globales(self, lever_erreurs: bool = False) -> Dict[str, Any]:
+        """
+        Récupère les statistiques globales des devis, agrégées par la base en
+        une requête (fonction statistiques_portefeuille, voir statistiques.py).
+        `groupes` détaille les compteurs par (statut, type_marche) pour les filtres.
+        Avec `lever_erreurs`, une erreur est relevée au lieu d'être affichée
+        (appel hors du thread du script, voir chargement.py).
+        """
         try:
-            # Total devis
-            total_devis = self.client.table('devis').select("*", count='exact').execute()
-            
-            # Devis par statut
-            devis_finalises = self.client.table('devis').select("*", count='exact').eq('statut', 'Finalisé').execute()
-            devis_en_attente = self.client.table('devis').select("*", count='exact').eq('statut', 'En attente').execute()
-            
-            # Devis par type
-            devis_particuliers = self.client.table('devis').select("*", count='exact').eq('type_marche', 'Particulier').execute()
-            devis_corporate = self.client.table('devis').select("*", count='exact').eq('type_marche', 'Corporate').execute()
-            
-            # Total primes
-            all_devis = self.client.table('devis').select("prime_finale").execute()
-            total_primes = sum(d.get('prime_finale', 0) for d in all_devis.data) if all_devis.data else 0
+            agregat = cache_statistiques.obtenir(lambda: statistiques_supabase(self.client))
+            groupes = agregat.get('devis') or []
+            total_devis, total_primes = cumuler(groupes)
             
             return {
-                'total_devis': total_devis.count if hasattr(total_devis, 'count') else 0,
-                'devis_finalises': devis_finalises.count if hasattr(devis_finalises, 'count') else 0,
-                'devis_en_attente': devis_en_attente.count if hasattr(devis_en_attente, 'count') else 0,
-                'devis_particuliers': devis_particuliers.count if hasattr(devis_particuliers, 'count') else 0,
-                'devis_corporate': devis_corporate.count if hasattr(devis_corporate, 'count') else 0,
-                'total_primes': total_primes
+                'total_devis': total_devis,
+                'devis_finalises': cumuler(groupes, statut='Finalisé')[0],
+                'devis_en_attente': cumuler(groupes, statut='En attente')[0],
+                'devis_particuliers': cumuler(groupes, type_marche='Particulier')[0],
+                'devis_corporate': cumuler(groupes, type_marche='Corporate')[0],
+                'total_primes': total_primes,
+                'groupes': groupes
             }
             
         except Exception as e:
+            if lever_erreurs:
+                raise
             st.error(f"❌ Erreur lors de la récupération des statistiques : {str(e)}")
             return {}
     
     # ==================== RECHERCHE ====================
     
+    @mesurer("supabase.rechercher_devis")
     def rechercher_devis(self, 
                         type_marche: str = None,
                         statut: str = None,
                         date_debut: str = None,
                         date_fin: str = None,
-                        nom_client: str = None) -> List[Dict]:
-        """Recherche avancée de devis avec filtres."""
+                        nom_client: str = None,
+                        texte: str = None,
+                        details: Optional[Dict[str, Any]] = None,
+                        limit: int = TAILLE_PAGE_DEFAUT,
+                        apres: Optional[Curseur] = None,
+                        avant: Optional[Curseur] = None,
+                        lever_erreurs: bool = False) -> Page:
+        """
+        Recherche avancée de devis avec filtres, page par page (voir recuperer_devis).
+        `texte` est cherché dans le numéro, le client, l'entreprise et le produit.
+        `details` filtre côté serveur sur le contenu JSON (details @> ...),
+        ex: details={'bareme_special': True}.
+        Avec `lever_erreurs`, une erreur est relevée au lieu d'être affichée.
+        """
         try:
-            query = self.client.table('devis').select("*")
+            query = self.client.table('devis').select(COLONNES_LISTE_DEVIS)
             
             if type_marche:
                 query = query.eq('type_marche', type_marche)
@@ -305,15 +574,34 @@ class DatabaseManager:
             if nom_client:
                 query = query.ilike('nom_client', f'%{nom_client}%')
             
-            response = query.order('date_creation', desc=True).execute()
+            if texte:
+                # Valeur entre guillemets : le texte peut contenir des virgules
+                terme = texte.replace('"', '')
+                motif = f'"%{terme}%"'
+                query = query.or_(
+                    f"numero_devis.ilike.{motif},nom_client.ilike.{motif},"
+                    f"entreprise.ilike.{motif},produit.ilike.{motif}"
+                )
             
-            if response.data:
-                for devis in response.data:
-                    if devis.get('details'):
-                        devis['details'] = json.loads(devis['details'])
-                return response.data
-            return []
+            if details:
+                query = query.contains('details', details)
+            
+            page = paginer(query, limit, apres=apres, avant=avant, nom="rechercher_devis")
+            
+            if page:
+                chronometre.enregistrer_volume_reponse("supabase.rechercher_devis", page)
+            return page
             
         except Exception as e:
+            if lever_erreurs:
+                raise
             st.error(f"❌ Erreur lors de la recherche : {str(e)}")
-            return []
+            return Page()
+
+
+def _envoyer_devis_differe(data: Dict[str, Any], pdf_bytes: Optional[bytes], tentatives: int):
+    DatabaseManager().envoyer_devis(data, pdf_bytes)
+
+
+# Reprend aussi les devis restés dans le journal lors d'un arrêt précédent
+file_sauvegardes.enregistrer_traitement(OPERATION_DEVIS, _envoyer_devis_differe)
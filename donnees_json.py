@@ -0,0 +1,108 @@
+"""
+Colonnes JSON natives (jsonb) et codec JSON rapide
+Assur Defender - Cotation Santé +
+
+Les colonnes devis.details, assures.affections, assures.details et
+cotations_excel.resultats_detailles étaient remplies avec json.dumps(...)
+puis relues avec json.loads(...) ligne par ligne. Elles sont désormais des
+colonnes jsonb : les gestionnaires envoient les dict / list tels quels et
+PostgREST les renvoie décodés. La base peut alors :
+
+- ne retourner que les sous-champs utiles à une vue, par projection
+  PostgREST (ex: select "id, pdf_options_data:details->pdf_options_data",
+  voir champ_json) ;
+- filtrer sur le contenu (ex: tous les devis au barème spécial :
+  .contains('details', {'bareme_special': True}), soit details @> '{...}'),
+  servi par un index GIN.
+
+Migration à exécuter une fois dans Supabase (SQL Editor), voir
+SQL_POSTGRES. Les lignes écrites avant la migration peuvent contenir une
+chaîne JSON : decoder_colonnes les décode encore à la lecture.
+
+Le codec orjson (s'il est installé) remplace le module json pour les
+décodages et la mesure des volumes. Les données destinées à la base (journal
+des sauvegardes, base SQLite locale) sont encodées par texte_json_requete,
+comme le corps des requêtes PostgREST : une valeur que l'insertion directe
+refuserait (ex: numpy.int64) est refusée aussi, au lieu d'être convertie
+en texte.
+"""
+
+import json
+from typing import Any, Dict, Iterable, List
+
+try:
+    import orjson
+except ImportError:  # orjson absent : module json standard
+    orjson = None
+
+
+# Colonnes JSON natives par table
+COLONNES_JSON = {
+    'devis': ('details',),
+    'assures': ('affections', 'details'),
+    'cotations_excel': ('resultats_detailles',),
+}
+
+SQL_POSTGRES = """
+-- Colonnes texte (ou jsonb contenant une chaîne) converties en jsonb
+alter table devis alter column details type jsonb using details::text::jsonb;
+alter table assures alter column affections type jsonb using affections::text::jsonb;
+alter table assures alter column details type jsonb using details::text::jsonb;
+alter table cotations_excel alter column resultats_detailles type jsonb using resultats_detailles::text::jsonb;
+
+-- Valeurs doublement encodées (json.dumps stocké dans une colonne jsonb)
+update devis set details = (details #>> '{}')::jsonb where jsonb_typeof(details) = 'string';
+update assures set affections = (affections #>> '{}')::jsonb where jsonb_typeof(affections) = 'string';
+update assures set details = (details #>> '{}')::jsonb where jsonb_typeof(details) = 'string';
+update cotations_excel set resultats_detailles = (resultats_detailles #>> '{}')::jsonb
+    where jsonb_typeof(resultats_detailles) = 'string';
+
+-- Filtres sur le contenu des détails (opérateur @>)
+create index if not exists devis_details_idx on devis using gin (details jsonb_path_ops);
+"""
+
+
+def octets_json(valeur: Any) -> bytes:
+    """Encodage JSON compact en UTF-8 (les types inconnus sont convertis en texte)."""
+    if orjson is not None:
+        return orjson.dumps(valeur, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(valeur, default=str, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def texte_json(valeur: Any) -> str:
+    """Encodage JSON compact, en texte."""
+    return octets_json(valeur).decode('utf-8')
+
+
+def texte_json_requete(valeur: Any) -> str:
+    """
+    Encodage identique au corps des requêtes PostgREST (json standard, via
+    httpx) : un type non JSON lève TypeError, NaN et l'infini ValueError.
+    """
+    return json.dumps(valeur, ensure_ascii=False, separators=(',', ':'), allow_nan=False)
+
+
+def lire_json(texte) -> Any:
+    """Décodage JSON (texte ou octets)."""
+    if orjson is not None:
+        return orjson.loads(texte)
+    return json.loads(texte)
+
+
+def decoder_colonnes(lignes: List[Dict[str, Any]], colonnes: Iterable[str]) -> List[Dict[str, Any]]:
+    """Décode les valeurs encore stockées en chaîne JSON (lignes antérieures à la migration jsonb)."""
+    colonnes = tuple(colonnes)
+    for ligne in lignes:
+        for colonne in colonnes:
+            if isinstance(ligne.get(colonne), str):
+                ligne[colonne] = lire_json(ligne[colonne])
+    return lignes
+
+
+def champ_json(colonne: str, *chemin: str, alias: str = None) -> str:
+    """
+    Projection PostgREST d'un sous-champ JSON, retourné décodé sous le nom
+    `alias` (par défaut la dernière clé) : champ_json('details', 'facteurs')
+    donne 'facteurs:details->facteurs'.
+    """
+    return f"{alias or chemin[-1]}:{colonne}->" + "->".join(chemin)
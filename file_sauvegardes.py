@@ -0,0 +1,367 @@
+"""
+File d'attente des sauvegardes (write-behind) avec journal local durable
+Assur Defender - Cotation Santé +
+
+Sauvegarder un devis envoyait, pendant le rerun, le PDF (plusieurs
+centaines de Ko) puis la ligne à la base : l'interface attendait le réseau,
+et un échec obligeait à refaire la cotation.
+
+Les sauvegardes sont désormais écrites dans un journal local (SQLite en
+mode WAL, synchronisé sur disque avant l'acquittement) puis acquittées
+immédiatement. Un thread d'envoi unique vide le journal vers la base :
+
+- ordre garanti : les entrées partent une à une dans l'ordre d'ajout ; une
+  entrée en échec transitoire (réseau, 5xx, disjoncteur ouvert) est
+  réessayée avec une attente exponentielle et bloque les suivantes ;
+- une entrée refusée par la base (erreur non transitoire) est marquée
+  « rejetée » et conservée ; elle peut être renvoyée depuis l'onglet
+  Paramétrages > Système ;
+- le journal survit à un redémarrage : les entrées non envoyées repartent
+  au lancement suivant. Une entrée peut avoir été appliquée sans être
+  marquée envoyée (réponse perdue, arrêt entre l'écriture et
+  l'acquittement) : son traitement doit vérifier qu'elle n'est pas déjà en
+  base avant d'écrire.
+
+Plusieurs processus peuvent partager un journal (même AKORA_JOURNAL_SAUVEGARDES) :
+avant l'envoi, l'entrée de tête est réservée par une mise à jour atomique
+(identifiant du processus, bail de AKORA_JOURNAL_BAIL_S). Tant que le bail
+court, les autres processus attendent : une entrée n'est envoyée que par un
+seul d'entre eux et l'ordre est conservé. Le bail d'un processus arrêté
+expire et l'entrée est reprise par un autre (ou au redémarrage).
+"""
+
+import logging
+import os
+import random
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from donnees_json import lire_json, texte_json_requete
+from instrumentation import chronometre
+from transport import ServiceIndisponible, est_transitoire
+
+
+SAUVEGARDE_DIFFEREE = os.environ.get("AKORA_SAUVEGARDE_DIFFEREE", "1") != "0"
+CHEMIN_JOURNAL = os.environ.get(
+    "AKORA_JOURNAL_SAUVEGARDES",
+    os.path.join(tempfile.gettempdir(), "akora_sauvegardes.sqlite3")
+)
+ATTENTE_BASE_ENVOI = float(os.environ.get("AKORA_ENVOI_ATTENTE_BASE_S", 0.5))
+ATTENTE_MAX_ENVOI = float(os.environ.get("AKORA_ENVOI_ATTENTE_MAX_S", 30))
+DUREE_CONSERVATION_ENVOYES = int(os.environ.get("AKORA_JOURNAL_CONSERVATION_H", 24)) * 3600
+# Durée de réservation d'une entrée par un processus (doit couvrir un envoi et ses reprises)
+DUREE_BAIL = float(os.environ.get("AKORA_JOURNAL_BAIL_S", 120))
+
+# Statuts d'une entrée du journal
+EN_ATTENTE = "en_attente"
+ENVOYEE = "envoyee"
+REJETEE = "rejetee"
+
+SCHEMA_JOURNAL = """
+create table if not exists sauvegardes (
+    id integer primary key autoincrement,
+    operation text not null,
+    donnees text not null,
+    document blob,
+    statut text not null default 'en_attente',
+    tentatives integer not null default 0,
+    derniere_erreur text,
+    date_ajout real not null,
+    date_envoi real,
+    proprietaire text,
+    bail real
+);
+create index if not exists sauvegardes_statut_id_idx on sauvegardes (statut, id);
+"""
+
+journal_envois = logging.getLogger("akora.sauvegardes")
+
+# Traitement d'une entrée : (données, document, nb de tentatives déjà faites)
+Traitement = Callable[[Dict[str, Any], Optional[bytes], int], Any]
+
+
+class EntreeJournal:
+    """Sauvegarde en attente lue dans le journal."""
+
+    def __init__(self, identifiant: int, operation: str, donnees: Dict[str, Any],
+                 document: Optional[bytes], tentatives: int, date_ajout: float):
+        self.id = identifiant
+        self.operation = operation
+        self.donnees = donnees
+        self.document = document
+        self.tentatives = tentatives
+        self.date_ajout = date_ajout
+
+
+class JournalSauvegardes:
+    """Journal SQLite des sauvegardes, dans l'ordre d'ajout."""
+
+    def __init__(self, chemin: str = CHEMIN_JOURNAL):
+        self.chemin = chemin
+        self._verrou = threading.Lock()
+        self._connexion = sqlite3.connect(chemin, check_same_thread=False, timeout=5)
+        self._connexion.execute("PRAGMA journal_mode=WAL")
+        # Acquittement après écriture sur disque
+        self._connexion.execute("PRAGMA synchronous=FULL")
+        self._connexion.executescript(SCHEMA_JOURNAL)
+        # Journaux créés avant la réservation des entrées
+        colonnes = {ligne[1] for ligne in self._connexion.execute("PRAGMA table_info(sauvegardes)")}
+        with self._connexion:
+            for colonne, type_sql in (('proprietaire', 'text'), ('bail', 'real')):
+                if colonne not in colonnes:
+                    self._connexion.execute(f"alter table sauvegardes add column {colonne} {type_sql}")
+
+    def ajouter(self, operation: str, donnees: Dict[str, Any], document: Optional[bytes] = None) -> int:
+        # Encodées comme pour l'envoi direct : TypeError / ValueError si la base les refuserait
+        texte = texte_json_requete(donnees)
+        with self._verrou, self._connexion:
+            curseur = self._connexion.execute(
+                "insert into sauvegardes (operation, donnees, document, date_ajout) values (?, ?, ?, ?)",
+                (operation, texte, document, time.time())
+            )
+            return curseur.lastrowid
+
+    def a_envoyer(self) -> bool:
+        """Vrai s'il reste au moins une entrée en attente."""
+        with self._verrou:
+            return self._connexion.execute(
+                "select exists(select 1 from sauvegardes where statut = ?)", (EN_ATTENTE,)
+            ).fetchone()[0] == 1
+
+    def reserver(self, proprietaire: str, duree_bail: float = DUREE_BAIL) -> Optional[EntreeJournal]:
+        """
+        Réserve la plus ancienne entrée en attente pour `proprietaire` et la
+        retourne ; None si le journal est vide ou si elle est réservée par un
+        autre processus dont le bail court encore.
+        """
+        maintenant = time.time()
+        with self._verrou:
+            with self._connexion:
+                # Une seule instruction : la réservation est atomique entre processus
+                self._connexion.execute(
+                    "update sauvegardes set proprietaire = ?, bail = ? "
+                    "where id = (select id from sauvegardes where statut = ? order by id limit 1) "
+                    "and (proprietaire is null or proprietaire = ? or bail < ?)",
+                    (proprietaire, maintenant + duree_bail, EN_ATTENTE, proprietaire, maintenant)
+                )
+            ligne = self._connexion.execute(
+                "select id, operation, donnees, document, tentatives, date_ajout "
+                "from sauvegardes where statut = ? and proprietaire = ? order by id limit 1",
+                (EN_ATTENTE, proprietaire)
+            ).fetchone()
+        if ligne is None:
+            return None
+        return EntreeJournal(ligne[0], ligne[1], lire_json(ligne[2]), ligne[3], ligne[4], ligne[5])
+
+    def marquer_envoyee(self, identifiant: int):
+        # Le document n'est plus utile une fois envoyé
+        with self._verrou, self._connexion:
+            self._connexion.execute(
+                "update sauvegardes set statut = ?, date_envoi = ?, document = null, derniere_erreur = null, "
+                "proprietaire = null, bail = null where id = ?",
+                (ENVOYEE, time.time(), identifiant)
+            )
+
+    def noter_echec(self, identifiant: int, erreur: str, statut: str = EN_ATTENTE):
+        # Une entrée rejetée est libérée ; une entrée à réessayer reste réservée
+        with self._verrou, self._connexion:
+            self._connexion.execute(
+                "update sauvegardes set statut = ?, tentatives = tentatives + 1, derniere_erreur = ?, "
+                "proprietaire = case when ? = ? then null else proprietaire end where id = ?",
+                (statut, erreur[:500], statut, REJETEE, identifiant)
+            )
+
+    def renvoyer_rejetees(self) -> int:
+        """Remet les entrées rejetées en attente (à leur place d'origine) ; retourne leur nombre."""
+        with self._verrou, self._connexion:
+            return self._connexion.execute(
+                "update sauvegardes set statut = ?, proprietaire = null, bail = null where statut = ?",
+                (EN_ATTENTE, REJETEE)
+            ).rowcount
+
+    def purger(self, duree: float = DUREE_CONSERVATION_ENVOYES):
+        with self._verrou, self._connexion:
+            self._connexion.execute(
+                "delete from sauvegardes where statut = ? and date_envoi < ?", (ENVOYEE, time.time() - duree)
+            )
+
+    def etat(self) -> Dict[str, Any]:
+        """Profondeur, volume et âge de la plus ancienne entrée en attente ; dernières rejetées."""
+        with self._verrou:
+            nombre, octets, plus_ancienne = self._connexion.execute(
+                "select count(*), coalesce(sum(length(donnees) + coalesce(length(document), 0)), 0), "
+                "min(date_ajout) from sauvegardes where statut = ?",
+                (EN_ATTENTE,)
+            ).fetchone()
+            derniere = self._connexion.execute(
+                "select date_envoi - date_ajout from sauvegardes where statut = ? order by date_envoi desc limit 1",
+                (ENVOYEE,)
+            ).fetchone()
+            rejetees = self._connexion.execute(
+                "select id, operation, derniere_erreur, date_ajout from sauvegardes "
+                "where statut = ? order by id desc limit 20",
+                (REJETEE,)
+            ).fetchall()
+        return {
+            'profondeur': nombre,
+            'octets_en_attente': octets,
+            'retard_s': time.time() - plus_ancienne if plus_ancienne is not None else 0.0,
+            'dernier_delai_envoi_s': derniere[0] if derniere else None,
+            'entrees_rejetees': [
+                {'id': r[0], 'operation': r[1], 'erreur': r[2], 'date_ajout': r[3]} for r in rejetees
+            ],
+        }
+
+
+class FileSauvegardes:
+    """Sauvegardes acquittées localement, envoyées à la base par un thread en arrière-plan."""
+
+    def __init__(self, chemin: str = CHEMIN_JOURNAL,
+                 attente_base: float = ATTENTE_BASE_ENVOI, attente_max: float = ATTENTE_MAX_ENVOI):
+        self.chemin = chemin
+        self.attente_base = attente_base
+        self.attente_max = attente_max
+        self._journal: Optional[JournalSauvegardes] = None
+        self._traitements: Dict[str, Traitement] = {}
+        self._verrou = threading.Lock()
+        self._reveil = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._hasard = random.Random()
+        # Identifiant de ce processus pour la réservation des entrées
+        self.proprietaire = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._echecs_consecutifs = 0
+        self._compteurs = {'ajoutees': 0, 'envoyees': 0, 'echecs': 0, 'rejetees': 0}
+        self._derniere_erreur: Optional[str] = None
+
+    @property
+    def journal(self) -> JournalSauvegardes:
+        # Ouvert au premier usage : l'import du module ne touche pas le disque
+        with self._verrou:
+            if self._journal is None:
+                self._journal = JournalSauvegardes(self.chemin)
+            return self._journal
+
+    def enregistrer_traitement(self, operation: str, traitement: Traitement):
+        """Déclare la fonction qui applique une opération à la base, puis reprend les envois en attente."""
+        self._traitements[operation] = traitement
+        try:
+            if self.journal.a_envoyer():
+                self._demarrer()
+        except sqlite3.Error as e:
+            # Journal inaccessible : les sauvegardes repasseront en direct (voir ajouter)
+            journal_envois.error("evenement=journal_indisponible chemin=%s erreur=%s", self.chemin, e)
+
+    def ajouter(self, operation: str, donnees: Dict[str, Any], document: Optional[bytes] = None) -> int:
+        """Écrit la sauvegarde dans le journal (durable) et retourne son numéro ; l'envoi suit en arrière-plan."""
+        if operation not in self._traitements:
+            raise ValueError(f"Opération sans traitement enregistré : {operation}")
+        identifiant = self.journal.ajouter(operation, donnees, document)
+        with self._verrou:
+            self._compteurs['ajoutees'] += 1
+        self._demarrer()
+        self._reveil.set()
+        return identifiant
+
+    def renvoyer_rejetees(self) -> int:
+        nombre = self.journal.renvoyer_rejetees()
+        if nombre:
+            self._demarrer()
+            self._reveil.set()
+        return nombre
+
+    def _demarrer(self):
+        with self._verrou:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._boucle, name="akora-sauvegardes", daemon=True)
+                self._thread.start()
+
+    def _attente(self) -> float:
+        plafond = min(self.attente_max, self.attente_base * (2 ** self._echecs_consecutifs))
+        return self._hasard.uniform(plafond / 2, plafond)
+
+    def _boucle(self):
+        purge = 0.0
+        while True:
+            try:
+                if time.time() - purge > 3600:
+                    self.journal.purger()
+                    purge = time.time()
+                entree = self.journal.reserver(self.proprietaire)
+                if entree is None:
+                    # Journal vide, ou tête réservée par un autre processus
+                    self._reveil.wait(timeout=60)
+                    self._reveil.clear()
+                    continue
+                traitement = self._traitements.get(entree.operation)
+                if traitement is None:
+                    self._rejeter(entree, f"Opération sans traitement enregistré : {entree.operation}")
+                    continue
+                self._envoyer(entree, traitement)
+            except sqlite3.Error as e:
+                # Journal momentanément inaccessible (verrou, disque) : le thread continue
+                self._echecs_consecutifs += 1
+                attente = self._attente()
+                journal_envois.error("evenement=journal_erreur chemin=%s attente_ms=%s erreur=%s",
+                                     self.chemin, round(attente * 1000), e)
+                time.sleep(attente)
+
+    def _rejeter(self, entree: EntreeJournal, erreur: str):
+        """Écarte l'entrée de la tête de file ; elle reste consultable et peut être renvoyée."""
+        self.journal.noter_echec(entree.id, erreur, statut=REJETEE)
+        with self._verrou:
+            self._compteurs['rejetees'] += 1
+        journal_envois.error(
+            "evenement=envoi_rejete entree=%s operation=%s erreur=%s",
+            entree.id, entree.operation, erreur[:200]
+        )
+
+    def _envoyer(self, entree: EntreeJournal, traitement: Traitement):
+        try:
+            with chronometre.section(f"sauvegardes.{entree.operation}"):
+                traitement(entree.donnees, entree.document, entree.tentatives)
+        except Exception as e:
+            erreur = f"{type(e).__name__}: {e}"
+            with self._verrou:
+                self._compteurs['echecs'] += 1
+                self._derniere_erreur = erreur
+            if est_transitoire(e) or isinstance(e, ServiceIndisponible):
+                # L'entrée reste en tête : les suivantes attendent pour garder l'ordre
+                self.journal.noter_echec(entree.id, erreur)
+                self._echecs_consecutifs += 1
+                attente = self._attente()
+                journal_envois.warning(
+                    "evenement=envoi_reporte entree=%s operation=%s tentatives=%s attente_ms=%s erreur=%s",
+                    entree.id, entree.operation, entree.tentatives + 1, round(attente * 1000), type(e).__name__
+                )
+                time.sleep(attente)
+            else:
+                self._rejeter(entree, erreur)
+            return
+        self.journal.marquer_envoyee(entree.id)
+        self._echecs_consecutifs = 0
+        with self._verrou:
+            self._compteurs['envoyees'] += 1
+
+    def statistiques(self) -> Dict[str, Any]:
+        """Profondeur et retard de la file, compteurs depuis le démarrage (onglet Système)."""
+        try:
+            etat = self.journal.etat()
+        except sqlite3.Error as e:
+            etat = {'profondeur': 0, 'octets_en_attente': 0, 'retard_s': 0.0,
+                    'dernier_delai_envoi_s': None, 'entrees_rejetees': [], 'journal_indisponible': str(e)}
+        with self._verrou:
+            return {
+                **etat,
+                **self._compteurs,
+                'envoi_actif': self._thread is not None and self._thread.is_alive(),
+                'derniere_erreur': self._derniere_erreur,
+            }
+
+
+# Instance globale : un journal et un thread d'envoi par processus
+file_sauvegardes = FileSauvegardes()
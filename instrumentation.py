@@ -0,0 +1,171 @@
+"""
+Mesure des temps d'exécution par rerun et par section
+Assur Defender - Cotation Santé +
+
+Chaque section nommée (rerun du script, onglet, appel Supabase, calcul de
+prime, génération PDF) conserve une fenêtre glissante de ses dernières
+durées en mémoire ; l'onglet Paramétrages > Système en affiche les
+percentiles p50/p95/p99. Les requêtes de liste y enregistrent aussi le
+volume de données reçu : l'en-tête Content-Length de la réponse PostgREST
+(relevé par un hook httpx, sans réencoder les données), ou à défaut la
+taille JSON des données mesurée sur un échantillon des requêtes.
+"""
+
+import functools
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List
+
+from donnees_json import octets_json
+
+
+TAILLE_FENETRE = int(os.environ.get("AKORA_FENETRE_MESURES", 1000))
+# Sans Content-Length (réponse en flux, base locale) : 1 requête mesurée sur N
+ECHANTILLON_VOLUMES = int(os.environ.get("AKORA_ECHANTILLON_VOLUMES", 20))
+
+# Taille de la dernière réponse HTTP reçue par chaque thread
+_derniere_reponse = threading.local()
+
+
+def percentile(valeurs_triees: List[float], p: float) -> float:
+    """Percentile (méthode du rang le plus proche) d'une liste déjà triée."""
+    if not valeurs_triees:
+        return 0.0
+    rang = min(len(valeurs_triees) - 1, max(0, math.ceil(p / 100 * len(valeurs_triees)) - 1))
+    return valeurs_triees[rang]
+
+
+def taille_json(donnees: Any) -> int:
+    """Taille en octets du JSON compact des données (≈ charge utile d'une réponse PostgREST)."""
+    return len(octets_json(donnees))
+
+
+def noter_reponse_http(reponse) -> None:
+    """Hook httpx (événement 'response') : retient la taille annoncée de la réponse pour le thread courant."""
+    longueur = reponse.headers.get('content-length')
+    _derniere_reponse.octets = int(longueur) if longueur and longueur.isdigit() else None
+
+
+class Chronometre:
+    """Fenêtres glissantes de durées par section, partagées par tout le processus."""
+
+    def __init__(self, taille_fenetre: int = TAILLE_FENETRE):
+        self.taille_fenetre = taille_fenetre
+        self._durees: Dict[str, deque] = {}
+        self._nb_total: Dict[str, int] = {}
+        self._erreurs: Dict[str, int] = {}
+        self._volumes: Dict[str, deque] = {}
+        self._sans_longueur: Dict[str, int] = {}
+        self._verrou = threading.Lock()
+
+    def enregistrer(self, section: str, duree: float, erreur: bool = False):
+        """Ajoute une durée (en secondes) à la fenêtre d'une section."""
+        with self._verrou:
+            if section not in self._durees:
+                self._durees[section] = deque(maxlen=self.taille_fenetre)
+            self._durees[section].append(duree)
+            self._nb_total[section] = self._nb_total.get(section, 0) + 1
+            if erreur:
+                self._erreurs[section] = self._erreurs.get(section, 0) + 1
+
+    def enregistrer_volume(self, section: str, octets: int):
+        """Ajoute le volume (en octets) des données reçues par une section."""
+        with self._verrou:
+            if section not in self._volumes:
+                self._volumes[section] = deque(maxlen=self.taille_fenetre)
+            self._volumes[section].append(octets)
+
+    def enregistrer_volume_reponse(self, section: str, donnees: Any):
+        """
+        Enregistre le volume de la réponse qui a produit `donnees` (à appeler
+        dans le thread de la requête) : Content-Length de la dernière réponse
+        HTTP, sinon taille JSON des données une fois sur ECHANTILLON_VOLUMES.
+        """
+        octets = getattr(_derniere_reponse, 'octets', None)
+        _derniere_reponse.octets = None
+        if octets is None:
+            with self._verrou:
+                rang = self._sans_longueur.get(section, 0)
+                self._sans_longueur[section] = rang + 1
+            if rang % max(1, ECHANTILLON_VOLUMES):
+                return
+            octets = taille_json(donnees)
+        self.enregistrer_volume(section, octets)
+
+    @contextmanager
+    def section(self, nom: str):
+        """Mesure la durée du bloc `with`."""
+        debut = time.perf_counter()
+        erreur = False
+        try:
+            yield
+        except Exception:
+            erreur = True
+            raise
+        finally:
+            self.enregistrer(nom, time.perf_counter() - debut, erreur)
+
+    def mesurer(self, nom: str) -> Callable:
+        """Décorateur mesurant chaque appel de la fonction décorée."""
+        def decorateur(fonction):
+            @functools.wraps(fonction)
+            def wrapper(*args, **kwargs):
+                with self.section(nom):
+                    return fonction(*args, **kwargs)
+            return wrapper
+        return decorateur
+
+    def percentiles(self) -> List[Dict[str, Any]]:
+        """Une ligne par section : nombre d'appels, p50/p95/p99 et max en millisecondes."""
+        with self._verrou:
+            instantane = {nom: sorted(d) for nom, d in self._durees.items()}
+            nb_total = dict(self._nb_total)
+            erreurs = dict(self._erreurs)
+
+        lignes = []
+        for nom, durees in sorted(instantane.items()):
+            lignes.append({
+                "section": nom,
+                "appels": nb_total.get(nom, 0),
+                "erreurs": erreurs.get(nom, 0),
+                "p50_ms": percentile(durees, 50) * 1000,
+                "p95_ms": percentile(durees, 95) * 1000,
+                "p99_ms": percentile(durees, 99) * 1000,
+                "max_ms": (durees[-1] if durees else 0.0) * 1000,
+            })
+        return lignes
+
+    def volumes(self) -> List[Dict[str, Any]]:
+        """Une ligne par section : nombre de mesures, volume médian, maximal et cumulé en octets."""
+        with self._verrou:
+            instantane = {nom: sorted(v) for nom, v in self._volumes.items()}
+
+        return [
+            {
+                "section": nom,
+                "mesures": len(volumes),
+                "p50_octets": percentile(volumes, 50),
+                "max_octets": volumes[-1],
+                "total_octets": sum(volumes),
+            }
+            for nom, volumes in sorted(instantane.items())
+            if volumes
+        ]
+
+    def reinitialiser(self):
+        """Efface toutes les mesures."""
+        with self._verrou:
+            self._durees.clear()
+            self._nb_total.clear()
+            self._erreurs.clear()
+            self._volumes.clear()
+            self._sans_longueur.clear()
+
+
+# Instance globale du chronomètre
+chronometre = Chronometre()
+mesurer = chronometre.mesurer
@@ -0,0 +1,272 @@
+"""
+Exécution en arrière-plan des traitements longs (micro-tarification, PDF)
+Assur Defender - Cotation Santé +
+
+Les tâches sont exécutées par un pool de threads, indépendamment du thread
+du script Streamlit : elles survivent aux reruns, ainsi qu'au rechargement
+de la page (rattachées au jeton de session de l'URL, voir JetonsSession),
+et un utilisateur peut en mettre plusieurs en file. Chaque tâche attend son admission dans la file de
+l'ordonnanceur (scheduler) et n'est confiée au pool qu'une fois admise : le
+pool a autant de threads que l'ordonnanceur a de créneaux, aucune tâche
+n'attend donc hors de la file équitable. Les résultats sont conservés dans le
+stockage de session (session_store), pas dans st.session_state.
+"""
+
+import os
+import threading
+import time
+import uuid
+import traceback
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from session_store import FichierSession, SessionBlobStore, session_store
+from scheduler import Ordonnanceur, ordonnanceur, PRIORITE_LOURDE
+
+
+DUREE_CONSERVATION_SECONDES = int(os.environ.get("AKORA_JOBS_TTL_MIN", 120)) * 60
+
+# Statuts possibles d'une tâche
+EN_ATTENTE = "en_attente"
+EN_COURS = "en_cours"
+TERMINE = "termine"
+ERREUR = "erreur"
+ANNULE = "annule"
+STATUTS_FINAUX = (TERMINE, ERREUR, ANNULE)
+
+
+class JobAnnule(Exception):
+    """Levée dans une tâche dont l'annulation a été demandée."""
+
+
+class Job:
+    """Tâche soumise au JobRunner."""
+
+    def __init__(self, proprietaire: str, type_job: str, libelle: str, priorite: int = PRIORITE_LOURDE):
+        self.id = uuid.uuid4().hex[:12]
+        self.proprietaire = proprietaire
+        self.type_job = type_job
+        self.libelle = libelle
+        self.priorite = priorite
+        self.statut = EN_ATTENTE
+        self.progression = 0.0
+        self.message = ""
+        self.erreur: Optional[str] = None
+        self.date_soumission = time.time()
+        self.date_debut: Optional[float] = None
+        self.date_fin: Optional[float] = None
+        self._annulation = threading.Event()
+        self._future: Optional[Future] = None
+        self._ordonnanceur: Optional[Ordonnanceur] = None
+        self._demande = None
+
+    def signaler_progression(self, fait: int, total: int, message: str = None):
+        """
+        Met à jour la progression de la tâche. À appeler régulièrement par la
+        fonction exécutée : lève JobAnnule si l'annulation a été demandée.
+        """
+        if self._annulation.is_set():
+            raise JobAnnule()
+        self.progression = min(1.0, fait / total) if total else 0.0
+        if message is not None:
+            self.message = message
+        if self._ordonnanceur is not None:
+            self._ordonnanceur.ceder(self.priorite)
+
+    def annulation_demandee(self) -> bool:
+        """Indique si l'annulation de la tâche a été demandée."""
+        return self._annulation.is_set()
+
+    def en_dict(self) -> Dict[str, Any]:
+        """Instantané de l'état de la tâche pour affichage."""
+        fin = self.date_fin or time.time()
+        if self.statut == EN_ATTENTE and self._demande is not None:
+            rang = self._ordonnanceur.rang(self._demande)
+            self.message = f"En file d'attente ({rang} tâche{'s' if rang > 1 else ''} avant)" if rang else "En file d'attente..."
+        return {
+            "id": self.id,
+            "type_job": self.type_job,
+            "libelle": self.libelle,
+            "statut": self.statut,
+            "progression": self.progression,
+            "message": self.message,
+            "erreur": self.erreur,
+            "soumis_le": datetime.fromtimestamp(self.date_soumission).strftime("%H:%M:%S"),
+            "duree": (fin - self.date_debut) if self.date_debut else 0.0,
+            "attente": ((self.date_debut or fin) - self.date_soumission),
+        }
+
+
+class JobRunner:
+    """Pool de workers borné exécutant les tâches admises par l'ordonnanceur."""
+
+    def __init__(
+        self,
+        store: SessionBlobStore = session_store,
+        duree_conservation: int = DUREE_CONSERVATION_SECONDES,
+        ordonnanceur: Ordonnanceur = ordonnanceur
+    ):
+        self.store = store
+        self.ordonnanceur = ordonnanceur
+        self.duree_conservation = duree_conservation
+        # Un thread par créneau : une tâche admise démarre aussitôt
+        self._executor = ThreadPoolExecutor(max_workers=ordonnanceur.nb_creneaux, thread_name_prefix="akora-job")
+        self._jobs: Dict[str, Job] = {}
+        self._verrou = threading.Lock()
+
+    # ==================== SOUMISSION ====================
+
+    def soumettre(
+        self,
+        proprietaire: str,
+        type_job: str,
+        libelle: str,
+        fonction: Callable[..., Any],
+        *args,
+        priorite: int = PRIORITE_LOURDE,
+        **kwargs
+    ) -> str:
+        """
+        Soumet une tâche : elle est mise dans la file de l'ordonnanceur, puis
+        confiée au pool à son admission.
+
+        Args:
+            proprietaire: Identifiant de la session propriétaire
+            type_job: Type de tâche (ex: 'micro_tarification', 'pdf_proposition')
+            libelle: Libellé affiché à l'utilisateur
+            fonction: Callable appelé avec `job` en premier argument, puis *args/**kwargs
+            priorite: File de l'ordonnanceur (PRIORITE_INTERACTIVE ou PRIORITE_LOURDE)
+
+        Returns:
+            L'identifiant de la tâche
+        """
+        self._purger()
+        job = Job(proprietaire, type_job, libelle, priorite)
+        job._ordonnanceur = self.ordonnanceur
+        with self._verrou:
+            self._jobs[job.id] = job
+
+        def lancer(demande):
+            job._future = self._executor.submit(self._executer, job, demande, fonction, args, kwargs)
+
+        job._demande = self.ordonnanceur.reserver(proprietaire, priorite, lancer)
+        return job.id
+
+    def _executer(self, job: Job, demande, fonction: Callable[..., Any], args, kwargs):
+        try:
+            try:
+                if job._annulation.is_set():
+                    raise JobAnnule()
+                job.statut = EN_COURS
+                job.message = ""
+                job.date_debut = time.time()
+                resultat = fonction(job, *args, **kwargs)
+            finally:
+                self.ordonnanceur.liberer(demande)
+            if job.id not in self._jobs:
+                # Tâche oubliée pendant son exécution : résultat abandonné
+                if isinstance(resultat, FichierSession):
+                    os.remove(resultat.chemin)
+                return
+            if not self.store.stocker(job.proprietaire, self._cle_resultat(job.id), resultat):
+                raise MemoryError("Résultat trop volumineux pour le budget de session")
+            job.progression = 1.0
+            job.statut = TERMINE
+        except JobAnnule:
+            job.statut = ANNULE
+        except Exception as e:
+            job.erreur = str(e)
+            job.message = traceback.format_exc(limit=3)
+            job.statut = ERREUR
+        finally:
+            job.date_fin = time.time()
+
+    # ==================== SUIVI ====================
+
+    def statut(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """État courant d'une tâche, ou None si elle est inconnue."""
+        job = self._jobs.get(job_id)
+        return job.en_dict() if job else None
+
+    def resultat(self, job_id: str) -> Any:
+        """Résultat d'une tâche terminée, ou None."""
+        job = self._jobs.get(job_id)
+        if job is None or job.statut != TERMINE:
+            return None
+        return self.store.lire(job.proprietaire, self._cle_resultat(job_id))
+
+    def transferer_resultat(self, job_id: str, cle: str) -> bool:
+        """
+        Range le résultat d'une tâche terminée sous la clé `cle` de la session
+        propriétaire, sans le relire (archive sur disque) ; False s'il est absent.
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.statut != TERMINE:
+            return False
+        return self.store.renommer(job.proprietaire, self._cle_resultat(job_id), cle)
+
+    def lister(self, proprietaire: str, type_job: str = None) -> List[Dict[str, Any]]:
+        """Tâches d'une session, de la plus récente à la plus ancienne."""
+        with self._verrou:
+            jobs = [j for j in self._jobs.values() if j.proprietaire == proprietaire]
+        if type_job:
+            jobs = [j for j in jobs if j.type_job == type_job]
+        jobs.sort(key=lambda j: j.date_soumission, reverse=True)
+        return [j.en_dict() for j in jobs]
+
+    def dernier(self, proprietaire: str, type_job: str) -> Optional[Dict[str, Any]]:
+        """Dernière tâche d'un type donné pour une session."""
+        jobs = self.lister(proprietaire, type_job)
+        return jobs[0] if jobs else None
+
+    def nb_actifs(self, proprietaire: str = None) -> int:
+        """Nombre de tâches en attente ou en cours (d'une session ou au total)."""
+        with self._verrou:
+            return len([
+                j for j in self._jobs.values()
+                if j.statut not in STATUTS_FINAUX and (proprietaire is None or j.proprietaire == proprietaire)
+            ])
+
+    # ==================== CONTRÔLE ====================
+
+    def annuler(self, job_id: str) -> bool:
+        """Demande l'annulation d'une tâche (immédiate si elle n'a pas démarré)."""
+        job = self._jobs.get(job_id)
+        if job is None or job.statut in STATUTS_FINAUX:
+            return False
+        job._annulation.set()
+        if job._demande is not None and self.ordonnanceur.retirer(job._demande):
+            # Pas encore admise : retirée de la file
+            job.statut = ANNULE
+            job.date_fin = time.time()
+        elif job._future is not None and job._future.cancel():
+            self.ordonnanceur.liberer(job._demande)
+            job.statut = ANNULE
+            job.date_fin = time.time()
+        return True
+
+    def oublier(self, job_id: str):
+        """Retire une tâche terminée et son résultat."""
+        with self._verrou:
+            job = self._jobs.pop(job_id, None)
+        if job is not None:
+            self.store.supprimer(job.proprietaire, self._cle_resultat(job_id))
+
+    def _purger(self):
+        limite = time.time() - self.duree_conservation
+        with self._verrou:
+            expires = [
+                j for j in self._jobs.values()
+                if j.statut in STATUTS_FINAUX and (j.date_fin or 0) < limite
+            ]
+        for job in expires:
+            self.oublier(job.id)
+
+    @staticmethod
+    def _cle_resultat(job_id: str) -> str:
+        return f"job:{job_id}"
+
+
+# Instance globale du gestionnaire de tâches
+job_runner = JobRunner()
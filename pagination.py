@@ -0,0 +1,101 @@
+"""
+Pagination par curseur (keyset) des listes de cotations et de polices
+Assur Defender - Cotation Santé +
+
+Les listes sont triées par (date_creation, id) décroissants. Plutôt qu'un
+OFFSET, dont le coût croît avec l'historique, chaque page repart du
+dernier couple (date_creation, id) affiché :
+
+    page suivante   : date_creation < d  OU (date_creation = d ET id < i)
+    page précédente : date_creation > d  OU (date_creation = d ET id > i)
+
+Avec un index sur (date_creation DESC, id DESC), chaque page coûte le même
+prix quel que soit le nombre de lignes plus anciennes :
+
+    create index if not exists devis_date_creation_id_idx on devis (date_creation desc, id desc);
+    create index if not exists cotations_date_creation_id_idx on cotations (date_creation desc, id desc);
+    create index if not exists polices_date_creation_id_idx on polices (date_creation desc, id desc);
+"""
+
+import os
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from transport import transport_base
+
+
+TAILLES_PAGE = (25, 50, 100)
+TAILLE_PAGE_DEFAUT = int(os.environ.get("AKORA_TAILLE_PAGE", 50))
+
+# Curseur : (date_creation, id) de la ligne de bord de la page
+Curseur = Tuple[str, Any]
+
+
+def curseur_de(ligne: Dict[str, Any]) -> Curseur:
+    """Curseur correspondant à une ligne (elle doit contenir date_creation et id)."""
+    return (ligne['date_creation'], ligne['id'])
+
+
+def _filtre_apres(curseur: Curseur, operateur: str) -> str:
+    """Condition PostgREST « strictement après le curseur » dans le sens de l'opérateur (lt ou gt)."""
+    date_creation, identifiant = curseur
+    # Les horodatages contiennent ':' et '+' : la valeur est mise entre guillemets
+    return (
+        f'date_creation.{operateur}."{date_creation}",'
+        f'and(date_creation.eq."{date_creation}",id.{operateur}.{identifiant})'
+    )
+
+
+class Page(list):
+    """
+    Lignes d'une page, dans l'ordre d'affichage (les plus récentes d'abord).
+    Se comporte comme une liste ; porte en plus les curseurs de navigation.
+    """
+
+    def __init__(self, lignes: Iterable[Dict[str, Any]] = (), a_suivante: bool = False, a_precedente: bool = False):
+        super().__init__(lignes)
+        self.a_suivante = a_suivante
+        self.a_precedente = a_precedente
+
+    @property
+    def curseur_suivant(self) -> Optional[Curseur]:
+        """Curseur de la page suivante (plus anciennes), ou None."""
+        return curseur_de(self[-1]) if self and self.a_suivante else None
+
+    @property
+    def curseur_precedent(self) -> Optional[Curseur]:
+        """Curseur de la page précédente (plus récentes), ou None."""
+        return curseur_de(self[0]) if self and self.a_precedente else None
+
+
+def paginer(query, taille: int = TAILLE_PAGE_DEFAUT,
+            apres: Optional[Curseur] = None, avant: Optional[Curseur] = None,
+            nom: str = "paginer") -> Page:
+    """
+    Exécute une requête PostgREST (select déjà filtré, sans tri ni limite)
+    et retourne une page de `taille` lignes.
+
+    Args:
+        query: Requête construite par client.table(...).select(...)
+        taille: Nombre de lignes par page
+        apres: Curseur de la page suivante (lignes plus anciennes)
+        avant: Curseur de la page précédente (lignes plus récentes)
+        nom: Nom de l'appel dans les journaux du transport
+    """
+    if avant is not None:
+        # On remonte vers les plus récentes en ordre croissant, puis on retourne la page
+        query = query.or_(_filtre_apres(avant, 'gt'))
+        query = query.order('date_creation').order('id')
+    else:
+        if apres is not None:
+            query = query.or_(_filtre_apres(apres, 'lt'))
+        query = query.order('date_creation', desc=True).order('id', desc=True)
+
+    # Une ligne de plus que la page : indique s'il reste des lignes au-delà
+    lignes = transport_base.lire(nom, query.limit(taille + 1)).data or []
+    au_dela = len(lignes) > taille
+    lignes = lignes[:taille]
+
+    if avant is not None:
+        lignes.reverse()
+        return Page(lignes, a_suivante=True, a_precedente=au_dela)
+    return Page(lignes, a_suivante=au_dela, a_precedente=apres is not None)
@@ -0,0 +1,174 @@
+"""
+Annexe PDF : liste des assurés d'une micro-tarification corporate
+Assur Defender - Cotation Santé +
+
+Un recensement peut compter plusieurs dizaines de milliers de lignes. Au
+lieu de construire un unique Table reportlab (dont le coût de mise en page
+croît avec le nombre de lignes), les lignes sont consommées au fil de l'eau
+par blocs d'exactement une page : chaque bloc devient un LongTable à
+en-tête répété, dessiné directement sur le canevas puis libéré. La mémoire
+reste constante quelle que soit la taille du recensement (seuls les flux
+compressés des pages déjà dessinées sont conservés).
+"""
+
+import io
+import itertools
+import time
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.units import cm
+from reportlab.pdfgen import canvas
+from reportlab.platypus import LongTable, TableStyle
+
+from instrumentation import mesurer
+from pdf_assets import PDF_INVARIANTS
+
+
+FORMAT_PAGE = landscape(A4)
+MARGE = 1.2 * cm
+HAUTEUR_ENTETE_PAGE = 1.6 * cm
+HAUTEUR_PIED_PAGE = 1.0 * cm
+HAUTEUR_LIGNE = 13
+
+# (titre, clé de la ligne, largeur, format)
+COLONNES_ANNEXE: List[Tuple[str, str, float, str]] = [
+    ("N°", 'numero', 1.3 * cm, 'texte'),
+    ("Nom", 'nom', 4.2 * cm, 'texte'),
+    ("Prénom", 'prenom', 4.2 * cm, 'texte'),
+    ("Couverture", 'type_couverture', 2.8 * cm, 'texte'),
+    ("Enf. supp.", 'nb_enfants_supp', 1.8 * cm, 'entier'),
+    ("Statut", 'statut', 2.0 * cm, 'texte'),
+    ("Prime nette", 'prime_nette', 3.0 * cm, 'montant'),
+    ("Prime TTC", 'prime_ttc', 3.0 * cm, 'montant'),
+    ("Observation", 'observation', 5.0 * cm, 'texte'),
+]
+
+LONGUEUR_MAX_OBSERVATION = 45
+
+
+def lignes_par_page() -> int:
+    """Nombre de lignes d'assurés tenant sur une page (en-tête du tableau déduit)."""
+    hauteur_utile = FORMAT_PAGE[1] - 2 * MARGE - HAUTEUR_ENTETE_PAGE - HAUTEUR_PIED_PAGE
+    return int(hauteur_utile // HAUTEUR_LIGNE) - 1
+
+
+def _formater(valeur: Any, format_colonne: str) -> str:
+    if valeur is None or valeur == '':
+        return ''
+    if format_colonne == 'montant':
+        return f"{round(valeur):,.0f}".replace(",", " ")
+    if format_colonne == 'entier':
+        return str(int(valeur))
+    texte = str(valeur)
+    return texte if len(texte) <= LONGUEUR_MAX_OBSERVATION else texte[:LONGUEUR_MAX_OBSERVATION - 1] + "…"
+
+
+_STYLE_TABLEAU = TableStyle([
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 7.5),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a1d29')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f3f5f8')]),
+    ('ALIGN', (4, 0), (4, -1), 'CENTER'),
+    ('ALIGN', (6, 1), (7, -1), 'RIGHT'),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('LINEBELOW', (0, 0), (-1, 0), 0.8, colors.HexColor('#1a1d29')),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    ('TOPPADDING', (0, 0), (-1, -1), 2),
+])
+
+
+def _dessiner_cadre(canvas_obj, titre: str, sous_titre: str, numero_page: int):
+    """En-tête et pied de page de l'annexe."""
+    largeur, hauteur = FORMAT_PAGE
+    canvas_obj.saveState()
+    canvas_obj.setFont('Helvetica-Bold', 12)
+    canvas_obj.setFillColor(colors.HexColor('#1a1d29'))
+    canvas_obj.drawString(MARGE, hauteur - MARGE - 12, titre)
+    canvas_obj.setFont('Helvetica', 8.5)
+    canvas_obj.setFillColor(colors.HexColor('#6c757d'))
+    canvas_obj.drawString(MARGE, hauteur - MARGE - 26, sous_titre)
+    canvas_obj.setFont('Helvetica', 8)
+    canvas_obj.drawRightString(largeur - MARGE, MARGE, f"Annexe - page {numero_page}")
+    canvas_obj.restoreState()
+
+
+@mesurer("pdf.annexe_assures")
+def generer_annexe_assures(
+    lignes: Iterable[Dict[str, Any]],
+    entreprise: str,
+    produit_name: str,
+    total: Optional[int] = None,
+    date_document: Optional[date] = None,
+    progression: Optional[Callable[[int, int, str], None]] = None
+) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Rend l'annexe listant une ligne par assuré.
+
+    Args:
+        lignes: Itérable (éventuellement paresseux) de dicts portant les clés de
+            COLONNES_ANNEXE (nom, prenom, type_couverture, statut, prime_nette...)
+        entreprise: Raison sociale imprimée en tête de chaque page
+        produit_name: Nom du produit
+        total: Nombre de lignes attendu, pour la progression
+        date_document: Date imprimée (aujourd'hui par défaut)
+        progression: Appelé avec (lignes écrites, total, message) après chaque page ;
+            peut lever une exception pour interrompre le rendu
+
+    Returns:
+        (contenu du PDF, statistiques : nb_lignes, nb_pages, duree, pages_par_seconde)
+    """
+    debut = time.perf_counter()
+    buffer = io.BytesIO()
+    canvas_obj = canvas.Canvas(buffer, pagesize=FORMAT_PAGE, pageCompression=1, invariant=PDF_INVARIANTS)
+    canvas_obj.setTitle(f"Annexe - liste des assurés - {entreprise}")
+
+    titre = f"ANNEXE - LISTE DES ASSURÉS - {entreprise}"
+    sous_titre = f"Produit : {produit_name} · Établie le {(date_document or date.today()).strftime('%d/%m/%Y')}"
+    entetes = [titre_colonne for titre_colonne, _, _, _ in COLONNES_ANNEXE]
+    largeurs = [largeur for _, _, largeur, _ in COLONNES_ANNEXE]
+    par_page = lignes_par_page()
+    y_tableau = FORMAT_PAGE[1] - MARGE - HAUTEUR_ENTETE_PAGE
+
+    iterateur = iter(lignes)
+    nb_lignes = 0
+    nb_pages = 0
+    while True:
+        bloc = list(itertools.islice(iterateur, par_page))
+        if not bloc and nb_pages:
+            break
+        donnees = [entetes]
+        for ligne in bloc:
+            nb_lignes += 1
+            donnees.append([
+                _formater(nb_lignes if cle == 'numero' else ligne.get(cle), format_colonne)
+                for _, cle, _, format_colonne in COLONNES_ANNEXE
+            ])
+
+        tableau = LongTable(donnees, colWidths=largeurs, rowHeights=HAUTEUR_LIGNE, repeatRows=1)
+        tableau.setStyle(_STYLE_TABLEAU)
+        _, hauteur_tableau = tableau.wrapOn(canvas_obj, FORMAT_PAGE[0] - 2 * MARGE, y_tableau)
+        tableau.drawOn(canvas_obj, MARGE, y_tableau - hauteur_tableau)
+
+        nb_pages += 1
+        _dessiner_cadre(canvas_obj, titre, sous_titre, nb_pages)
+        canvas_obj.showPage()
+        if progression is not None:
+            progression(nb_lignes, total or nb_lignes, f"{nb_lignes} lignes · {nb_pages} pages")
+        if len(bloc) < par_page:
+            break
+
+    canvas_obj.save()
+    duree = time.perf_counter() - debut
+    statistiques = {
+        'nb_lignes': nb_lignes,
+        'nb_pages': nb_pages,
+        'duree': duree,
+        'pages_par_seconde': nb_pages / duree if duree else 0.0,
+        'octets': buffer.tell(),
+    }
+    return buffer.getvalue(), statistiques
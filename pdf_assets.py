@@ -0,0 +1,412 @@
+"""
+Registre des ressources partagées par les générateurs PDF (images, styles)
+Assur Defender - Cotation Santé +
+
+Les images (logo, signature, bas de page) sont lues et décodées une seule
+fois par processus, et les feuilles de styles sont construites une seule
+fois puis partagées en lecture seule par tous les PDF. Le registre mesure
+le coût de chaque chargement pour estimer le temps de rendu économisé.
+
+Les images sont embarquées dans des variantes redimensionnées à leur
+taille d'affichage (DPI cible) et compressées en JPEG ou en flate selon le
+plus léger : les fichiers sources font jusqu'à 5000 px de côté.
+
+Les documents sont rendus en mode invariant (PDF_INVARIANTS) : aucune date
+d'horloge ni identifiant aléatoire n'y est embarqué.
+
+Rapport des tailles de PDF avant/après : python pdf_assets.py (processus
+dédié uniquement : le rapport reconfigure le registre partagé).
+"""
+
+import hashlib
+import io
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple, Union
+
+from PIL import Image as PILImage, ImageOps
+from reportlab import rl_config, rl_settings
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import StyleSheet1
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus.flowables import Flowable
+
+
+REPERTOIRE_ASSETS = os.environ.get("AKORA_ASSETS_DIR", os.path.dirname(os.path.abspath(__file__)))
+OPTIMISER_IMAGES = os.environ.get("AKORA_ASSETS_OPTIMISES", "1") != "0"
+DPI_CIBLE = int(os.environ.get("AKORA_ASSETS_DPI", 200))
+QUALITE_JPEG = int(os.environ.get("AKORA_ASSETS_QUALITE_JPEG", 85))
+# 'auto' (le plus léger), 'jpeg' ou 'flate'
+FORMAT_IMAGES = os.environ.get("AKORA_ASSETS_FORMAT", "auto")
+# Rendu déterministe : date de création fixe et identifiant (/ID) dérivé du
+# contenu, pour que deux devis identiques donnent les mêmes octets
+PDF_INVARIANTS = 1 if os.environ.get("AKORA_PDF_INVARIANTS", "1") != "0" else 0
+
+# Images utilisées par les PDF
+IMAGE_LOGO = "leadway logo all formats big-02.png"
+IMAGE_SIGNATURE = "signature.png"
+IMAGE_BAS_DE_PAGE = "bas_de_page.png"
+IMAGES_PDF = (IMAGE_LOGO, IMAGE_SIGNATURE, IMAGE_BAS_DE_PAGE)
+
+# Taille d'affichage (largeur, hauteur en points) des images dans les PDF
+TAILLES_AFFICHAGE = {
+    IMAGE_LOGO: (3.5*cm, 3*cm),
+    IMAGE_SIGNATURE: (4*cm, 2.5*cm),
+    IMAGE_BAS_DE_PAGE: (A4[0], 0.5*cm),
+}
+
+# Images importées par les utilisateurs (barème de la page 4 de la proposition)
+TAILLE_BAREME = (16*cm, 22*cm)
+NB_IMAGES_IMPORTEES = int(os.environ.get("AKORA_CACHE_IMAGES_IMPORTEES", 32))
+
+
+class _ImageReaderJPEG(ImageReader):
+    """
+    ImageReader d'une variante JPEG, partageable entre threads : chaque
+    insertion dans un PDF relit les octets JPEG depuis son propre tampon.
+    """
+
+    def __init__(self, donnees: bytes):
+        self._donnees = donnees
+        super().__init__(io.BytesIO(donnees))
+
+    def _jpeg_fh(self):
+        return io.BytesIO(self._donnees)
+
+
+def _poids_flate(image: PILImage.Image) -> int:
+    """Poids dans le PDF d'une image non JPEG : données brutes recompressées en flate (+ masque alpha)."""
+    poids = len(zlib.compress(image.convert('RGB').tobytes()))
+    if image.mode in ('RGBA', 'LA'):
+        poids += len(zlib.compress(image.getchannel('A').tobytes()))
+    return poids
+
+
+def poids_pdf(donnees: bytes) -> int:
+    """Poids approximatif d'une image une fois embarquée dans un PDF."""
+    with PILImage.open(io.BytesIO(donnees)) as image:
+        # Les JPEG sans rotation EXIF sont recopiés tels quels par reportlab
+        if image.format == 'JPEG' and image.getexif().get(0x0112, 1) == 1:
+            return len(donnees)
+        image.load()
+        return _poids_flate(ImageOps.exif_transpose(image))
+
+
+def creer_variante(
+    source: Union[str, bytes],
+    taille_affichage: Tuple[float, float],
+    dpi: int = DPI_CIBLE,
+    format_image: str = FORMAT_IMAGES,
+    qualite_jpeg: int = QUALITE_JPEG
+) -> Tuple[bytes, str]:
+    """
+    Redimensionne une image à sa taille d'affichage pour le DPI cible et
+    l'encode en JPEG ou en PNG (embarqué en flate dans le PDF).
+
+    Les images transparentes sont aplaties sur fond blanc pour le JPEG : les
+    PDF ne les dessinent que sur fond blanc.
+
+    Args:
+        source: Chemin du fichier ou contenu de l'image (PNG, JPEG...)
+
+    Returns:
+        (octets de la variante, 'jpeg' ou 'png')
+    """
+    with PILImage.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+        image.load()
+        # Photos de téléphone : pixels stockés tournés, orientation dans l'EXIF
+        image = ImageOps.exif_transpose(image)
+        largeur = min(image.width, max(1, round(taille_affichage[0] / 72 * dpi)))
+        hauteur = min(image.height, max(1, round(taille_affichage[1] / 72 * dpi)))
+        if (largeur, hauteur) != image.size:
+            image = image.resize((largeur, hauteur), PILImage.LANCZOS)
+        if image.mode == 'P':
+            image = image.convert('RGBA')
+
+    candidats = {}
+    if format_image in ('auto', 'flate'):
+        tampon = io.BytesIO()
+        image.save(tampon, 'PNG', optimize=True)
+        candidats['png'] = (_poids_flate(image), tampon.getvalue())
+    if format_image in ('auto', 'jpeg'):
+        fond = PILImage.new('RGB', image.size, 'white')
+        if image.mode in ('RGBA', 'LA'):
+            fond.paste(image.convert('RGBA'), mask=image.getchannel('A'))
+        else:
+            fond.paste(image.convert('RGB'))
+        tampon = io.BytesIO()
+        fond.save(tampon, 'JPEG', quality=qualite_jpeg, optimize=True)
+        candidats['jpeg'] = (len(tampon.getvalue()), tampon.getvalue())
+
+    format_retenu = min(candidats, key=lambda f: candidats[f][0])
+    return candidats[format_retenu][1], format_retenu
+
+
+def _original_redresse(donnees: bytes) -> Tuple[bytes, str]:
+    """Image d'origine, réencodée sans perte seulement si son orientation EXIF l'impose."""
+    with PILImage.open(io.BytesIO(donnees)) as image:
+        format_original = 'jpeg' if image.format == 'JPEG' else 'png'
+        if image.getexif().get(0x0112, 1) == 1 and image.format in ('JPEG', 'PNG'):
+            return donnees, format_original
+        image.load()
+        tampon = io.BytesIO()
+        ImageOps.exif_transpose(image).save(tampon, 'PNG')
+        return tampon.getvalue(), 'png'
+
+
+class ImageAsset(Flowable):
+    """Flowable dessinant une image du registre à une taille fixe."""
+
+    def __init__(self, image: ImageReader, width: float, height: float, hAlign: str = 'CENTER'):
+        super().__init__()
+        self.image = image
+        self.width = width
+        self.height = height
+        self.hAlign = hAlign
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        self.canv.drawImage(self.image, 0, 0, self.width, self.height, mask='auto')
+
+
+class RegistreAssetsPDF:
+    """Images décodées et feuilles de styles figées, chargées une fois par processus."""
+
+    def __init__(
+        self,
+        repertoire: str = REPERTOIRE_ASSETS,
+        optimiser: bool = OPTIMISER_IMAGES,
+        dpi: int = DPI_CIBLE
+    ):
+        self.repertoire = repertoire
+        self._verrou = threading.Lock()
+        self.configurer(optimiser, dpi)
+
+    def configurer(self, optimiser: bool, dpi: int = DPI_CIBLE):
+        """(Re)configure les variantes d'images et vide le registre."""
+        with self._verrou:
+            self.optimiser = optimiser
+            self.dpi = dpi
+            self._images: Dict[str, Optional[ImageReader]] = {}
+            self._styles: Dict[str, Mapping[str, Any]] = {}
+            # Coût de chargement (secondes) et nombre de réutilisations de chaque ressource
+            self._couts: Dict[str, float] = {}
+            self._reutilisations: Dict[str, int] = {}
+            # Octets des images sources et des variantes embarquées
+            self._octets_sources: Dict[str, int] = {}
+            self._octets_variantes: Dict[str, int] = {}
+            # Images importées normalisées, par empreinte du contenu d'origine (LRU)
+            self._images_importees: "OrderedDict[Tuple[str, Tuple[float, float]], Tuple[bytes, ImageReader]]" = OrderedDict()
+            self._images_importees_succes = 0
+            self._images_importees_echecs = 0
+            # Flux binaires bruts : l'encodage ASCII85 alourdit les images de 25 %
+            rl_config.useA85 = 0 if optimiser else rl_settings.useA85
+
+    # ==================== IMAGES ====================
+
+    def image(self, nom_fichier: str) -> Optional[ImageReader]:
+        """
+        Retourne l'image décodée (ImageReader partagé), ou None si le fichier
+        est absent ou illisible.
+        """
+        cle = f"image:{nom_fichier}"
+        with self._verrou:
+            if cle in self._couts:
+                self._reutilisations[cle] += 1
+                return self._images.get(nom_fichier)
+            debut = time.perf_counter()
+            self._images[nom_fichier] = self._charger_image(nom_fichier)
+            self._couts[cle] = time.perf_counter() - debut
+            self._reutilisations[cle] = 0
+            return self._images[nom_fichier]
+
+    def _charger_image(self, nom_fichier: str) -> Optional[ImageReader]:
+        chemin = os.path.join(self.repertoire, nom_fichier)
+        if not os.path.exists(chemin):
+            return None
+        try:
+            self._octets_sources[nom_fichier] = os.path.getsize(chemin)
+            if self.optimiser and nom_fichier in TAILLES_AFFICHAGE:
+                donnees, format_variante = creer_variante(chemin, TAILLES_AFFICHAGE[nom_fichier], self.dpi)
+                self._octets_variantes[nom_fichier] = len(donnees)
+                if format_variante == 'jpeg':
+                    image = _ImageReaderJPEG(donnees)
+                else:
+                    image = ImageReader(io.BytesIO(donnees))
+            else:
+                image = ImageReader(chemin)
+            # Décodage complet dès maintenant (couleurs et canal alpha) :
+            # les lectures suivantes, depuis plusieurs threads, ne font que lire
+            image.getRGBData()
+            if image._dataA is not None:
+                image._dataA.getRGBData()
+            return image
+        except Exception:
+            return None
+
+    def image_importee(
+        self,
+        donnees: bytes,
+        taille_affichage: Tuple[float, float] = TAILLE_BAREME
+    ) -> Optional[Tuple[bytes, ImageReader]]:
+        """
+        Normalise une image importée (photo, capture) : décodée une seule fois,
+        redimensionnée au DPI cible pour sa taille d'affichage et recompressée.
+        Le résultat est mis en cache par empreinte du contenu : une image déjà
+        normalisée (ou son original) est retrouvée sans nouveau décodage.
+
+        Returns:
+            (octets normalisés, ImageReader décodé), ou None si l'image est illisible
+        """
+        cle = (hashlib.sha256(donnees).hexdigest(), tuple(taille_affichage))
+        with self._verrou:
+            if cle in self._images_importees:
+                self._images_importees.move_to_end(cle)
+                self._images_importees_succes += 1
+                return self._images_importees[cle]
+            self._images_importees_echecs += 1
+            dpi = self.dpi
+
+        try:
+            variante, format_variante = creer_variante(donnees, taille_affichage, dpi)
+            # Captures à aplats de couleur : le rééchantillonnage peut alourdir
+            # l'image, l'original est alors conservé
+            if poids_pdf(donnees) <= poids_pdf(variante):
+                variante, format_variante = _original_redresse(donnees)
+            image = _ImageReaderJPEG(variante) if format_variante == 'jpeg' else ImageReader(io.BytesIO(variante))
+            image.getRGBData()
+            if image._dataA is not None:
+                image._dataA.getRGBData()
+        except Exception:
+            return None
+
+        entree = (variante, image)
+        with self._verrou:
+            # L'original et sa version normalisée désignent la même entrée
+            for cle_entree in (cle, (hashlib.sha256(variante).hexdigest(), tuple(taille_affichage))):
+                self._images_importees[cle_entree] = entree
+                self._images_importees.move_to_end(cle_entree)
+            while len(self._images_importees) > NB_IMAGES_IMPORTEES:
+                self._images_importees.popitem(last=False)
+        return entree
+
+    # ==================== STYLES ====================
+
+    def styles(self, nom: str, constructeur: Callable[[], Any]) -> Mapping[str, Any]:
+        """
+        Retourne la feuille de styles `nom`, construite au premier appel par
+        `constructeur` (dict de ParagraphStyle ou StyleSheet1).
+
+        La feuille est partagée et en lecture seule : pour un style
+        particulier, dériver avec ParagraphStyle(..., parent=styles['...']).
+        """
+        cle = f"styles:{nom}"
+        with self._verrou:
+            if cle in self._couts:
+                self._reutilisations[cle] += 1
+                return self._styles[nom]
+            debut = time.perf_counter()
+            feuille = constructeur()
+            if isinstance(feuille, StyleSheet1):
+                feuille = {**feuille.byAlias, **feuille.byName}
+            self._styles[nom] = MappingProxyType(dict(feuille))
+            self._couts[cle] = time.perf_counter() - debut
+            self._reutilisations[cle] = 0
+            return self._styles[nom]
+
+    # ==================== SUIVI ====================
+
+    def precharger(self):
+        """Charge les images des PDF (à appeler au démarrage du serveur)."""
+        for nom_fichier in IMAGES_PDF:
+            if f"image:{nom_fichier}" not in self._couts:
+                self.image(nom_fichier)
+
+    def statistiques(self) -> Dict[str, Any]:
+        """Ressources chargées, coût de chargement et temps de rendu économisé."""
+        with self._verrou:
+            return {
+                "nb_images": len([i for i in self._images.values() if i is not None]),
+                "nb_feuilles_styles": len(self._styles),
+                "reutilisations": sum(self._reutilisations.values()),
+                "temps_chargement": sum(self._couts.values()),
+                "temps_economise": sum(self._couts[c] * self._reutilisations[c] for c in self._couts),
+                "images_optimisees": self.optimiser,
+                "dpi": self.dpi,
+                "octets_sources": sum(self._octets_sources.values()),
+                "octets_variantes": sum(self._octets_variantes.values()),
+                "images_importees": len({id(e) for e in self._images_importees.values()}),
+                "images_importees_succes": self._images_importees_succes,
+                "images_importees_echecs": self._images_importees_echecs,
+                "detail": {
+                    c: {"cout": self._couts[c], "reutilisations": self._reutilisations[c]}
+                    for c in self._couts
+                },
+            }
+
+
+# Instance globale du registre
+registre_assets = RegistreAssetsPDF()
+
+
+def rapport_tailles_pdf() -> Dict[str, Tuple[int, int]]:
+    """
+    Taille de chaque type de document PDF avec les images sources puis avec
+    les variantes optimisées.
+
+    Les générateurs lisent le registre global : le rapport le reconfigure
+    (ainsi que rl_config.useA85, global au processus) le temps des rendus,
+    puis restaure l'état d'origine. Il ne s'exécute donc que seul dans son
+    processus (python pdf_assets.py), jamais à côté de rendus en cours.
+
+    Returns:
+        {type de document: (octets avant, octets après)}
+    """
+    if threading.active_count() > 1:
+        raise RuntimeError("rapport_tailles_pdf reconfigure le registre partagé : à exécuter seul (python pdf_assets.py)")
+
+    import pandas as pd
+    from calculations import calculer_prime_particuliers, calculer_prime_corporate_rapide
+    from data import TARIFS_PARTICULIERS, TARIFS_CORPORATE
+    from pdf_generator import generer_pdf_cotation_particulier, generer_pdf_cotation_corporate
+    from pdf_proposition import generer_pdf_proposition
+
+    produit_part = next(iter(TARIFS_PARTICULIERS))
+    produit_corp = next(iter(TARIFS_CORPORATE))
+    resultat_part = calculer_prime_particuliers(produit_key=produit_part, type_couverture='Famille')
+    resultat_corp = calculer_prime_corporate_rapide(produit_key=produit_corp, nb_familles=10)
+    recapitulatif = pd.DataFrame({'Désignation': ['PRIME TTC'], 'OPTION 1': ['100 000 FCFA']})
+
+    documents = {
+        'proposition': lambda: generer_pdf_proposition(recapitulatif, [{}], 1),
+        'cotation_particulier': lambda: generer_pdf_cotation_particulier(resultat_part, produit_part, {}),
+        'cotation_corporate': lambda: generer_pdf_cotation_corporate(resultat_corp, produit_corp, {}),
+    }
+
+    optimiser, dpi, use_a85 = registre_assets.optimiser, registre_assets.dpi, rl_config.useA85
+    tailles: Dict[str, list] = {nom: [] for nom in documents}
+    try:
+        for mode in (False, True):
+            registre_assets.configurer(mode, dpi)
+            for nom, generer in documents.items():
+                tailles[nom].append(len(generer()))
+    finally:
+        registre_assets.configurer(optimiser, dpi)
+        rl_config.useA85 = use_a85
+    return {nom: (avant, apres) for nom, (avant, apres) in tailles.items()}
+
+
+if __name__ == "__main__":
+    # Importé par son nom de module : les générateurs PDF partagent ce registre
+    import pdf_assets
+    print(f"{'Document':<24}{'Avant':>12}{'Après':>12}{'Gain':>8}")
+    for document, (avant, apres) in pdf_assets.rapport_tailles_pdf().items():
+        gain = (1 - apres / avant) * 100 if avant else 0.0
+        print(f"{document:<24}{avant / 1024:>10.1f} Ko{apres / 1024:>9.1f} Ko{gain:>7.0f}%")
@@ -5,30 +5,36 @@ Assur Defender - Cotation Santé +
 
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak
+from reportlab.platypus import Table, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm, mm
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT, TA_JUSTIFY
-from reportlab.pdfgen import canvas
-from datetime import datetime
-import io
+from datetime import date
 from typing import Dict, Any, List, Optional
 
+from instrumentation import mesurer
+from pdf_assets import registre_assets
+from pdf_mise_en_page import moteur_pdf, ModelePage
+
 
 class PDFGenerator:
     """Classe principale pour générer les PDF de cotation"""
     
     def __init__(self):
-        self.styles = getSampleStyleSheet()
-        self._setup_custom_styles()
+        # Feuille de styles construite une fois par processus, partagée en lecture seule
+        self.styles = registre_assets.styles('generateur', PDFGenerator._creer_feuille_styles)
+        # Date imprimée dans l'en-tête (fixée par chaque génération)
+        self.date_document = date.today()
     
-    def _setup_custom_styles(self):
+    @staticmethod
+    def _creer_feuille_styles():
         """Configure les styles personnalisés pour le document"""
+        styles = getSampleStyleSheet()
         
         # Style titre principal
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='CustomTitle',
-            parent=self.styles['Heading1'],
+            parent=styles['Heading1'],
             fontSize=24,
             textColor=colors.HexColor('#1a1d29'),
             spaceAfter=30,
@@ -37,9 +43,9 @@ class PDFGenerator:
         ))
         
         # Style sous-titre
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='CustomSubtitle',
-            parent=self.styles['Heading2'],
+            parent=styles['Heading2'],
             fontSize=16,
             textColor=colors.HexColor('#2196F3'),
             spaceAfter=12,
@@ -48,9 +54,9 @@ class PDFGenerator:
         ))
         
         # Style section
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='SectionHeader',
-            parent=self.styles['Heading3'],
+            parent=styles['Heading3'],
             fontSize=14,
             textColor=colors.HexColor('#145d33'),
             spaceAfter=10,
@@ -59,9 +65,9 @@ class PDFGenerator:
         ))
         
         # Style normal amélioré
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='CustomBody',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             fontSize=10,
             leading=14,
             textColor=colors.HexColor('#495057'),
@@ -69,9 +75,9 @@ class PDFGenerator:
         ))
         
         # Style pour les montants importants
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='BigAmount',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             fontSize=18,
             textColor=colors.HexColor('#2196F3'),
             alignment=TA_CENTER,
@@ -80,15 +86,29 @@ class PDFGenerator:
         ))
         
         # Style pour les informations
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='InfoText',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             fontSize=9,
             textColor=colors.HexColor('#6c757d'),
             leading=12
         ))
+        
+        return styles
+    
+    @staticmethod
+    def _creer_modele_page() -> ModelePage:
+        """Modèle des pages de cotation : en-tête et pied de page sur chaque page"""
+        return ModelePage('cotation', marges=(40, 40, 100, 60), decor=PDFGenerator._dessiner_decor)
     
-    def _add_header(self, canvas_obj, doc):
+    @staticmethod
+    def _dessiner_decor(canvas_obj, doc, contexte: Dict[str, Any]):
+        """Dessine l'en-tête et le pied de page de chaque page"""
+        PDFGenerator._add_header(canvas_obj, contexte['date_document'])
+        PDFGenerator._add_footer(canvas_obj)
+    
+    @staticmethod
+    def _add_header(canvas_obj, date_document: date):
         """Ajoute l'en-tête personnalisé sur chaque page"""
         canvas_obj.saveState()
         
@@ -108,7 +128,7 @@ class PDFGenerator:
         
         # Date
         canvas_obj.setFont('Helvetica', 9)
-        date_str = datetime.now().strftime("%d/%m/%Y")
+        date_str = date_document.strftime("%d/%m/%Y")
         canvas_obj.drawRightString(A4[0] - 40, A4[1] - 50, f"Date: {date_str}")
         
         # Ligne de séparation
@@ -118,7 +138,8 @@ class PDFGenerator:
         
         canvas_obj.restoreState()
     
-    def _add_footer(self, canvas_obj, doc):
+    @staticmethod
+    def _add_footer(canvas_obj):
         """Ajoute le pied de page sur chaque page"""
         canvas_obj.saveState()
         
@@ -140,6 +161,15 @@ class PDFGenerator:
         
         canvas_obj.restoreState()
     
+    def _construire(self, story: List[Any]) -> bytes:
+        """Met en page le document avec le modèle des pages de cotation"""
+        modele = moteur_pdf.modele('cotation', PDFGenerator._creer_modele_page)
+        return moteur_pdf.construire(story, modele, {'date_document': self.date_document})
+    
+    def _texte(self, texte: str, style: str) -> Paragraph:
+        """Paragraphe de texte fixe (analysé une fois par processus)"""
+        return moteur_pdf.paragraphe(texte, self.styles[style])
+    
     def _format_currency(self, amount: float) -> str:
         """Formate un montant en FCFA"""
         return f"{int(round(amount)):,} FCFA".replace(",", " ")
@@ -150,7 +180,7 @@ class PDFGenerator:
             col_widths = [8*cm, 8*cm]
         
         table = Table(data, colWidths=col_widths)
-        table.setStyle(TableStyle([
+        table.setStyle(moteur_pdf.style_tableau('cotation.informations', lambda: [
             ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f8f9fa')),
             ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#495057')),
             ('ALIGN', (0, 0), (0, -1), 'LEFT'),
@@ -169,7 +199,16 @@ class PDFGenerator:
     def _create_amount_table(self, data: List[List[str]]) -> Table:
         """Crée un tableau de décomposition des montants"""
         table = Table(data, colWidths=[12*cm, 4*cm])
-        
+        avec_total = len(data) > 1
+        table.setStyle(moteur_pdf.style_tableau(
+            'cotation.montants' if avec_total else 'cotation.montants_entete',
+            lambda: PDFGenerator._commandes_tableau_montants(avec_total)
+        ))
+        return table
+    
+    @staticmethod
+    def _commandes_tableau_montants(avec_total: bool) -> List[tuple]:
+        """Commandes de style du tableau des montants (en-tête, et ligne de total si présente)"""
         # Style de base
         base_style = [
             ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#495057')),
@@ -182,16 +221,15 @@ class PDFGenerator:
         ]
         
         # Style pour l'en-tête
-        if len(data) > 0:
-            base_style.extend([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#145d33')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ])
+        base_style.extend([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#145d33')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+        ])
         
         # Style pour le total (dernière ligne)
-        if len(data) > 1:
+        if avec_total:
             base_style.extend([
                 ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#e3f2fd')),
                 ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
@@ -201,16 +239,16 @@ class PDFGenerator:
         
         # Grille
         base_style.append(('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#dee2e6')))
-        
-        table.setStyle(TableStyle(base_style))
-        return table
+        return base_style
     
+    @mesurer("pdf.cotation_particulier")
     def generer_pdf_particulier(
         self,
         resultat: Dict[str, Any],
         produit_name: str,
         client_info: Dict[str, Any],
-        numero_devis: str = None
+        numero_devis: str = None,
+        date_document: Optional[date] = None
     ) -> bytes:
         """
         Génère un PDF de cotation pour un client particulier.
@@ -220,28 +258,19 @@ class PDFGenerator:
             produit_name: Nom du produit sélectionné
             client_info: Informations du client (nom, prénom, contact, etc.)
             numero_devis: Numéro de devis (optionnel)
+            date_document: Date imprimée sur le document (celle du devis ; aujourd'hui par défaut)
         
         Returns:
             bytes: Contenu du PDF généré
         """
-        buffer = io.BytesIO()
-        
-        # Création du document
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=40,
-            leftMargin=40,
-            topMargin=100,
-            bottomMargin=60,
-        )
+        self.date_document = date_document or date.today()
         
         # Conteneur pour les éléments du document
         story = []
         
         # === TITRE PRINCIPAL ===
-        titre = f"PROPOSITION DE COTATION SANTÉ"
-        story.append(Paragraph(titre, self.styles['CustomTitle']))
+        titre = "PROPOSITION DE COTATION SANTÉ"
+        story.append(self._texte(titre, 'CustomTitle'))
         story.append(Spacer(1, 10))
         
         # Numéro de devis
@@ -253,7 +282,7 @@ class PDFGenerator:
             story.append(Spacer(1, 20))
         
         # === INFORMATIONS CLIENT ===
-        story.append(Paragraph("INFORMATIONS CLIENT", self.styles['SectionHeader']))
+        story.append(self._texte("INFORMATIONS CLIENT", 'SectionHeader'))
         
         client_data = [
             ["Nom et Prénom", f"{client_info.get('nom', '')} {client_info.get('prenom', '')}"],
@@ -269,7 +298,7 @@ class PDFGenerator:
         story.append(Spacer(1, 20))
         
         # === DÉTAIL DE LA PRIME ===
-        story.append(Paragraph("DÉTAIL DE LA PRIME", self.styles['SectionHeader']))
+        story.append(self._texte("DÉTAIL DE LA PRIME", 'SectionHeader'))
         
         # Construction du tableau de détail
         detail_data = [
@@ -322,10 +351,7 @@ class PDFGenerator:
         story.append(Spacer(1, 20))
         
         # === MONTANT FINAL EN GRAND ===
-        story.append(Paragraph(
-            f"<b>MONTANT TOTAL À PAYER</b>",
-            self.styles['CustomSubtitle']
-        ))
+        story.append(self._texte("<b>MONTANT TOTAL À PAYER</b>", 'CustomSubtitle'))
         story.append(Paragraph(
             self._format_currency(resultat.get('prime_ttc_totale', 0)),
             self.styles['BigAmount']
@@ -341,7 +367,7 @@ class PDFGenerator:
         story.append(Spacer(1, 30))
         
         # === CONDITIONS ET NOTES ===
-        story.append(Paragraph("CONDITIONS PARTICULIÈRES", self.styles['SectionHeader']))
+        story.append(self._texte("CONDITIONS PARTICULIÈRES", 'SectionHeader'))
         
         conditions = [
             "✓ Cette cotation est valable 30 jours à compter de sa date d'émission.",
@@ -354,22 +380,23 @@ class PDFGenerator:
         if resultat.get('bareme_special'):
             conditions.append("✓ Cotation établie selon un barème spécial personnalisé.")
         
+        for condition in conditions:
+            story.append(self._texte(condition, 'CustomBody'))
+            story.append(Spacer(1, 5))
+        
         if surprime_medicale > 0:
             affections = resultat.get('affections_declarees', [])
             if affections:
-                conditions.append(f"⚠ Surprime médicale appliquée pour : {', '.join(affections)}.")
-        
-        for condition in conditions:
-            story.append(Paragraph(condition, self.styles['CustomBody']))
-            story.append(Spacer(1, 5))
+                story.append(Paragraph(
+                    f"⚠ Surprime médicale appliquée pour : {', '.join(affections)}.",
+                    self.styles['CustomBody']
+                ))
+                story.append(Spacer(1, 5))
         
         story.append(Spacer(1, 20))
         
         # === MENTIONS LÉGALES ===
-        story.append(Paragraph(
-            "<b>MENTIONS LÉGALES</b>",
-            self.styles['InfoText']
-        ))
+        story.append(self._texte("<b>MENTIONS LÉGALES</b>", 'InfoText'))
         story.append(Spacer(1, 5))
         
         mentions = (
@@ -377,42 +404,20 @@ class PDFGenerator:
             "tant que le contrat n'est pas signé et la première prime payée. Les garanties détaillées "
             "sont disponibles dans les conditions générales du contrat."
         )
-        story.append(Paragraph(mentions, self.styles['InfoText']))
+        story.append(self._texte(mentions, 'InfoText'))
         
         # Génération du PDF
-        doc.build(
-            story,
-            onFirstPage=self._add_header,
-            onLaterPages=self._add_header,
-            canvasmaker=lambda *args, **kwargs: self._add_footer_to_canvas(
-                canvas.Canvas(*args, **kwargs)
-            )
-        )
-        
-        # Récupération du contenu
-        pdf_content = buffer.getvalue()
-        buffer.close()
-        
-        return pdf_content
-    
-    def _add_footer_to_canvas(self, canvas_obj):
-        """Helper pour ajouter le footer"""
-        original_showPage = canvas_obj.showPage
-        
-        def custom_showPage():
-            self._add_footer(canvas_obj, None)
-            original_showPage()
-        
-        canvas_obj.showPage = custom_showPage
-        return canvas_obj
+        return self._construire(story)
 
 
+    @mesurer("pdf.cotation_corporate")
     def generer_pdf_corporate(
         self,
         resultat: Dict[str, Any],
         produit_name: str,
         entreprise_info: Dict[str, Any],
-        numero_devis: str = None
+        numero_devis: str = None,
+        date_document: Optional[date] = None
     ) -> bytes:
         """
         Génère un PDF de cotation pour une entreprise (Corporate).
@@ -422,26 +427,18 @@ class PDFGenerator:
             produit_name: Nom du produit sélectionné
             entreprise_info: Informations de l'entreprise
             numero_devis: Numéro de devis (optionnel)
+            date_document: Date imprimée sur le document (celle du devis ; aujourd'hui par défaut)
         
         Returns:
             bytes: Contenu du PDF généré
         """
-        buffer = io.BytesIO()
-        
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=40,
-            leftMargin=40,
-            topMargin=100,
-            bottomMargin=60,
-        )
+        self.date_document = date_document or date.today()
         
         story = []
         
         # === TITRE ===
-        story.append(Paragraph("PROPOSITION COMMERCIALE", self.styles['CustomTitle']))
-        story.append(Paragraph("Assurance Santé Collective", self.styles['CustomSubtitle']))
+        story.append(self._texte("PROPOSITION COMMERCIALE", 'CustomTitle'))
+        story.append(self._texte("Assurance Santé Collective", 'CustomSubtitle'))
         story.append(Spacer(1, 10))
         
         if numero_devis:
@@ -452,7 +449,7 @@ class PDFGenerator:
             story.append(Spacer(1, 20))
         
         # === INFORMATIONS ENTREPRISE ===
-        story.append(Paragraph("INFORMATIONS ENTREPRISE", self.styles['SectionHeader']))
+        story.append(self._texte("INFORMATIONS ENTREPRISE", 'SectionHeader'))
         
         entreprise_data = [
             ["Raison sociale", entreprise_info.get('nom', 'Non renseigné')],
@@ -481,7 +478,7 @@ class PDFGenerator:
         story.append(Spacer(1, 20))
         
         # === DÉTAIL DE LA PRIME ===
-        story.append(Paragraph("DÉTAIL DE LA COTISATION", self.styles['SectionHeader']))
+        story.append(self._texte("DÉTAIL DE LA COTISATION", 'SectionHeader'))
         
         detail_data = [["Désignation", "Montant"]]
         
@@ -515,7 +512,7 @@ class PDFGenerator:
         story.append(Spacer(1, 20))
         
         # === MONTANT FINAL ===
-        story.append(Paragraph("COTISATION ANNUELLE", self.styles['CustomSubtitle']))
+        story.append(self._texte("COTISATION ANNUELLE", 'CustomSubtitle'))
         story.append(Paragraph(
             self._format_currency(resultat.get('prime_ttc_totale', 0)),
             self.styles['BigAmount']
@@ -533,7 +530,7 @@ class PDFGenerator:
         story.append(Spacer(1, 30))
         
         # === GARANTIES ===
-        story.append(Paragraph("PRINCIPALES GARANTIES", self.styles['SectionHeader']))
+        story.append(self._texte("PRINCIPALES GARANTIES", 'SectionHeader'))
         
         garanties = [
             "✓ Consultation et soins médicaux selon le taux de couverture",
@@ -545,13 +542,13 @@ class PDFGenerator:
         ]
         
         for garantie in garanties:
-            story.append(Paragraph(garantie, self.styles['CustomBody']))
+            story.append(self._texte(garantie, 'CustomBody'))
             story.append(Spacer(1, 5))
         
         story.append(Spacer(1, 20))
         
         # === CONDITIONS ===
-        story.append(Paragraph("CONDITIONS DE SOUSCRIPTION", self.styles['SectionHeader']))
+        story.append(self._texte("CONDITIONS DE SOUSCRIPTION", 'SectionHeader'))
         
         conditions = [
             "✓ Cette proposition est valable 30 jours à compter de sa date d'émission.",
@@ -567,13 +564,13 @@ class PDFGenerator:
             )
         
         for condition in conditions:
-            story.append(Paragraph(condition, self.styles['CustomBody']))
+            story.append(self._texte(condition, 'CustomBody'))
             story.append(Spacer(1, 5))
         
         story.append(Spacer(1, 20))
         
         # === PROCHAINES ÉTAPES ===
-        story.append(Paragraph("PROCHAINES ÉTAPES", self.styles['SectionHeader']))
+        story.append(self._texte("PROCHAINES ÉTAPES", 'SectionHeader'))
         
         etapes = [
             "1. <b>Validation de la proposition</b> par votre entreprise",
@@ -584,19 +581,19 @@ class PDFGenerator:
         ]
         
         for etape in etapes:
-            story.append(Paragraph(etape, self.styles['CustomBody']))
+            story.append(self._texte(etape, 'CustomBody'))
             story.append(Spacer(1, 5))
         
         story.append(Spacer(1, 30))
         
         # === CONTACT ===
-        story.append(Paragraph("VOTRE INTERLOCUTEUR", self.styles['SectionHeader']))
+        story.append(self._texte("VOTRE INTERLOCUTEUR", 'SectionHeader'))
         
         contact_text = (
             "Pour toute question ou complément d'information, "
             "n'hésitez pas à contacter votre conseiller Assur Defender."
         )
-        story.append(Paragraph(contact_text, self.styles['CustomBody']))
+        story.append(self._texte(contact_text, 'CustomBody'))
         story.append(Spacer(1, 10))
         
         contact_info = [
@@ -609,7 +606,7 @@ class PDFGenerator:
         story.append(Spacer(1, 20))
         
         # === MENTIONS LÉGALES ===
-        story.append(Paragraph("MENTIONS LÉGALES", self.styles['InfoText']))
+        story.append(self._texte("MENTIONS LÉGALES", 'InfoText'))
         story.append(Spacer(1, 5))
         
         mentions = (
@@ -618,22 +615,10 @@ class PDFGenerator:
             "des bénéficiaires. Les garanties détaillées sont disponibles dans les conditions "
             "générales du contrat qui vous seront remises lors de la souscription."
         )
-        story.append(Paragraph(mentions, self.styles['InfoText']))
+        story.append(self._texte(mentions, 'InfoText'))
         
         # Génération
-        doc.build(
-            story,
-            onFirstPage=self._add_header,
-            onLaterPages=self._add_header,
-            canvasmaker=lambda *args, **kwargs: self._add_footer_to_canvas(
-                canvas.Canvas(*args, **kwargs)
-            )
-        )
-        
-        pdf_content = buffer.getvalue()
-        buffer.close()
-        
-        return pdf_content
+        return self._construire(story)
 
 
 # === FONCTIONS D'INTERFACE ===
@@ -642,7 +627,8 @@ def generer_pdf_cotation_particulier(
     resultat: Dict[str, Any],
     produit_name: str,
     client_info: Dict[str, Any],
-    numero_devis: str = None
+    numero_devis: str = None,
+    date_document: Optional[date] = None
 ) -> bytes:
     """
     Fonction principale pour générer un PDF de cotation particulier.
@@ -652,19 +638,21 @@ def generer_pdf_cotation_particulier(
         produit_name: Nom du produit
         client_info: Informations du client
         numero_devis: Numéro de devis optionnel
+        date_document: Date du devis imprimée sur le document (aujourd'hui par défaut)
     
     Returns:
         bytes: Contenu du PDF
     """
     generator = PDFGenerator()
-    return generator.generer_pdf_particulier(resultat, produit_name, client_info, numero_devis)
+    return generator.generer_pdf_particulier(resultat, produit_name, client_info, numero_devis, date_document)
 
 
 def generer_pdf_cotation_corporate(
     resultat: Dict[str, Any],
     produit_name: str,
     entreprise_info: Dict[str, Any],
-    numero_devis: str = None
+    numero_devis: str = None,
+    date_document: Optional[date] = None
 ) -> bytes:
     """
     Fonction principale pour générer un PDF de cotation corporate.
@@ -674,9 +662,10 @@ def generer_pdf_cotation_corporate(
         produit_name: Nom du produit
         entreprise_info: Informations de l'entreprise
         numero_devis: Numéro de devis optionnel
+        date_document: Date du devis imprimée sur le document (aujourd'hui par défaut)
     
     Returns:
         bytes: Contenu du PDF
     """
     generator = PDFGenerator()
-    return generator.generer_pdf_corporate(resultat, produit_name, entreprise_info, numero_devis)
+    return generator.generer_pdf_corporate(resultat, produit_name, entreprise_info, numero_devis, date_document)
@@ -0,0 +1,177 @@
+"""
+Génération de PDF en lot (une proposition par assuré ou par formule)
+Assur Defender - Cotation Santé +
+
+Les documents sont rendus par un pool de processus (le rendu reportlab est
+lié au CPU et ne profite pas des threads) et ajoutés à une archive ZIP au
+fil de leur achèvement. Seuls quelques documents sont en vol à la fois :
+la mémoire reste bornée quel que soit le nombre de documents. L'archive est
+écrite dans un fichier temporaire dont le chemin est retourné : elle n'est
+jamais chargée en mémoire (le stockage de session l'adopte tel quel, voir
+session_store.FichierSession).
+"""
+
+import multiprocessing
+import os
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from instrumentation import mesurer
+
+
+NB_PROCESSUS_PDF = int(os.environ.get("AKORA_PROCESSUS_PDF", min(4, os.cpu_count() or 1)))
+# Documents soumis au pool et pas encore écrits dans l'archive, par processus
+DOCUMENTS_EN_VOL_PAR_PROCESSUS = 2
+
+
+def _initialiser_processus():
+    """Charge logo, signature et styles une fois par processus de rendu."""
+    from pdf_assets import registre_assets
+    registre_assets.precharger()
+
+
+def rendre_document(document: Dict[str, Any]) -> Tuple[str, bytes]:
+    """
+    Rend un document du lot (exécuté dans un processus du pool).
+
+    Args:
+        document: {'nom_fichier', 'type' ('corporate' ou 'particulier'), 'resultat',
+            'produit_name', 'infos' (entreprise ou client), 'numero_devis', 'date_document'}
+
+    Returns:
+        (nom du fichier dans l'archive, contenu du PDF)
+    """
+    from pdf_generator import generer_pdf_cotation_corporate, generer_pdf_cotation_particulier
+
+    generateur = (
+        generer_pdf_cotation_particulier if document.get('type') == 'particulier'
+        else generer_pdf_cotation_corporate
+    )
+    pdf_bytes = generateur(
+        document['resultat'],
+        document['produit_name'],
+        document.get('infos', {}),
+        document.get('numero_devis'),
+        document.get('date_document'),
+    )
+    return document['nom_fichier'], pdf_bytes
+
+
+class RenduLots:
+    """Pool de processus partagé par toutes les sessions pour les rendus PDF en lot."""
+
+    def __init__(self, nb_processus: int = NB_PROCESSUS_PDF):
+        self.nb_processus = nb_processus
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._verrou = threading.Lock()
+
+    def _obtenir_pool(self) -> Optional[ProcessPoolExecutor]:
+        """Pool créé au premier lot ; None si le rendu doit se faire sur place."""
+        if self.nb_processus <= 0:
+            return None
+        with self._verrou:
+            if self._pool is None:
+                # 'spawn' : le serveur Streamlit est multi-threadé, un fork pourrait
+                # hériter de verrous tenus par d'autres threads
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.nb_processus,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_initialiser_processus,
+                )
+            return self._pool
+
+    def _reinitialiser_pool(self):
+        with self._verrou:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    @mesurer("pdf.lot")
+    def generer_zip(
+        self,
+        documents: Iterable[Dict[str, Any]],
+        total: Optional[int] = None,
+        progression: Optional[Callable[[int, int, str], None]] = None
+    ) -> str:
+        """
+        Rend tous les documents dans une archive ZIP sur disque.
+
+        Args:
+            documents: Itérable (éventuellement paresseux) de documents, voir rendre_document
+            total: Nombre de documents, pour la progression (len(documents) par défaut)
+            progression: Appelé avec (documents écrits, total, message) après chaque
+                document ; peut lever une exception pour interrompre le lot
+                (ex: JobAnnule), les rendus en attente sont alors abandonnés
+
+        Returns:
+            str: Chemin du fichier ZIP temporaire, à la charge de l'appelant
+        """
+        if total is None:
+            total = len(documents) if hasattr(documents, '__len__') else 0
+
+        descripteur, chemin = tempfile.mkstemp(prefix="akora_lot_", suffix=".zip")
+        try:
+            with os.fdopen(descripteur, 'wb') as fichier, \
+                    zipfile.ZipFile(fichier, 'w', compression=zipfile.ZIP_STORED) as archive:
+                noms_utilises: Dict[str, int] = {}
+
+                def ecrire(nom_fichier: str, pdf_bytes: bytes):
+                    # Deux assurés homonymes ne doivent pas s'écraser dans l'archive
+                    occurrences = noms_utilises.get(nom_fichier, 0)
+                    noms_utilises[nom_fichier] = occurrences + 1
+                    if occurrences:
+                        base, extension = os.path.splitext(nom_fichier)
+                        nom_fichier = f"{base}_{occurrences + 1}{extension}"
+                    # Horodatage fixe : les entrées ne dépendent pas de l'heure du rendu
+                    archive.writestr(zipfile.ZipInfo(nom_fichier, date_time=(1980, 1, 1, 0, 0, 0)), pdf_bytes)
+                    if progression is not None:
+                        fait = sum(noms_utilises.values())
+                        progression(fait, total, f"{fait}/{total} PDF générés")
+
+                pool = self._obtenir_pool()
+                if pool is None:
+                    for document in documents:
+                        ecrire(*rendre_document(document))
+                else:
+                    try:
+                        self._rendre_en_parallele(pool, documents, ecrire)
+                    except BrokenProcessPool:
+                        # Processus de rendu tué (ex: mémoire) : le prochain lot repart d'un pool neuf
+                        self._reinitialiser_pool()
+                        raise
+        except BaseException:
+            os.remove(chemin)
+            raise
+        return chemin
+
+    def _rendre_en_parallele(self, pool: ProcessPoolExecutor, documents, ecrire: Callable[[str, bytes], None]):
+        max_en_vol = max(1, self.nb_processus * DOCUMENTS_EN_VOL_PAR_PROCESSUS)
+        iterateur = iter(documents)
+        en_vol: "set[Future]" = set()
+        try:
+            while True:
+                while len(en_vol) < max_en_vol:
+                    document = next(iterateur, None)
+                    if document is None:
+                        break
+                    en_vol.add(pool.submit(rendre_document, document))
+                if not en_vol:
+                    return
+                termines, en_vol = wait(en_vol, return_when=FIRST_COMPLETED)
+                for future in termines:
+                    ecrire(*future.result())
+        finally:
+            for future in en_vol:
+                future.cancel()
+
+    def arreter(self):
+        """Arrête le pool de processus (fin du serveur)."""
+        self._reinitialiser_pool()
+
+
+# Instance globale du rendu en lot
+rendu_lots = RenduLots()
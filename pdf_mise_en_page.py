@@ -0,0 +1,166 @@
+"""
+Moteur de mise en page commun aux PDF
+Assur Defender - Cotation Santé +
+
+Les trois générateurs (proposition commerciale, cotation particulier,
+cotation corporate) partagent ici les objets de mise en page coûteux à
+reconstruire à chaque document :
+
+- les styles de tableaux (TableStyle), construits une fois par processus ;
+- les modèles de page (format, marges, décor dessiné sur chaque page) ;
+- un cache de paragraphes : le texte balisé d'un Paragraph n'est analysé
+  qu'une fois, chaque document en reçoit une copie légère.
+
+Les objets partagés sont en lecture seule : un TableStyle du moteur ne doit
+pas être modifié (TableStyle.add), les lignes particulières d'un tableau
+s'ajoutent par un second table.setStyle([...]).
+"""
+
+import copy
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.platypus import BaseDocTemplate, Frame, PageTemplate, Paragraph, TableStyle
+
+from pdf_assets import PDF_INVARIANTS
+
+
+NB_PARAGRAPHES_CACHE = int(os.environ.get("AKORA_CACHE_PARAGRAPHES", 1024))
+
+
+class ModelePage:
+    """
+    Modèle de page réutilisable : format, marges (en points) et décor
+    dessiné sur chaque page, appelé avec (canvas, doc, contexte).
+    """
+
+    def __init__(
+        self,
+        nom: str,
+        marges: Tuple[float, float, float, float],
+        decor: Optional[Callable[[Any, Any, Dict[str, Any]], None]] = None,
+        format_page: Tuple[float, float] = A4
+    ):
+        self.nom = nom
+        self.marge_gauche, self.marge_droite, self.marge_haut, self.marge_bas = marges
+        self.decor = decor
+        self.format_page = format_page
+
+    def document(self, buffer, contexte: Dict[str, Any]) -> BaseDocTemplate:
+        """Document vierge dont toutes les pages suivent ce modèle."""
+        doc = BaseDocTemplate(
+            buffer,
+            pagesize=self.format_page,
+            leftMargin=self.marge_gauche,
+            rightMargin=self.marge_droite,
+            topMargin=self.marge_haut,
+            bottomMargin=self.marge_bas,
+            invariant=PDF_INVARIANTS,
+        )
+        cadre = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id='normal')
+        sur_page = None
+        if self.decor is not None:
+            decor = self.decor
+            sur_page = lambda canvas_obj, doc_courant: decor(canvas_obj, doc_courant, contexte)
+        doc.addPageTemplates([PageTemplate(id=self.nom, frames=[cadre], onPage=sur_page, pagesize=self.format_page)])
+        return doc
+
+
+class MoteurMiseEnPage:
+    """Styles de tableaux, modèles de page et paragraphes partagés par tous les PDF du processus."""
+
+    def __init__(self, nb_paragraphes: int = NB_PARAGRAPHES_CACHE):
+        self.nb_paragraphes = nb_paragraphes
+        self._verrou = threading.Lock()
+        self._styles_tableaux: Dict[str, TableStyle] = {}
+        self._modeles: Dict[str, ModelePage] = {}
+        self._paragraphes: "OrderedDict[Tuple[str, int], Paragraph]" = OrderedDict()
+        self._paragraphes_succes = 0
+        self._paragraphes_echecs = 0
+        self._documents = 0
+        self._duree_documents = 0.0
+
+    # ==================== OBJETS PARTAGÉS ====================
+
+    def style_tableau(self, nom: str, commandes: Callable[[], List[Tuple]]) -> TableStyle:
+        """
+        Retourne le TableStyle `nom`, construit au premier appel à partir de
+        `commandes()` (liste de commandes reportlab). Partagé, ne pas modifier.
+        """
+        style = self._styles_tableaux.get(nom)
+        if style is None:
+            with self._verrou:
+                style = self._styles_tableaux.get(nom)
+                if style is None:
+                    style = self._styles_tableaux[nom] = TableStyle(commandes())
+        return style
+
+    def modele(self, nom: str, constructeur: Callable[[], ModelePage]) -> ModelePage:
+        """Retourne le modèle de page `nom`, construit au premier appel."""
+        modele = self._modeles.get(nom)
+        if modele is None:
+            with self._verrou:
+                modele = self._modeles.get(nom)
+                if modele is None:
+                    modele = self._modeles[nom] = constructeur()
+        return modele
+
+    def paragraphe(self, texte: str, style: ParagraphStyle) -> Paragraph:
+        """
+        Paragraph de texte fixe (conditions, mentions, titres) : le balisage
+        n'est analysé qu'une fois, chaque appel retourne une copie neuve.
+        Les textes propres à un client (montants, noms) passent par Paragraph.
+        """
+        cle = (texte, id(style))
+        with self._verrou:
+            prototype = self._paragraphes.get(cle)
+            if prototype is not None:
+                self._paragraphes.move_to_end(cle)
+                self._paragraphes_succes += 1
+                return copy.copy(prototype)
+            self._paragraphes_echecs += 1
+
+        prototype = Paragraph(texte, style)
+        with self._verrou:
+            self._paragraphes[cle] = prototype
+            while len(self._paragraphes) > self.nb_paragraphes:
+                self._paragraphes.popitem(last=False)
+        return copy.copy(prototype)
+
+    # ==================== RENDU ====================
+
+    def construire(self, elements: List[Any], modele: ModelePage, contexte: Optional[Dict[str, Any]] = None) -> bytes:
+        """Met en page les éléments selon le modèle et retourne le PDF."""
+        debut = time.perf_counter()
+        buffer = io.BytesIO()
+        modele.document(buffer, contexte or {}).build(elements)
+        duree = time.perf_counter() - debut
+        with self._verrou:
+            self._documents += 1
+            self._duree_documents += duree
+        return buffer.getvalue()
+
+    def statistiques(self) -> Dict[str, Any]:
+        """Objets partagés et réutilisation du cache de paragraphes."""
+        with self._verrou:
+            demandes = self._paragraphes_succes + self._paragraphes_echecs
+            return {
+                "styles_tableaux": len(self._styles_tableaux),
+                "modeles": sorted(self._modeles),
+                "paragraphes": len(self._paragraphes),
+                "paragraphes_succes": self._paragraphes_succes,
+                "paragraphes_echecs": self._paragraphes_echecs,
+                "taux_succes_paragraphes": self._paragraphes_succes / demandes if demandes else 0.0,
+                "documents": self._documents,
+                "duree_moyenne_document": self._duree_documents / self._documents if self._documents else 0.0,
+            }
+
+
+# Instance globale du moteur de mise en page
+moteur_pdf = MoteurMiseEnPage()
@@ -0,0 +1,770 @@
+"""
+Génération de la proposition commerciale PDF (4 pages) du parcours Particulier
+Assur Defender - Cotation Santé +
+"""
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import Table, Paragraph, Spacer, PageBreak
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import cm
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_RIGHT
+from reportlab.platypus.flowables import Flowable
+from reportlab.pdfgen import canvas
+from datetime import date
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+import pandas as pd
+
+from cache_cotations import empreinte_canonique
+from instrumentation import mesurer
+from pdf_mise_en_page import moteur_pdf, ModelePage
+from pdf_assets import registre_assets, PDF_INVARIANTS, ImageAsset, TAILLE_BAREME, IMAGE_LOGO, IMAGE_SIGNATURE, IMAGE_BAS_DE_PAGE
+
+try:
+    from pypdf import PdfReader, PdfWriter, __version__ as VERSION_PYPDF
+    from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, FloatObject, NameObject
+    # Fusion écrite et mesurée avec pypdf 6.x (voir _objet_indirect)
+    if int(VERSION_PYPDF.split('.')[0]) < 6:
+        raise ImportError(f"pypdf {VERSION_PYPDF} : version 6 ou ultérieure requise")
+except ImportError:  # pypdf absent ou trop ancien : rendu complet de chaque proposition
+    PdfReader = PdfWriter = None
+
+
+# Version du gabarit des pages fixes (conditions, signature) : à incrémenter
+# à chaque modification de leur contenu pour invalider les pages pré-rendues
+VERSION_GABARIT_PROPOSITION = "2025.1"
+PRERENDU_PAGES_FIXES = os.environ.get("AKORA_PRERENDU_PROPOSITION", "1") != "0"
+# Gabarits conservés (un par date de signature) : récapitulatifs anciens, lots à dates différentes
+NB_GABARITS_MAX = int(os.environ.get("AKORA_GABARITS_PROPOSITION", 8))
+
+journal = logging.getLogger("akora.pdf")
+
+
+def _creer_styles_proposition() -> Dict[str, ParagraphStyle]:
+    """Styles de la proposition (construits une fois, partagés via registre_assets)."""
+    styles = getSampleStyleSheet()
+    
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=16,
+        textColor=colors.HexColor('#1a1a1a'),
+        spaceAfter=20,
+        alignment=TA_CENTER,
+        fontName='Helvetica-Bold'
+    )
+    
+    section_title_style = ParagraphStyle(
+        'SectionTitle',
+        parent=styles['Heading2'],
+        fontSize=11,
+        textColor=colors.HexColor('#1a1a1a'),
+        spaceAfter=10,
+        spaceBefore=15,
+        fontName='Helvetica-Bold'
+    )
+    
+    normal_style = ParagraphStyle(
+        'CustomNormal',
+        parent=styles['Normal'],
+        fontSize=9,
+        textColor=colors.HexColor('#333333'),
+        leading=12,
+        alignment=TA_JUSTIFY
+    )
+    
+    bullet_style = ParagraphStyle(
+        'BulletStyle',
+        parent=styles['Normal'],
+        fontSize=9,
+        textColor=colors.HexColor('#333333'),
+        leading=12,
+        leftIndent=20,
+        bulletIndent=10
+    )
+    
+    # Style pour les cellules avec retours à la ligne
+    cell_style = ParagraphStyle(
+        'CellStyle',
+        parent=styles['Normal'],
+        fontSize=8,
+        alignment=TA_CENTER,
+        fontName='Helvetica',
+        leading=10
+    )
+    
+    header_title_style = ParagraphStyle(
+        'HeaderTitle', parent=styles['Normal'],
+        fontSize=20, textColor=colors.whitesmoke,
+        fontName='Helvetica-Bold', alignment=TA_CENTER
+    )
+    
+    date_style = ParagraphStyle('DateStyle', parent=normal_style, alignment=TA_RIGHT, fontName='Helvetica-Bold')
+    
+    signature_label_style = ParagraphStyle(
+        'SignatureLabel', parent=normal_style, alignment=TA_RIGHT, fontName='Helvetica-Bold', fontSize=10
+    )
+    
+    note_style = ParagraphStyle('NoteStyle', parent=normal_style, fontSize=8, textColor=colors.HexColor('#666666'), alignment=TA_CENTER)
+    erreur_style = ParagraphStyle('ErreurStyle', parent=normal_style, fontSize=10, textColor=colors.HexColor('#cc0000'), alignment=TA_CENTER)
+    placeholder_style = ParagraphStyle('PlaceholderStyle', parent=normal_style, fontSize=10, textColor=colors.HexColor('#999999'), alignment=TA_CENTER)
+    instruction_style = ParagraphStyle('InstructionStyle', parent=normal_style, fontSize=9, textColor=colors.HexColor('#666666'), alignment=TA_CENTER, fontName='Helvetica-Oblique')
+    
+    return {
+        style.name: style
+        for style in (
+            title_style, section_title_style, normal_style, bullet_style, cell_style,
+            header_title_style, date_style, signature_label_style,
+            note_style, erreur_style, placeholder_style, instruction_style
+        )
+    }
+
+
+def _dessiner_bas_de_page(canvas_obj, doc, contexte: Dict[str, Any]):
+    """Ajoute le bas de page (image pleine largeur) à chaque page du document."""
+    bas_de_page = registre_assets.image(IMAGE_BAS_DE_PAGE)
+    if bas_de_page is None:
+        return
+    
+    canvas_obj.saveState()
+    try:
+        # Positionner l'image en bas de page sur toute la largeur
+        page_width, page_height = A4
+        canvas_obj.drawImage(bas_de_page, 
+                           0,  # Commencer depuis le bord gauche
+                           0,  # Position depuis le bas (bord inférieur)
+                           width=page_width,  # Toute la largeur de la page
+                           height=0.5*cm,  # Hauteur de l'image
+                           preserveAspectRatio=False,  # Étirer pour prendre toute la largeur
+                           mask='auto')
+    except Exception:
+        # En cas d'erreur, ne rien afficher
+        pass
+    canvas_obj.restoreState()
+
+
+def _creer_modele_proposition() -> ModelePage:
+    """Modèle des pages de la proposition : marges réduites en haut, bas de page pleine largeur."""
+    return ModelePage(
+        'proposition',
+        # gauche, droite, haut (réduite), bas (footer pleine largeur)
+        marges=(1.5*cm, 1.5*cm, 0.4*cm, 2.5*cm),
+        decor=_dessiner_bas_de_page,
+    )
+
+
+def _construire_pdf(elements: List[Any]) -> bytes:
+    """Met en page les éléments au format de la proposition, avec le bas de page sur chaque page."""
+    return moteur_pdf.construire(elements, moteur_pdf.modele('proposition', _creer_modele_proposition))
+
+
+def _table_references(principal_data: Optional[Dict[str, Any]]) -> Table:
+    """Tableau des références de la proposition (seul contenu variable des pages fixes)."""
+    ref_data = principal_data or {}
+    ref_table_data = [
+        ['REFERENCE:', ref_data.get('reference', 'LWA-00082-10-0735'), 'APPORTEUR:', ref_data.get('apporteur', 'ZOH BI')],
+        ['PROSPECT:', ref_data.get('prospect', 'SOCIETE AKORA'), '', '']
+    ]
+    
+    ref_table = Table(ref_table_data, colWidths=[3*cm, 5*cm, 3*cm, 5*cm])
+    ref_table.setStyle(moteur_pdf.style_tableau('proposition.references', lambda: [
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#1a1a1a')),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#cccccc')),
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f0f0f0')),
+        ('BACKGROUND', (2, 0), (2, 0), colors.HexColor('#f0f0f0')),
+    ]))
+    
+    return ref_table
+
+
+def _elements_pages_fixes(styles, table_references: Flowable, date_signature: str) -> List[Any]:
+    """Pages 1 et 2 : en-tête, références, conditions générales, date et signature."""
+    section_title_style = styles['SectionTitle']
+    normal_style = styles['CustomNormal']
+    bullet_style = styles['BulletStyle']
+    
+    elements = []
+    
+    # ==================== PAGE 1 ====================
+    
+    # Logo en haut à droite (première page seulement) - bien dimensionné
+    logo = registre_assets.image(IMAGE_LOGO)
+    if logo is not None:
+        try:
+            # Créer une table pour positionner le logo à droite
+            logo_img = ImageAsset(logo, width=3.5*cm, height=3*cm)
+            logo_table = Table([[logo_img]], colWidths=[18*cm])
+            logo_table.setStyle(moteur_pdf.style_tableau('proposition.image_droite', lambda: [
+                ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
+                ('VALIGN', (0, 0), (0, 0), 'TOP'),
+            ]))
+            elements.append(logo_table)
+            elements.append(Spacer(1, 0.2*cm))  # Réduire l'espace
+        except:
+            pass
+    
+    # En-tête orange avec titre (sans logo)
+    header_table_data = [[
+        moteur_pdf.paragraphe("<b>PROPOSITION D'ASSURANCE SANTÉ</b>", styles['HeaderTitle'])
+    ]]
+    
+    header_table = Table(header_table_data, colWidths=[18*cm])
+    header_table.setStyle(moteur_pdf.style_tableau('proposition.entete', lambda: [
+        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#E67E22')),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('ALIGN', (0, 0), (0, 0), 'CENTER'),
+        ('TOPPADDING', (0, 0), (-1, -1), 18),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 18),
+        ('LEFTPADDING', (0, 0), (-1, -1), 10),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 10),
+    ]))
+    
+    elements.append(header_table)
+    elements.append(Spacer(1, 0.3*cm))  # Réduire l'espace
+    
+    elements.append(table_references)
+    elements.append(Spacer(1, 0.5*cm))
+    
+    # I. OBJET DE LA COUVERTURE
+    elements.append(moteur_pdf.paragraphe("<b>I. OBJET DE LA COUVERTURE</b>", section_title_style))
+    elements.append(moteur_pdf.paragraphe(
+        "La présente proposition constitue la complémentaire au régime de santé obligatoire de base : "
+        "la Couverture Maladie Universelle (CMU). Elle a pour objet la couverture des dépenses d'ordre "
+        "médical et chirurgical engagées à la suite de maladie, d'accident ou de maternité du souscripteur "
+        "et des personnes désignées sous le vocable « personnes assurées » conformément au barème choisi "
+        "par lui et mentionné aux conditions particulières.",
+        normal_style
+    ))
+    elements.append(Spacer(1, 0.3*cm))
+    
+    # II. MODE DE GESTION
+    elements.append(moteur_pdf.paragraphe("<b>II. MODE DE GESTION</b>", section_title_style))
+    
+    elements.append(moteur_pdf.paragraphe(
+        "<b>• Tiers payant :</b> Il est offert au titre de la formule du TIERS PAYANT un système d'identification "
+        "des assurés par carte à photo (Carte d'accès). Cette carte permettra au bénéficiaire de justifier de sa "
+        "qualité d'assuré, tant auprès des centres de santé conventionnés qu'auprès des services compétents de la "
+        "société. Sur présentation de la carte dans un établissement conventionné, à l'exception des actes nécessitant "
+        "des accords préalables de l'assureur, l'assuré bénéficiera des prestations puis règlera le montant à sa charge "
+        "(ticket modérateur).",
+        bullet_style
+    ))
+    elements.append(Spacer(1, 0.2*cm))
+    
+    elements.append(moteur_pdf.paragraphe(
+        "<b>• Système de remboursement :</b> Pour les prestations exécutées en dehors du réseau de centres conventionnés, "
+        "le gestionnaire mandaté par l'Assureur, ANKARA SERVICE, s'engagera à procéder aux remboursements des frais dans "
+        "un délai maximum de 30 jours selon les dispositions du barème de remboursement sur présentation des originaux des justificatifs.",
+        bullet_style
+    ))
+    elements.append(Spacer(1, 0.3*cm))
+    
+    # III. AGE LIMITE DE SOUSCRIPTION
+    elements.append(moteur_pdf.paragraphe("<b>III. AGE LIMITE DE SOUSCRIPTION</b>", section_title_style))
+    elements.append(moteur_pdf.paragraphe(
+        "<b>• Adultes :</b> 65 ans, avec une surprime âge à partir de 51 ans / Au-delà, garanti sur accord du directeur médical",
+        bullet_style
+    ))
+    elements.append(moteur_pdf.paragraphe(
+        "<b>• Enfants :</b> 21 ans, Jusqu'à 25 ans en cas de continuité de scolarité sous réserve de justificatifs.",
+        bullet_style
+    ))
+    elements.append(Spacer(1, 0.3*cm))
+    
+    # IV. COMPOSITION FAMILIALE
+    elements.append(moteur_pdf.paragraphe("<b>IV. COMPOSITION FAMILIALE</b>", section_title_style))
+    elements.append(moteur_pdf.paragraphe(
+        "La famille est réputée se composer de 05 personnes maximum (Adhérent principal + Conjoint légal ou non + 03 enfants). "
+        "On appelle \"Enfant supplémentaire\" tout enfant au-delà du 3ème enfant. Si enfant non biologique, fournir un certificat "
+        "de tutelle pour la prise en charge. Un questionnaire doit être impérativement renseigné et de bonne foi afin de déterminer "
+        "avec exactitude la prime correspondante.",
+        normal_style
+    ))
+    elements.append(Spacer(1, 0.3*cm))
+    
+    # V. DELAI DE CARENCE
+    elements.append(moteur_pdf.paragraphe("<b>V. DELAI DE CARENCE</b>", section_title_style))
+    elements.append(moteur_pdf.paragraphe("• 1 mois après la souscription pour les soins ordinaires ;", bullet_style))
+    elements.append(moteur_pdf.paragraphe("• 6 mois pour la lunetterie et les prothèses ;", bullet_style))
+    elements.append(moteur_pdf.paragraphe("• 9 mois pour les frais de maternité et d'accouchement ;", bullet_style))
+    elements.append(moteur_pdf.paragraphe("• 12 mois pour les maladies chroniques survenant pour la première fois pendant le contrat ;", bullet_style))
+    elements.append(moteur_pdf.paragraphe("• Abrogés en cas de continuité d'assurance, avec preuve à l'appui.", bullet_style))
+    
+    # Saut de page
+    elements.append(PageBreak())
+    
+    # ==================== PAGE 2 ====================
+    
+    # VI. PAIEMENT DE LA PRIME
+    elements.append(moteur_pdf.paragraphe("<b>VI. PAIEMENT DE LA PRIME (ARTICLE 13 CODE CIMA)</b>", section_title_style))
+    elements.append(moteur_pdf.paragraphe(
+        "La prime est payable au domicile de l'assureur ou de l'intermédiaire. La prise d'effet du contrat est subordonnée "
+        "au paiement de la prime par le souscripteur.",
+        normal_style
+    ))
+    elements.append(Spacer(1, 0.2*cm))
+    elements.append(moteur_pdf.paragraphe(
+        "Il est interdit aux entreprises d'assurance, sous peine des sanctions prévues à l'article 312, de souscrire un contrat "
+        "d'assurance dont la prime n'est pas payée ou de renouveler un contrat d'assurance dont la prime n'a pas été payée.",
+        normal_style
+    ))
+    elements.append(Spacer(1, 0.2*cm))
+    elements.append(moteur_pdf.paragraphe(
+        "Lorsqu'un chèque ou un effet remis en paiement de la prime revient impayé, l'assuré est mis en demeure de régulariser "
+        "le paiement dans un délai de huit jours ouvrés à compter de la réception de l'acte ou de la lettre de mise en demeure. "
+        "A l'expiration de ce délai, si la régularisation n'est pas effectuée, le contrat est résilié de plein droit.",
+        normal_style
+    ))
+    elements.append(Spacer(1, 0.2*cm))
+    elements.append(moteur_pdf.paragraphe(
+        "La portion de prime courue reste acquise à l'assureur, sans préjudice des éventuels frais de poursuite et de recouvrement.",
+        normal_style
+    ))
+    elements.append(Spacer(1, 0.4*cm))
+    
+    # VII. SOUSCRIPTION
+    elements.append(moteur_pdf.paragraphe("<b>VII. SOUSCRIPTION</b>", section_title_style))
+    elements.append(moteur_pdf.paragraphe("Les pièces à fournir pour la mise en place de la police sont les suivantes :", normal_style))
+    elements.append(Spacer(1, 0.2*cm))
+    elements.append(moteur_pdf.paragraphe("• La liste des personnes à assurer ;", bullet_style))
+    elements.append(moteur_pdf.paragraphe("• Les questionnaires médicaux renseignés pour chaque adhérent et les membres de sa famille ;", bullet_style))
+    elements.append(moteur_pdf.paragraphe("• Les copies des cartes CMU (ou les récépissés d'enrôlement en cas d'indisponibilité des cartes) ;", bullet_style))
+    elements.append(moteur_pdf.paragraphe("• Les CNI pour les adultes et les extraits de naissance pour les enfants ;", bullet_style))
+    elements.append(moteur_pdf.paragraphe("• Une photo couleur pour chaque personne ;", bullet_style))
+    elements.append(moteur_pdf.paragraphe("• La copie du paiement (Espèces, chèque ou virement) ;", bullet_style))
+    elements.append(moteur_pdf.paragraphe("• La preuve d'assurance antérieure afin de lever les délais de carence et assurer la continuité d'assurance.", bullet_style))
+    elements.append(Spacer(1, 0.4*cm))
+    
+    # VIII. AUTRES DISPOSITIONS
+    elements.append(moteur_pdf.paragraphe("<b>VIII. AUTRES DISPOSITIONS</b>", section_title_style))
+    elements.append(moteur_pdf.paragraphe(
+        "• L'acceptation définitive du risque est soumise à l'analyse du questionnaire médical dument renseigné et signé par le prospect ;",
+        bullet_style
+    ))
+    elements.append(moteur_pdf.paragraphe(
+        "• La cotation santé a été faite sous réserve de l'acceptation et de la souscription à d'autres risques d'accompagnement "
+        "(Auto, MRH, RC, MRP, etc...) ;",
+        bullet_style
+    ))
+    elements.append(moteur_pdf.paragraphe(
+        "• Fournir obligatoirement les statistiques antérieures avant toute souscription (client ayant bénéficié d'une couverture "
+        "sante sans interruption au cours de l'année N-1)",
+        bullet_style
+    ))
+    elements.append(moteur_pdf.paragraphe("• Validité de la cotation : 03 Mois", bullet_style))
+    elements.append(Spacer(1, 0.5*cm))
+    
+    # Date et signature
+    date_signature_paragraph = Paragraph(
+        f"<b>Fait à Abidjan le {date_signature}</b>",
+        styles['DateStyle']
+    )
+    elements.append(date_signature_paragraph)
+    elements.append(Spacer(1, 0.3*cm))
+    
+    # Signature
+    signature_paragraph = moteur_pdf.paragraphe(
+        "<b>Pour L'ASSUREUR</b>",
+        styles['SignatureLabel']
+    )
+    elements.append(signature_paragraph)
+    elements.append(Spacer(1, 0.1*cm))  # Réduire l'espace pour coller la signature
+    
+    # Image de la signature
+    signature = registre_assets.image(IMAGE_SIGNATURE)
+    if signature is not None:
+        try:
+            signature_img = ImageAsset(signature, width=4*cm, height=2.5*cm)  # Réduire légèrement la hauteur
+            signature_table = Table([[signature_img]], colWidths=[18*cm])  # Utiliser toute la largeur
+            signature_table.setStyle(moteur_pdf.style_tableau('proposition.image_droite', lambda: [
+                ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
+                ('VALIGN', (0, 0), (0, 0), 'TOP'),
+            ]))
+            elements.append(signature_table)
+        except:
+            pass
+    
+    # Saut de page
+    elements.append(PageBreak())
+    
+    return elements
+
+
+def _commandes_recapitulatif() -> List[Tuple]:
+    """Style commun des tableaux récapitulatifs (page 3)."""
+    return [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a1a1a')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (0, -1), colors.HexColor('#f8f9fa')),
+        ('TEXTCOLOR', (0, 1), (0, -1), colors.HexColor('#495057')),
+        ('ALIGN', (0, 1), (0, -1), 'LEFT'),
+        ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 1), (0, -1), 8),
+        ('ALIGN', (1, 1), (-1, -1), 'CENTER'),
+        ('FONTNAME', (1, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (1, 1), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#1a1a1a')),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('ROWBACKGROUNDS', (1, 1), (-1, -1), [colors.white, colors.HexColor('#f8f8f8')]),
+    ]
+
+
+def _ligne_prime_nette(i: int) -> List[Tuple]:
+    return [
+        ('BACKGROUND', (0, i), (-1, i), colors.HexColor('#f2e8d9')),
+        ('FONTNAME', (0, i), (-1, i), 'Helvetica-Bold'),
+    ]
+
+
+# Mise en valeur de certaines lignes du récapitulatif, par désignation
+_MISE_EN_VALEUR_RECAPITULATIF = {
+    'PRIME NETTE / PERSONNE': _ligne_prime_nette,
+    'PRIME NETTE TOTALE': _ligne_prime_nette,
+    'PRIME TTC ANNUELLE': lambda i: [
+        ('BACKGROUND', (0, i), (-1, i), colors.HexColor('#754015')),
+        ('TEXTCOLOR', (0, i), (-1, i), colors.whitesmoke),
+        ('FONTNAME', (0, i), (-1, i), 'Helvetica-Bold'),
+    ],
+    'MONTANT TOTAL À PAYER': lambda i: [
+        ('BACKGROUND', (0, i), (-1, i), colors.HexColor('#145d33')),
+        ('TEXTCOLOR', (0, i), (-1, i), colors.whitesmoke),
+        ('FONTNAME', (0, i), (-1, i), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, i), (-1, i), 10),
+    ],
+}
+
+
+def _elements_pages_variables(
+    styles,
+    data_frame: pd.DataFrame,
+    nb_options: int,
+    bareme_image_bytes: Optional[bytes]
+) -> List[Any]:
+    """Pages 3 et 4 : tableau récapitulatif des options et barème de remboursement."""
+    title_style = styles['CustomTitle']
+    cell_style = styles['CellStyle']
+    
+    elements = []
+    
+    # ==================== PAGE 3 - TABLEAU COMPARATIF ====================
+    
+    title = moteur_pdf.paragraphe("OFFRE SANTÉ - RÉCAPITULATIF", title_style)
+    elements.append(title)
+    elements.append(Spacer(1, 0.5*cm))
+    
+    table_data = []
+    
+    if nb_options == 1:
+        table_data.append(['Désignation', 'OPTION 1'])
+        col_widths = [8*cm, 7*cm]
+    elif nb_options == 2:
+        table_data.append(['Désignation', 'OPTION 1', 'OPTION 2'])
+        col_widths = [6*cm, 4.5*cm, 4.5*cm]
+    else:
+        table_data.append(['Désignation', 'OPTION 1', 'OPTION 2', 'OPTION 3'])
+        col_widths = [5*cm, 4*cm, 4*cm, 4*cm]
+    
+    # Colonnes lues une fois (iterrows construit une Series par ligne)
+    designations = [str(designation) for designation in data_frame['Désignation']]
+    colonnes_options = [
+        [str(valeur) for valeur in data_frame[f'OPTION {i+1}']]
+        for i in range(nb_options)
+        if f'OPTION {i+1}' in data_frame.columns
+    ]
+    for row_idx, designation in enumerate(designations):
+        row_data = [designation]
+        for colonne in colonnes_options:
+            cell_value = colonne[row_idx]
+            if '\n' in cell_value:
+                cell_value_html = cell_value.replace('\n', '<br/>')
+                row_data.append(Paragraph(cell_value_html, cell_style))
+            else:
+                row_data.append(cell_value)
+        table_data.append(row_data)
+    
+    table = Table(table_data, colWidths=col_widths)
+    table.setStyle(moteur_pdf.style_tableau('proposition.recapitulatif', _commandes_recapitulatif))
+    
+    # Lignes mises en valeur, propres à ce tableau
+    lignes_en_valeur = []
+    for row_idx, designation in enumerate(designations, start=1):
+        mise_en_valeur = _MISE_EN_VALEUR_RECAPITULATIF.get(designation)
+        if mise_en_valeur is not None:
+            lignes_en_valeur += mise_en_valeur(row_idx)
+    if lignes_en_valeur:
+        table.setStyle(lignes_en_valeur)
+    elements.append(table)
+    elements.append(Spacer(1, 0.5*cm))
+    
+    # Note en bas de page 3
+    note_text = moteur_pdf.paragraphe(
+        "<i>Note : Les montants sont exprimés en FCFA. Proposition valable 3 mois.</i>",
+        styles['NoteStyle']
+    )
+    elements.append(note_text)
+    
+    # Saut de page pour le barème
+    elements.append(PageBreak())
+    
+    # ==================== PAGE 4 - IMAGE DU BAREME ====================
+    
+    elements.append(moteur_pdf.paragraphe("BARÈME DE REMBOURSEMENT", title_style))
+    elements.append(Spacer(1, 0.5*cm))
+    
+    if bareme_image_bytes:
+        # Image normalisée (DPI cible, recompressée) et décodée une seule fois par contenu
+        bareme = registre_assets.image_importee(bareme_image_bytes, TAILLE_BAREME)
+        if bareme is not None:
+            elements.append(ImageAsset(bareme[1], *TAILLE_BAREME))
+        else:
+            # Si erreur, afficher le placeholder
+            placeholder_text = moteur_pdf.paragraphe(
+                "<i>[Erreur de chargement de l'image du barème]</i>",
+                styles['ErreurStyle']
+            )
+            elements.append(Spacer(1, 3*cm))
+            elements.append(placeholder_text)
+            elements.append(Spacer(1, 3*cm))
+    else:
+        # Pas d'image uploadée
+        placeholder_text = moteur_pdf.paragraphe(
+            "<i>[Image du barème de remboursement à insérer via l'interface]</i>",
+            styles['PlaceholderStyle']
+        )
+        elements.append(Spacer(1, 3*cm))
+        elements.append(placeholder_text)
+        elements.append(Spacer(1, 3*cm))
+        
+        instruction_text = moteur_pdf.paragraphe(
+            "Pour ajouter l'image du barème, veuillez la télécharger dans la section '📸 Image du Barème' avant de générer le PDF.",
+            styles['InstructionStyle']
+        )
+        elements.append(instruction_text)
+    
+    return elements
+
+
+# ==================== PRÉ-RENDU DES PAGES FIXES ====================
+
+class _EmplacementReferences(Flowable):
+    """
+    Réserve la place du tableau des références dans le gabarit pré-rendu et
+    relève sa position (page, coordonnées) pour y superposer le vrai tableau.
+    """
+
+    def __init__(self, largeur: float, hauteur: float, position: Dict[str, Any]):
+        super().__init__()
+        self.largeur = largeur
+        self.hauteur = hauteur
+        self.position = position
+        self.hAlign = 'CENTER'
+
+    def wrap(self, availWidth, availHeight):
+        return self.largeur, self.hauteur
+
+    def draw(self):
+        self.position['page'] = self.canv.getPageNumber()
+        self.position['x'], self.position['y'] = self.canv.absolutePosition(0, 0)
+
+
+_gabarits: "OrderedDict[Tuple, Tuple[bytes, Dict[str, Any]]]" = OrderedDict()
+_verrou_gabarits = threading.Lock()
+# Gabarits dont la fusion a échoué : rendu complet sans nouvel essai (ni nouvelle trace)
+_fusions_echouees: set = set()
+
+
+def _cle_gabarit(date_signature: str) -> Tuple:
+    return (VERSION_GABARIT_PROPOSITION, date_signature, registre_assets.optimiser, registre_assets.dpi)
+
+
+@mesurer("pdf.proposition.gabarit")
+def _rendre_gabarit(styles, date_signature: str) -> Tuple[bytes, Dict[str, Any]]:
+    """Rend les pages fixes avec un emplacement vide à la place des références."""
+    largeur, hauteur = _table_references({}).wrap(A4[0], A4[1])
+    position: Dict[str, Any] = {}
+    elements = _elements_pages_fixes(styles, _EmplacementReferences(largeur, hauteur, position), date_signature)
+    # Le saut de page final produirait une page blanche en fin de gabarit
+    if isinstance(elements[-1], PageBreak):
+        elements = elements[:-1]
+    return _construire_pdf(elements), position
+
+
+def _gabarit_pages_fixes(styles, date_signature: str) -> Tuple[bytes, Dict[str, Any]]:
+    """
+    Pages fixes pré-rendues, une fois par version du gabarit et par date de
+    signature (la date figure en page 2). Les NB_GABARITS_MAX dates les plus
+    récemment utilisées sont conservées (LRU).
+    """
+    cle = _cle_gabarit(date_signature)
+    with _verrou_gabarits:
+        if cle in _gabarits:
+            _gabarits.move_to_end(cle)
+        else:
+            _gabarits[cle] = _rendre_gabarit(styles, date_signature)
+            while len(_gabarits) > NB_GABARITS_MAX:
+                _gabarits.popitem(last=False)
+        return _gabarits[cle]
+
+
+def _objet_indirect(writer, objet):
+    """
+    Ajoute `objet` au document et retourne sa référence. pypdf 6.x n'expose
+    que PdfWriter._add_object ; la méthode publique est préférée si présente.
+    """
+    ajouter = getattr(writer, 'add_object', None) or writer._add_object
+    return ajouter(objet)
+
+
+def _incruster_page(writer, page, calque):
+    """
+    Superpose `calque` à `page` sous forme de Form XObject : le flux du calque
+    est repris tel quel, sans analyse ni renommage des ressources (contrairement
+    à PageObject.merge_page, qui réécrit les deux flux de contenu).
+    """
+    formulaire = DecodedStreamObject()
+    formulaire.set_data(calque.get_contents().get_data())
+    formulaire.update({
+        NameObject('/Type'): NameObject('/XObject'),
+        NameObject('/Subtype'): NameObject('/Form'),
+        NameObject('/BBox'): ArrayObject([FloatObject(v) for v in calque.mediabox]),
+        NameObject('/Resources'): calque['/Resources'].clone(writer),
+    })
+    
+    ressources = page['/Resources'].get_object()
+    if '/XObject' not in ressources:
+        ressources[NameObject('/XObject')] = DictionaryObject()
+    ressources['/XObject'].get_object()[NameObject('/AkoraReferences')] = _objet_indirect(writer, formulaire)
+    
+    appel = DecodedStreamObject()
+    appel.set_data(b"q /AkoraReferences Do Q")
+    contenus = page['/Contents'].get_object()
+    contenus = list(contenus) if isinstance(contenus, ArrayObject) else [page.raw_get('/Contents')]
+    page[NameObject('/Contents')] = ArrayObject(contenus + [_objet_indirect(writer, appel)])
+
+
+@mesurer("pdf.proposition.assemblage")
+def _assembler_proposition(
+    styles,
+    data_frame: pd.DataFrame,
+    nb_options: int,
+    principal_data: Optional[Dict[str, Any]],
+    bareme_image_bytes: Optional[bytes],
+    date_signature: str
+) -> bytes:
+    """Fusionne les pages fixes pré-rendues avec les références et les pages variables."""
+    gabarit, position = _gabarit_pages_fixes(styles, date_signature)
+    
+    # Références du client, dessinées seules à l'emplacement réservé
+    buffer_references = io.BytesIO()
+    canvas_references = canvas.Canvas(buffer_references, pagesize=A4, invariant=PDF_INVARIANTS)
+    table_references = _table_references(principal_data)
+    table_references.wrapOn(canvas_references, A4[0], A4[1])
+    table_references.drawOn(canvas_references, position['x'], position['y'])
+    canvas_references.showPage()
+    canvas_references.save()
+    
+    pages_variables = _construire_pdf(
+        _elements_pages_variables(styles, data_frame, nb_options, bareme_image_bytes)
+    )
+    
+    writer = PdfWriter(clone_from=io.BytesIO(gabarit))
+    _incruster_page(writer, writer.pages[position['page'] - 1], PdfReader(buffer_references).pages[0])
+    for page in PdfReader(io.BytesIO(pages_variables)).pages:
+        writer.add_page(page)
+    # Logo et bas de page figurent dans les deux documents : une seule copie
+    writer.compress_identical_objects()
+    
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+@mesurer("pdf.proposition")
+def generer_pdf_proposition(
+    data_frame: pd.DataFrame,
+    options_data: List[Dict],
+    nb_options: int,
+    principal_data: Optional[Dict[str, Any]] = None,
+    bareme_image_bytes: Optional[bytes] = None,
+    date_document: Optional[date] = None
+) -> bytes:
+    """
+    Génère un PDF professionnel complet sur 4 pages.
+    
+    Les pages fixes (conditions, signature) sont pré-rendues une fois par jour
+    et fusionnées avec les pages propres au client ; sans pypdf, avec les
+    assets non optimisés (images brutes, au-delà des limites de décompression
+    de pypdf) ou après un échec de fusion du même gabarit, le document est
+    entièrement rendu.
+    
+    Args:
+        data_frame: Tableau récapitulatif (colonne 'Désignation' + une colonne par option)
+        options_data: Données des options affichées
+        nb_options: Nombre d'options
+        principal_data: Références de la proposition (reference, apporteur, prospect)
+        bareme_image_bytes: Image du barème de remboursement (page 4), optionnelle
+        date_document: Date de la proposition imprimée en page de signature
+            (aujourd'hui par défaut) ; à entrées et date identiques, le PDF
+            est identique à l'octet près
+    
+    Returns:
+        bytes: Contenu du PDF
+    """
+    # Styles partagés (construits une fois par processus)
+    styles = registre_assets.styles('proposition', _creer_styles_proposition)
+    date_signature = (date_document or date.today()).strftime('%d %B %Y')
+    
+    cle = _cle_gabarit(date_signature)
+    if (PdfWriter is not None and PRERENDU_PAGES_FIXES and registre_assets.optimiser
+            and cle not in _fusions_echouees):
+        try:
+            return _assembler_proposition(
+                styles, data_frame, nb_options, principal_data, bareme_image_bytes, date_signature
+            )
+        except Exception:
+            with _verrou_gabarits:
+                _fusions_echouees.add(cle)
+            journal.exception("evenement=fusion_proposition_echouee gabarit=%s : rendu complet désormais", cle)
+    
+    elements = _elements_pages_fixes(styles, _table_references(principal_data), date_signature)
+    elements += _elements_pages_variables(styles, data_frame, nb_options, bareme_image_bytes)
+    return _construire_pdf(elements)
+
+
+def cle_proposition(
+    data_frame: pd.DataFrame,
+    options_data: List[Dict],
+    nb_options: int,
+    principal_data: Optional[Dict[str, Any]] = None,
+    bareme_image_bytes: Optional[bytes] = None,
+    date_document: Optional[date] = None
+) -> str:
+    """
+    Empreinte canonique des entrées d'une proposition : deux demandes de même
+    empreinte produisent le même PDF. La date de la proposition en fait partie
+    (elle est imprimée sur la page de signature), ainsi que la version du gabarit.
+    """
+    return empreinte_canonique(
+        'proposition',
+        VERSION_GABARIT_PROPOSITION,
+        date_document or date.today(),
+        data_frame,
+        options_data,
+        nb_options,
+        principal_data,
+        hashlib.sha256(bareme_image_bytes).hexdigest() if bareme_image_bytes else None,
+    )
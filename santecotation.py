@@ -1,10 +1,11 @@
 import streamlit as st
 import math
 import pandas as pd
-import io
-from typing import Dict, Any, List, Optional, Tuple
+import json
+from typing import Dict, Any, List, Optional, Tuple, Callable
 from datetime import datetime, date
 import random
+import time
 from data import * # Assurez-vous que le fichier data.py existe et contient les constantes nécessaires
 from calculations import ( # Assurez-vous que le fichier calculations.py existe et contient toutes les fonctions importées.
     format_currency,
@@ -21,18 +22,30 @@ from calculations import ( # Assurez-vous que le fichier calculations.py existe
     traiter_ligne_assure as calc_traiter_ligne_assure,
     micro_tarification_excel as calc_micro_tarification_excel,
     generer_template_excel as calc_generer_template_excel,
+    resultat_corporate_assure,
 )
 from ui_components import display_member_form
 from database import DatabaseManager
+from session_store import FichierSession, jetons_session, session_store
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from jobs import job_runner, TERMINE, ERREUR, ANNULE, STATUTS_FINAUX
+from scheduler import ordonnanceur, PRIORITE_INTERACTIVE, PRIORITE_LOURDE, priorite_micro_tarification
+from pdf_proposition import generer_pdf_proposition as pdf_generer_pdf_proposition, cle_proposition
+from pdf_lots import rendu_lots
+from pdf_annexe import generer_annexe_assures
+from instrumentation import chronometre
+from pdf_assets import registre_assets, TAILLE_BAREME
+from pdf_mise_en_page import moteur_pdf
+from pagination import Page, TAILLES_PAGE, TAILLE_PAGE_DEFAUT
+from statistiques import cumuler
+from transport import transport_base, transport_stockage
+from chargement import ChargementPage
+from file_sauvegardes import file_sauvegardes
+from cache_cotations import cache_resultats, cache_pdf, cle_cotation_particulier
 import uuid
 
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import cm
 from reportlab.pdfgen import canvas
-from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_RIGHT
 
 
 # --- CONFIGURATION DE LA PAGE ---
@@ -43,12 +56,68 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# Début du rerun (durée enregistrée en fin de script, voir onglet Paramétrages > Système)
+_debut_rerun = time.perf_counter()
+
+# Images des PDF décodées une fois par processus (sans effet aux reruns suivants)
+registre_assets.precharger()
+
+# --- STOCKAGE DES OBJETS VOLUMINEUX DE SESSION ---
+# PDF, images, DataFrames et résultats sont conservés hors de st.session_state
+# (mémoire pour les petits objets, disque pour les gros, budget par session)
+
+def _session_streamlit_active(session_streamlit: str) -> bool:
+    return Runtime.exists() and Runtime.instance().is_active_session(session_streamlit)
+
+def identifiant_session() -> str:
+    """
+    Retourne l'identifiant de la session courante pour le stockage des objets
+    et les tâches en arrière-plan : un jeton émis par le serveur (voir
+    JetonsSession), placé dans l'URL (?sid=) pour qu'un rechargement de la
+    page retrouve documents et tâches. Un jeton inconnu du serveur, expiré
+    ou encore détenu par un onglet ouvert est remplacé par un nouveau.
+    """
+    if 'session_id' not in st.session_state:
+        contexte = get_script_run_ctx(suppress_warning=True)
+        session_streamlit = contexte.session_id if contexte is not None else uuid.uuid4().hex
+        jeton = st.query_params.get('sid')
+        if not jetons_session.reprendre(jeton, session_streamlit, _session_streamlit_active):
+            jeton = jetons_session.emettre(session_streamlit)
+        st.session_state['session_id'] = jeton
+    jeton = st.session_state['session_id']
+    jetons_session.toucher(jeton)
+    if st.query_params.get('sid') != jeton:
+        st.query_params['sid'] = jeton
+    return jeton
+
+def stocker_blob(cle: str, valeur: Any) -> bool:
+    """Stocke un objet volumineux de la session courante ; affiche une erreur s'il n'a pas pu l'être."""
+    if session_store.stocker(identifiant_session(), cle, valeur):
+        return True
+    st.error(
+        f"❌ Données trop volumineuses pour la session ({cle}) : budget de "
+        f"{session_store.budget_session / (1024 * 1024):,.0f} Mo dépassé (AKORA_BUDGET_SESSION_MO)."
+    )
+    return False
+
+def lire_blob(cle: str, defaut: Any = None) -> Any:
+    """Lit un objet volumineux de la session courante."""
+    return session_store.lire(identifiant_session(), cle, defaut)
+
+def blob_present(cle: str) -> bool:
+    """Indique si un objet volumineux est stocké pour la session courante."""
+    return session_store.contient(identifiant_session(), cle)
+
+def supprimer_blob(cle: str):
+    """Supprime un objet volumineux de la session courante."""
+    session_store.supprimer(identifiant_session(), cle)
+
 # --- INITIALISATION DES VARIABLES SESSION_STATE ---
 # Initialiser toutes les variables nécessaires dès le début
 if 'baremes_selectionnes_list' not in st.session_state:
     st.session_state.baremes_selectionnes_list = []
-if 'resultats_part_multi' not in st.session_state:
-    st.session_state.resultats_part_multi = {}
+if not blob_present('resultats_part_multi'):
+    stocker_blob('resultats_part_multi', {})
 if 'configurations_baremes' not in st.session_state:
     st.session_state.configurations_baremes = {}
 if 'principal_data' not in st.session_state:
@@ -85,7 +154,8 @@ def sauvegarder_cotation_supabase(
     Sauvegarde une cotation dans Supabase avec le PDF BINAIRE pour téléchargement IDENTIQUE.
     
     Args:
-        pdf_bytes: Le PDF généré en bytes - sera stocké en base64 pour téléchargement identique
+        pdf_bytes: Le PDF généré en bytes - déposé tel quel dans le stockage de
+            documents, le devis n'en garde que la référence
     
     Returns:
         bool: True si sauvegarde réussie, False sinon
@@ -95,15 +165,8 @@ def sauvegarder_cotation_supabase(
         return False
     
     try:
-        import base64
-        
         numero_devis = generer_numero_devis("PART" if type_marche == "Particulier" else "CORP")
         
-        # Convertir le PDF en base64 pour stockage
-        pdf_base64 = None
-        if pdf_bytes:
-            pdf_base64 = base64.b64encode(pdf_bytes).decode('utf-8')
-        
         # Stocker TOUTES les données + le PDF binaire
         devis_data = {
             'numero_devis': numero_devis,
@@ -127,7 +190,7 @@ def sauvegarder_cotation_supabase(
             'surprime_age': resultat.get('surprime_age_taux', 0),
             'duree_contrat': duree_contrat,
             'statut': 'En attente',
-            'pdf_data': pdf_base64,  # PDF STOCKÉ EN BASE64
+            'pdf_bytes': pdf_bytes,  # Déposé dans le stockage de documents
             'details': {
                 'prime_nette_base': resultat.get('prime_nette_base', 0),
                 'prime_nette_finale': resultat.get('prime_nette_finale', 0),
@@ -225,8 +288,11 @@ def calculer_prime_particuliers(
     prime_lsp_manuelle: Optional[float] = None,
     prime_assist_psy_manuelle: Optional[float] = None
 ) -> Dict[str, Any]:
-    """Wrapper vers calculations.calculer_prime_particuliers."""
-    return calc_calculer_prime_particuliers(
+    """
+    Wrapper vers calculations.calculer_prime_particuliers.
+    Les cotations standard (sans saisie manuelle) sont partagées entre sessions.
+    """
+    parametres = dict(
         produit_key=produit_key,
         type_couverture=type_couverture,
         enfants_supplementaires=enfants_supplementaires,
@@ -244,6 +310,11 @@ def calculer_prime_particuliers(
         prime_lsp_manuelle=prime_lsp_manuelle,
         prime_assist_psy_manuelle=prime_assist_psy_manuelle,
     )
+    cle = cle_cotation_particulier(parametres)
+    with ordonnanceur.interactif():
+        if cle is None:
+            return calc_calculer_prime_particuliers(**parametres)
+        return cache_resultats.obtenir_ou_calculer(cle, lambda: calc_calculer_prime_particuliers(**parametres))
 
 def calculer_prime_corporate_rapide(
     produit_key: str, 
@@ -260,20 +331,21 @@ def calculer_prime_corporate_rapide(
     prime_assist_psy_manuelle: Optional[float] = None
 ) -> Dict[str, Any]:
     """Wrapper vers calculations.calculer_prime_corporate_rapide."""
-    return calc_calculer_prime_corporate_rapide(
-        produit_key=produit_key,
-        nb_familles=nb_familles,
-        nb_personnes_seules=nb_personnes_seules,
-        nb_enfants_supplementaires=nb_enfants_supplementaires,
-        surprime_risques=surprime_risques,
-        reduction_commerciale=reduction_commerciale,
-        duree_contrat=duree_contrat,
-        prime_nette_manuelle=prime_nette_manuelle,
-        accessoires_manuels=accessoires_manuels,
-        accessoire_plus=accessoire_plus,
-        prime_lsp_manuelle=prime_lsp_manuelle,
-        prime_assist_psy_manuelle=prime_assist_psy_manuelle,
-    )
+    with ordonnanceur.interactif():
+        return calc_calculer_prime_corporate_rapide(
+            produit_key=produit_key,
+            nb_familles=nb_familles,
+            nb_personnes_seules=nb_personnes_seules,
+            nb_enfants_supplementaires=nb_enfants_supplementaires,
+            surprime_risques=surprime_risques,
+            reduction_commerciale=reduction_commerciale,
+            duree_contrat=duree_contrat,
+            prime_nette_manuelle=prime_nette_manuelle,
+            accessoires_manuels=accessoires_manuels,
+            accessoire_plus=accessoire_plus,
+            prime_lsp_manuelle=prime_lsp_manuelle,
+            prime_assist_psy_manuelle=prime_assist_psy_manuelle,
+        )
 
 
 def valider_fichier_excel(df: pd.DataFrame) -> Tuple[bool, Optional[str], Optional[pd.DataFrame]]:
@@ -297,13 +369,15 @@ def traiter_ligne_assure(
 def micro_tarification_excel(
     df: pd.DataFrame,
     produit_key: str,
-    duree_contrat: int
+    duree_contrat: int,
+    progression: Optional[Callable[[int, int], None]] = None
 ) -> Dict[str, Any]:
     """Wrapper vers calculations.micro_tarification_excel."""
     return calc_micro_tarification_excel(
         df=df,
         produit_key=produit_key,
         duree_contrat=duree_contrat,
+        progression=progression,
     )
 
 
@@ -513,10 +587,10 @@ def reset_results():
         del st.session_state['resultat_part']
     if 'resultat_corp_rapide' in st.session_state:
         del st.session_state['resultat_corp_rapide']
-    if 'resultat_corp_excel' in st.session_state:
-        del st.session_state['resultat_corp_excel']
-    if 'df_corporate' in st.session_state:
-        del st.session_state['df_corporate']
+    supprimer_blob('resultat_corp_excel')
+    supprimer_blob('zip_propositions_assures')
+    supprimer_blob('annexe_assures')
+    supprimer_blob('df_corporate')
 
 
 
@@ -628,456 +702,440 @@ def charger_infos_client(type_couv: str):
 # ==============================================================================
 
 def generer_pdf_proposition(data_frame: pd.DataFrame, options_data: List[Dict], nb_options: int) -> bytes:
-    """Génère un PDF professionnel complet sur 4 pages."""
-    from reportlab.platypus import Image
-    import os
-    
-    buffer = io.BytesIO()
-    
-    # Fonction pour ajouter le bas de page à chaque page
-    def ajouter_bas_de_page(canvas_obj, doc):
-        """Ajoute le bas de page à chaque page du document."""
-        canvas_obj.saveState()
-        
-        # Vérifier si l'image du bas de page existe
-        if os.path.exists('bas_de_page.png'):
-            try:
-                # Positionner l'image en bas de page sur toute la largeur
-                page_width, page_height = A4
-                img_width = page_width  # Toute la largeur de la page
-                img_height = 0.5*cm  # Hauteur de l'image
-                x_position = 0  # Commencer depuis le bord gauche
-                y_position = 0  # Position depuis le bas (bord inférieur)
-                
-                canvas_obj.drawImage('bas_de_page.png', 
-                                   x_position, 
-                                   y_position, 
-                                   width=img_width, 
-                                   height=img_height,
-                                   preserveAspectRatio=False,  # Étirer pour prendre toute la largeur
-                                   mask='auto')
-            except Exception as e:
-                # En cas d'erreur, ne rien afficher
-                pass
-        
-        canvas_obj.restoreState()
-    
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=A4,
-        rightMargin=1.5*cm,
-        leftMargin=1.5*cm,
-        topMargin=0.4*cm,  # Réduire davantage la marge du haut
-        bottomMargin=2.5*cm  # Marge du bas pour le footer pleine largeur
+    """Wrapper vers pdf_proposition.generer_pdf_proposition avec les données de la session."""
+    return pdf_generer_pdf_proposition(
+        data_frame,
+        options_data,
+        nb_options,
+        principal_data=st.session_state.get('principal_data', {}),
+        bareme_image_bytes=lire_blob('bareme_image_bytes'),
     )
+
+
+# ==============================================================================
+# TÂCHES EN ARRIÈRE-PLAN (micro-tarification, PDF)
+# ==============================================================================
+
+def _job_micro_tarification(job, df: pd.DataFrame, produit_key: str, duree_contrat: int) -> Dict[str, Any]:
+    """Tâche d'arrière-plan : micro-tarification ligne par ligne du fichier Excel."""
+    return micro_tarification_excel(df, produit_key, duree_contrat, progression=job.signaler_progression)
+
+
+def _job_pdf_lot_assures(
+    job,
+    resultat_micro: Dict[str, Any],
+    produit_key: str,
+    produit_name: str,
+    entreprise_info: Dict[str, Any]
+) -> FichierSession:
+    """Tâche d'arrière-plan : une proposition PDF par assuré éligible, réunies dans un ZIP (sur disque)."""
+    eligibles = [r for r in resultat_micro['resultats_lignes'] if r['statut'] == 'eligible']
+    date_lot = date.today()
+    job.signaler_progression(0, len(eligibles), "Démarrage des processus de rendu...")
+    
+    def documents():
+        # Générateur : les documents sont construits au rythme du rendu
+        for numero, resultat_ligne in enumerate(eligibles, start=1):
+            ligne = resultat_ligne['ligne']
+            nom_assure = f"{ligne.get('nom', '')}_{ligne.get('prenom', '')}".strip('_')
+            nom_assure = "".join(c if c.isalnum() or c in "-_" else "_" for c in nom_assure)
+            yield {
+                'nom_fichier': f"{numero:04d}_{nom_assure or 'assure'}.pdf",
+                'type': 'corporate',
+                'resultat': resultat_corporate_assure(resultat_ligne, produit_key),
+                'produit_name': produit_name,
+                'date_document': date_lot,
+                'infos': {**entreprise_info, 'nom': f"{entreprise_info.get('nom') or 'Entreprise'} — {ligne.get('nom', '')} {ligne.get('prenom', '')}"},
+            }
     
-    styles = getSampleStyleSheet()
-    
-    # Styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        textColor=colors.HexColor('#1a1a1a'),
-        spaceAfter=20,
-        alignment=TA_CENTER,
-        fontName='Helvetica-Bold'
+    return FichierSession(
+        rendu_lots.generer_zip(documents(), total=len(eligibles), progression=job.signaler_progression)
     )
+
+
+def _job_annexe_assures(
+    job,
+    resultat_micro: Dict[str, Any],
+    produit_key: str,
+    produit_name: str,
+    entreprise: str
+) -> Dict[str, Any]:
+    """Tâche d'arrière-plan : annexe PDF listant la prime de chaque assuré du fichier."""
+    resultats_lignes = resultat_micro['resultats_lignes']
+    
+    def lignes():
+        # Générateur : les lignes sont mises en forme page par page
+        for resultat_ligne in resultats_lignes:
+            ligne = resultat_ligne['ligne']
+            eligible = resultat_ligne['statut'] == 'eligible'
+            detail = resultat_corporate_assure(resultat_ligne, produit_key) if eligible else {}
+            yield {
+                'nom': ligne.get('nom', ''),
+                'prenom': ligne.get('prenom', ''),
+                'type_couverture': ligne.get('type_couverture', ''),
+                'nb_enfants_supp': resultat_ligne.get('nb_enfants_supp') if eligible else None,
+                'statut': resultat_ligne['statut'],
+                'prime_nette': detail.get('prime_nette_finale'),
+                'prime_ttc': detail.get('prime_ttc_totale'),
+                'observation': resultat_ligne.get('raison', ''),
+            }
     
-    section_title_style = ParagraphStyle(
-        'SectionTitle',
-        parent=styles['Heading2'],
-        fontSize=11,
-        textColor=colors.HexColor('#1a1a1a'),
-        spaceAfter=10,
-        spaceBefore=15,
-        fontName='Helvetica-Bold'
+    pdf_bytes, statistiques = generer_annexe_assures(
+        lignes(),
+        entreprise,
+        produit_name,
+        total=len(resultats_lignes),
+        progression=job.signaler_progression
     )
-    
-    normal_style = ParagraphStyle(
-        'CustomNormal',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.HexColor('#333333'),
-        leading=12,
-        alignment=TA_JUSTIFY
+    return {'pdf': pdf_bytes, 'statistiques': statistiques}
+
+
+def pdf_proposition_session(session_id: str, cle: str) -> bytes:
+    """
+    PDF de la proposition d'une session : lu dans le cache partagé, sinon rendu
+    à partir des entrées conservées par generer_recapitulatif_particulier (dans
+    un créneau interactif de l'ordonnanceur). Appelable hors du script Streamlit.
+    """
+    def rendre() -> bytes:
+        entrees = session_store.lire(session_id, 'proposition_entrees')
+        if entrees is None:
+            raise ValueError("Proposition expirée : régénérez la proposition commerciale.")
+        with ordonnanceur.creneau(session_id, PRIORITE_INTERACTIVE):
+            return pdf_generer_pdf_proposition(**entrees)
+    
+    return cache_pdf.obtenir_ou_calculer(cle, rendre)
+
+
+def soumettre_job(
+    type_job: str,
+    libelle: str,
+    fonction: Callable[..., Any],
+    *args,
+    priorite: int = PRIORITE_LOURDE
+) -> str:
+    """
+    Soumet une tâche pour la session courante.
+    Une tâche du même type encore active est annulée : son résultat serait écrasé.
+    """
+    abandonner_jobs(type_job)
+    return job_runner.soumettre(identifiant_session(), type_job, libelle, fonction, *args, priorite=priorite)
+
+
+def abandonner_jobs(type_job: str):
+    """Annule et oublie les tâches d'un type donné pour la session courante."""
+    session_id = identifiant_session()
+    for job in job_runner.lister(session_id, type_job):
+        if job['statut'] not in STATUTS_FINAUX:
+            job_runner.annuler(job['id'])
+        job_runner.oublier(job['id'])
+
+
+@st.fragment(run_every=1.0)
+def suivre_job(job_id: str, cle_resultat: str):
+    """Affiche la progression d'une tâche ; à la fin, range son résultat dans la session et relance le script."""
+    job = job_runner.statut(job_id)
+    if job is None:
+        return
+    
+    if job['statut'] == TERMINE:
+        # Le résultat est déjà dans le stockage de session : il change seulement de clé
+        transfere = job_runner.transferer_resultat(job_id, cle_resultat)
+        job_runner.oublier(job_id)
+        if transfere:
+            st.rerun()
+        st.error(
+            f"❌ {job['libelle']} : résultat évincé du stockage de session "
+            f"(budget de {session_store.budget_session / (1024 * 1024):,.0f} Mo, AKORA_BUDGET_SESSION_MO)."
+        )
+    elif job['statut'] in (ERREUR, ANNULE):
+        if job['statut'] == ERREUR:
+            st.error(f"❌ {job['libelle']} : {job['erreur']}")
+        else:
+            st.warning(f"⚠️ {job['libelle']} : tâche annulée")
+        if st.button("Fermer", key=f"fermer_job_{job_id}"):
+            job_runner.oublier(job_id)
+            st.rerun()
+    else:
+        col_prog, col_annul = st.columns([4, 1])
+        with col_prog:
+            libelle_etat = job['message'] or ("En file d'attente..." if job['statut'] == 'en_attente' else "En cours...")
+            st.progress(job['progression'], text=f"⏳ {job['libelle']} — {libelle_etat}")
+        with col_annul:
+            if st.button("✖️ Annuler", key=f"annuler_job_{job_id}", use_container_width=True):
+                job_runner.annuler(job_id)
+
+
+@st.fragment(run_every=2.0)
+def afficher_taches_arriere_plan():
+    """Liste des tâches en arrière-plan de la session (barre latérale)."""
+    st.markdown("### ⏳ Tâches en arrière-plan")
+    stats_file = ordonnanceur.statistiques()
+    st.caption(
+        f"Serveur : {stats_file['actifs']}/{stats_file['nb_creneaux']} créneaux occupés · "
+        f"{stats_file['profondeur_file']} en file · "
+        f"attente p95 {stats_file['attente_p95']['lourde']:.1f} s"
     )
-    
-    bullet_style = ParagraphStyle(
-        'BulletStyle',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=colors.HexColor('#333333'),
-        leading=12,
-        leftIndent=20,
-        bulletIndent=10
+    jobs = job_runner.lister(identifiant_session())
+    if not jobs:
+        st.caption("Aucune tâche en cours.")
+        return
+    for job in jobs:
+        st.progress(
+            job['progression'],
+            text=f"{job['libelle']} — {job['statut'].replace('_', ' ')} "
+                 f"(attente {job['attente']:.1f} s, exécution {job['duree']:.1f} s)"
+        )
+
+
+def afficher_mesures_performances():
+    """Percentiles des temps d'exécution par section (onglet Paramétrages > Système)."""
+    st.markdown("#### ⏱️ Temps d'exécution")
+    st.caption(
+        "Fenêtre glissante des dernières mesures du serveur : rerun complet du script, "
+        "onglets, appels Supabase, calculs de prime et générations PDF."
     )
-    
-    # Style pour les cellules avec retours à la ligne
-    cell_style = ParagraphStyle(
-        'CellStyle',
-        parent=styles['Normal'],
-        fontSize=8,
-        alignment=TA_CENTER,
-        fontName='Helvetica',
-        leading=10
+    stats_assets = registre_assets.statistiques()
+    st.caption(
+        f"Ressources PDF partagées : {stats_assets['nb_images']} images, "
+        f"{stats_assets['nb_feuilles_styles']} feuilles de styles, "
+        f"{stats_assets['reutilisations']} réutilisations — "
+        f"chargement initial {stats_assets['temps_chargement']:.2f} s, "
+        f"temps de rendu économisé ≈ {stats_assets['temps_economise']:.1f} s"
     )
-    
-    elements = []
-    
-    # ==================== PAGE 1 ====================
-    
-    # Logo en haut à droite (première page seulement) - bien dimensionné
-    if os.path.exists('leadway logo all formats big-02.png'):
-        try:
-            # Créer une table pour positionner le logo à droite
-            logo_img = Image('leadway logo all formats big-02.png', width=3.5*cm, height=3*cm)
-            logo_table = Table([[logo_img]], colWidths=[18*cm])
-            logo_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
-                ('VALIGN', (0, 0), (0, 0), 'TOP'),
-            ]))
-            elements.append(logo_table)
-            elements.append(Spacer(1, 0.2*cm))  # Réduire l'espace
-        except:
-            pass
-    
-    # En-tête orange avec titre (sans logo)
-    header_table_data = [[
-        Paragraph("<b>PROPOSITION D'ASSURANCE SANTÉ</b>", 
-                 ParagraphStyle('HeaderTitle', parent=styles['Normal'], 
-                              fontSize=20, textColor=colors.whitesmoke, 
-                              fontName='Helvetica-Bold', alignment=TA_CENTER))
-    ]]
-    
-    header_table = Table(header_table_data, colWidths=[18*cm])
-    header_table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#E67E22')),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('ALIGN', (0, 0), (0, 0), 'CENTER'),
-        ('TOPPADDING', (0, 0), (-1, -1), 18),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 18),
-        ('LEFTPADDING', (0, 0), (-1, -1), 10),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 10),
-    ]))
-    
-    elements.append(header_table)
-    elements.append(Spacer(1, 0.3*cm))  # Réduire l'espace
-    
-    # En-tête avec références
-    ref_data = st.session_state.get('principal_data', {})
-    ref_table_data = [
-        ['REFERENCE:', ref_data.get('reference', 'LWA-00082-10-0735'), 'APPORTEUR:', ref_data.get('apporteur', 'ZOH BI')],
-        ['PROSPECT:', ref_data.get('prospect', 'SOCIETE AKORA'), '', '']
-    ]
-    
-    ref_table = Table(ref_table_data, colWidths=[3*cm, 5*cm, 3*cm, 5*cm])
-    ref_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#1a1a1a')),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#cccccc')),
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f0f0f0')),
-        ('BACKGROUND', (2, 0), (2, 0), colors.HexColor('#f0f0f0')),
-    ]))
-    
-    elements.append(ref_table)
-    elements.append(Spacer(1, 0.5*cm))
-    
-    # I. OBJET DE LA COUVERTURE
-    elements.append(Paragraph("<b>I. OBJET DE LA COUVERTURE</b>", section_title_style))
-    elements.append(Paragraph(
-        "La présente proposition constitue la complémentaire au régime de santé obligatoire de base : "
-        "la Couverture Maladie Universelle (CMU). Elle a pour objet la couverture des dépenses d'ordre "
-        "médical et chirurgical engagées à la suite de maladie, d'accident ou de maternité du souscripteur "
-        "et des personnes désignées sous le vocable « personnes assurées » conformément au barème choisi "
-        "par lui et mentionné aux conditions particulières.",
-        normal_style
-    ))
-    elements.append(Spacer(1, 0.3*cm))
-    
-    # II. MODE DE GESTION
-    elements.append(Paragraph("<b>II. MODE DE GESTION</b>", section_title_style))
-    
-    elements.append(Paragraph(
-        "<b>• Tiers payant :</b> Il est offert au titre de la formule du TIERS PAYANT un système d'identification "
-        "des assurés par carte à photo (Carte d'accès). Cette carte permettra au bénéficiaire de justifier de sa "
-        "qualité d'assuré, tant auprès des centres de santé conventionnés qu'auprès des services compétents de la "
-        "société. Sur présentation de la carte dans un établissement conventionné, à l'exception des actes nécessitant "
-        "des accords préalables de l'assureur, l'assuré bénéficiera des prestations puis règlera le montant à sa charge "
-        "(ticket modérateur).",
-        bullet_style
-    ))
-    elements.append(Spacer(1, 0.2*cm))
-    
-    elements.append(Paragraph(
-        "<b>• Système de remboursement :</b> Pour les prestations exécutées en dehors du réseau de centres conventionnés, "
-        "le gestionnaire mandaté par l'Assureur, ANKARA SERVICE, s'engagera à procéder aux remboursements des frais dans "
-        "un délai maximum de 30 jours selon les dispositions du barème de remboursement sur présentation des originaux des justificatifs.",
-        bullet_style
-    ))
-    elements.append(Spacer(1, 0.3*cm))
-    
-    # III. AGE LIMITE DE SOUSCRIPTION
-    elements.append(Paragraph("<b>III. AGE LIMITE DE SOUSCRIPTION</b>", section_title_style))
-    elements.append(Paragraph(
-        "<b>• Adultes :</b> 65 ans, avec une surprime âge à partir de 51 ans / Au-delà, garanti sur accord du directeur médical",
-        bullet_style
-    ))
-    elements.append(Paragraph(
-        "<b>• Enfants :</b> 21 ans, Jusqu'à 25 ans en cas de continuité de scolarité sous réserve de justificatifs.",
-        bullet_style
-    ))
-    elements.append(Spacer(1, 0.3*cm))
-    
-    # IV. COMPOSITION FAMILIALE
-    elements.append(Paragraph("<b>IV. COMPOSITION FAMILIALE</b>", section_title_style))
-    elements.append(Paragraph(
-        "La famille est réputée se composer de 05 personnes maximum (Adhérent principal + Conjoint légal ou non + 03 enfants). "
-        "On appelle \"Enfant supplémentaire\" tout enfant au-delà du 3ème enfant. Si enfant non biologique, fournir un certificat "
-        "de tutelle pour la prise en charge. Un questionnaire doit être impérativement renseigné et de bonne foi afin de déterminer "
-        "avec exactitude la prime correspondante.",
-        normal_style
-    ))
-    elements.append(Spacer(1, 0.3*cm))
-    
-    # V. DELAI DE CARENCE
-    elements.append(Paragraph("<b>V. DELAI DE CARENCE</b>", section_title_style))
-    elements.append(Paragraph("• 1 mois après la souscription pour les soins ordinaires ;", bullet_style))
-    elements.append(Paragraph("• 6 mois pour la lunetterie et les prothèses ;", bullet_style))
-    elements.append(Paragraph("• 9 mois pour les frais de maternité et d'accouchement ;", bullet_style))
-    elements.append(Paragraph("• 12 mois pour les maladies chroniques survenant pour la première fois pendant le contrat ;", bullet_style))
-    elements.append(Paragraph("• Abrogés en cas de continuité d'assurance, avec preuve à l'appui.", bullet_style))
-    
-    # Saut de page
-    elements.append(PageBreak())
-    
-    # ==================== PAGE 2 ====================
-    
-    # VI. PAIEMENT DE LA PRIME
-    elements.append(Paragraph("<b>VI. PAIEMENT DE LA PRIME (ARTICLE 13 CODE CIMA)</b>", section_title_style))
-    elements.append(Paragraph(
-        "La prime est payable au domicile de l'assureur ou de l'intermédiaire. La prise d'effet du contrat est subordonnée "
-        "au paiement de la prime par le souscripteur.",
-        normal_style
-    ))
-    elements.append(Spacer(1, 0.2*cm))
-    elements.append(Paragraph(
-        "Il est interdit aux entreprises d'assurance, sous peine des sanctions prévues à l'article 312, de souscrire un contrat "
-        "d'assurance dont la prime n'est pas payée ou de renouveler un contrat d'assurance dont la prime n'a pas été payée.",
-        normal_style
-    ))
-    elements.append(Spacer(1, 0.2*cm))
-    elements.append(Paragraph(
-        "Lorsqu'un chèque ou un effet remis en paiement de la prime revient impayé, l'assuré est mis en demeure de régulariser "
-        "le paiement dans un délai de huit jours ouvrés à compter de la réception de l'acte ou de la lettre de mise en demeure. "
-        "A l'expiration de ce délai, si la régularisation n'est pas effectuée, le contrat est résilié de plein droit.",
-        normal_style
-    ))
-    elements.append(Spacer(1, 0.2*cm))
-    elements.append(Paragraph(
-        "La portion de prime courue reste acquise à l'assureur, sans préjudice des éventuels frais de poursuite et de recouvrement.",
-        normal_style
-    ))
-    elements.append(Spacer(1, 0.4*cm))
-    
-    # VII. SOUSCRIPTION
-    elements.append(Paragraph("<b>VII. SOUSCRIPTION</b>", section_title_style))
-    elements.append(Paragraph("Les pièces à fournir pour la mise en place de la police sont les suivantes :", normal_style))
-    elements.append(Spacer(1, 0.2*cm))
-    elements.append(Paragraph("• La liste des personnes à assurer ;", bullet_style))
-    elements.append(Paragraph("• Les questionnaires médicaux renseignés pour chaque adhérent et les membres de sa famille ;", bullet_style))
-    elements.append(Paragraph("• Les copies des cartes CMU (ou les récépissés d'enrôlement en cas d'indisponibilité des cartes) ;", bullet_style))
-    elements.append(Paragraph("• Les CNI pour les adultes et les extraits de naissance pour les enfants ;", bullet_style))
-    elements.append(Paragraph("• Une photo couleur pour chaque personne ;", bullet_style))
-    elements.append(Paragraph("• La copie du paiement (Espèces, chèque ou virement) ;", bullet_style))
-    elements.append(Paragraph("• La preuve d'assurance antérieure afin de lever les délais de carence et assurer la continuité d'assurance.", bullet_style))
-    elements.append(Spacer(1, 0.4*cm))
-    
-    # VIII. AUTRES DISPOSITIONS
-    elements.append(Paragraph("<b>VIII. AUTRES DISPOSITIONS</b>", section_title_style))
-    elements.append(Paragraph(
-        "• L'acceptation définitive du risque est soumise à l'analyse du questionnaire médical dument renseigné et signé par le prospect ;",
-        bullet_style
-    ))
-    elements.append(Paragraph(
-        "• La cotation santé a été faite sous réserve de l'acceptation et de la souscription à d'autres risques d'accompagnement "
-        "(Auto, MRH, RC, MRP, etc...) ;",
-        bullet_style
-    ))
-    elements.append(Paragraph(
-        "• Fournir obligatoirement les statistiques antérieures avant toute souscription (client ayant bénéficié d'une couverture "
-        "sante sans interruption au cours de l'année N-1)",
-        bullet_style
-    ))
-    elements.append(Paragraph("• Validité de la cotation : 03 Mois", bullet_style))
-    elements.append(Spacer(1, 0.5*cm))
-    
-    # Date et signature
-    date_signature = Paragraph(
-        f"<b>Fait à Abidjan le {datetime.now().strftime('%d %B %Y')}</b>",
-        ParagraphStyle('DateStyle', parent=normal_style, alignment=TA_RIGHT, fontName='Helvetica-Bold')
+    if stats_assets['images_optimisees']:
+        st.caption(
+            f"Images embarquées à {stats_assets['dpi']} DPI : "
+            f"{stats_assets['octets_sources'] / 1024:.0f} Ko sources → "
+            f"{stats_assets['octets_variantes'] / 1024:.0f} Ko dans chaque proposition"
+        )
+    stats_mise_en_page = moteur_pdf.statistiques()
+    st.caption(
+        f"Mise en page PDF : {stats_mise_en_page['styles_tableaux']} styles de tableaux et "
+        f"{len(stats_mise_en_page['modeles'])} modèles de page partagés, "
+        f"{stats_mise_en_page['paragraphes']} paragraphes en cache "
+        f"({stats_mise_en_page['taux_succes_paragraphes']:.0%} de réutilisation), "
+        f"{stats_mise_en_page['duree_moyenne_document'] * 1000:.1f} ms de mise en page par document"
     )
-    elements.append(date_signature)
-    elements.append(Spacer(1, 0.3*cm))
-    
-    # Signature
-    signature_paragraph = Paragraph(
-        "<b>Pour L'ASSUREUR</b>",
-        ParagraphStyle('SignatureLabel', parent=normal_style, alignment=TA_RIGHT, fontName='Helvetica-Bold', fontSize=10)
+    lignes = chronometre.percentiles()
+    if not lignes:
+        st.info("Aucune mesure pour le moment.")
+        return
+    df_mesures = pd.DataFrame(lignes).rename(columns={
+        'section': 'Section',
+        'appels': 'Appels',
+        'erreurs': 'Erreurs',
+        'p50_ms': 'p50 (ms)',
+        'p95_ms': 'p95 (ms)',
+        'p99_ms': 'p99 (ms)',
+        'max_ms': 'Max (ms)',
+    })
+    st.dataframe(
+        df_mesures.style.format({c: "{:.1f}" for c in ['p50 (ms)', 'p95 (ms)', 'p99 (ms)', 'Max (ms)']}),
+        use_container_width=True,
+        hide_index=True
     )
-    elements.append(signature_paragraph)
-    elements.append(Spacer(1, 0.1*cm))  # Réduire l'espace pour coller la signature
-    
-    # Image de la signature
-    if os.path.exists('signature.png'):
-        try:
-            signature_img = Image('signature.png', width=4*cm, height=2.5*cm)  # Réduire légèrement la hauteur
-            signature_table = Table([[signature_img]], colWidths=[18*cm])  # Utiliser toute la largeur
-            signature_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (0, 0), 'RIGHT'),
-                ('VALIGN', (0, 0), (0, 0), 'TOP'),
-            ]))
-            elements.append(signature_table)
-        except:
-            pass
-    
-    # Saut de page
-    elements.append(PageBreak())
-    
-    # ==================== PAGE 3 - TABLEAU COMPARATIF ====================
-    
-    title = Paragraph("OFFRE SANTÉ - RÉCAPITULATIF", title_style)
-    elements.append(title)
-    elements.append(Spacer(1, 0.5*cm))
-    
-    table_data = []
-    
-    if nb_options == 1:
-        table_data.append(['Désignation', 'OPTION 1'])
-        col_widths = [8*cm, 7*cm]
-    elif nb_options == 2:
-        table_data.append(['Désignation', 'OPTION 1', 'OPTION 2'])
-        col_widths = [6*cm, 4.5*cm, 4.5*cm]
-    else:
-        table_data.append(['Désignation', 'OPTION 1', 'OPTION 2', 'OPTION 3'])
-        col_widths = [5*cm, 4*cm, 4*cm, 4*cm]
-    
-    for idx, row in data_frame.iterrows():
-        row_data = [str(row['Désignation'])]
-        for i in range(nb_options):
-            col_name = f'OPTION {i+1}'
-            if col_name in row:
-                cell_value = str(row[col_name])
-                if '\n' in cell_value:
-                    cell_value_html = cell_value.replace('\n', '<br/>')
-                    row_data.append(Paragraph(cell_value_html, cell_style))
-                else:
-                    row_data.append(cell_value)
-        table_data.append(row_data)
-    
-    table = Table(table_data, colWidths=col_widths)
-    
-    table_style = TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a1a1a')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (0, -1), colors.HexColor('#f8f9fa')),
-        ('TEXTCOLOR', (0, 1), (0, -1), colors.HexColor('#495057')),
-        ('ALIGN', (0, 1), (0, -1), 'LEFT'),
-        ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 1), (0, -1), 8),
-        ('ALIGN', (1, 1), (-1, -1), 'CENTER'),
-        ('FONTNAME', (1, 1), (-1, -1), 'Helvetica'),
-        ('FONTSIZE', (1, 1), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#1a1a1a')),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('ROWBACKGROUNDS', (1, 1), (-1, -1), [colors.white, colors.HexColor('#f8f8f8')]),
-    ])
-    
-    for idx, row in data_frame.iterrows():
-        row_idx = idx + 1
-        
-        if row['Désignation'] in ['PRIME NETTE / PERSONNE', 'PRIME NETTE TOTALE']:
-            table_style.add('BACKGROUND', (0, row_idx), (-1, row_idx), colors.HexColor('#f2e8d9'))
-            table_style.add('FONTNAME', (0, row_idx), (-1, row_idx), 'Helvetica-Bold')
-        
-        if row['Désignation'] == 'PRIME TTC ANNUELLE':
-            table_style.add('BACKGROUND', (0, row_idx), (-1, row_idx), colors.HexColor('#754015'))
-            table_style.add('TEXTCOLOR', (0, row_idx), (-1, row_idx), colors.whitesmoke)
-            table_style.add('FONTNAME', (0, row_idx), (-1, row_idx), 'Helvetica-Bold')
-        
-        if row['Désignation'] == 'MONTANT TOTAL À PAYER':
-            table_style.add('BACKGROUND', (0, row_idx), (-1, row_idx), colors.HexColor('#145d33'))
-            table_style.add('TEXTCOLOR', (0, row_idx), (-1, row_idx), colors.whitesmoke)
-            table_style.add('FONTNAME', (0, row_idx), (-1, row_idx), 'Helvetica-Bold')
-            table_style.add('FONTSIZE', (0, row_idx), (-1, row_idx), 10)
-    
-    table.setStyle(table_style)
-    elements.append(table)
-    elements.append(Spacer(1, 0.5*cm))
-    
-    # Note en bas de page 3
-    note_text = Paragraph(
-        "<i>Note : Les montants sont exprimés en FCFA. Proposition valable 3 mois.</i>",
-        ParagraphStyle('NoteStyle', parent=normal_style, fontSize=8, textColor=colors.HexColor('#666666'), alignment=TA_CENTER)
+    st.markdown("#### 🔌 Transport Supabase")
+    st.caption(
+        "Nouvelles tentatives des lectures sur erreur transitoire et disjoncteur "
+        "par service (base, stockage des documents)."
     )
-    elements.append(note_text)
-    
-    # Saut de page pour le barème
-    elements.append(PageBreak())
-    
-    # ==================== PAGE 4 - IMAGE DU BAREME ====================
-    
-    elements.append(Paragraph("BARÈME DE REMBOURSEMENT", title_style))
-    elements.append(Spacer(1, 0.5*cm))
-    
-    # Récupérer l'image du barème depuis session_state
-    bareme_image_bytes = st.session_state.get('bareme_image_bytes', None)
-    
-    if bareme_image_bytes:
-        # Créer un buffer temporaire pour l'image
-        import io as io_lib
-        img_buffer = io_lib.BytesIO(bareme_image_bytes)
-        try:
-            bareme_img = Image(img_buffer, width=16*cm, height=22*cm)
-            elements.append(bareme_img)
-        except:
-            # Si erreur, afficher le placeholder
-            placeholder_text = Paragraph(
-                "<i>[Erreur de chargement de l'image du barème]</i>",
-                ParagraphStyle('PlaceholderStyle', parent=normal_style, fontSize=10, textColor=colors.HexColor('#cc0000'), alignment=TA_CENTER)
-            )
-            elements.append(Spacer(1, 3*cm))
-            elements.append(placeholder_text)
-            elements.append(Spacer(1, 3*cm))
-    else:
-        # Pas d'image uploadée
-        placeholder_text = Paragraph(
-            "<i>[Image du barème de remboursement à insérer via l'interface]</i>",
-            ParagraphStyle('PlaceholderStyle', parent=normal_style, fontSize=10, textColor=colors.HexColor('#999999'), alignment=TA_CENTER)
+    st.dataframe(
+        pd.DataFrame([t.statistiques() for t in (transport_base, transport_stockage)]).rename(columns={
+            'service': 'Service',
+            'disjoncteur': 'Disjoncteur',
+            'echecs_consecutifs': 'Échecs consécutifs',
+            'appels': 'Appels',
+            'succes': 'Succès',
+            'echecs': 'Échecs',
+            'echecs_transitoires': 'dont transitoires',
+            'delais_depasses': 'Délais dépassés',
+            'nouvelles_tentatives': 'Nouvelles tentatives',
+            'rejets_disjoncteur': 'Rejets (disjoncteur)',
+            'ouvertures_disjoncteur': 'Ouvertures',
+        }),
+        use_container_width=True,
+        hide_index=True
+    )
+    st.markdown("#### 📮 Sauvegardes différées")
+    st.caption(
+        "Devis acquittés dans le journal local, envoyés à la base dans l'ordre "
+        "par un thread en arrière-plan."
+    )
+    stats_file = file_sauvegardes.statistiques()
+    col_file1, col_file2, col_file3, col_file4 = st.columns(4)
+    col_file1.metric("En attente", stats_file['profondeur'],
+                     help=f"{stats_file['octets_en_attente'] / 1024:.0f} Ko dans le journal")
+    col_file2.metric("Retard d'envoi", f"{stats_file['retard_s']:.1f} s",
+                     help="Âge de la plus ancienne sauvegarde non envoyée")
+    dernier_delai = stats_file['dernier_delai_envoi_s']
+    col_file3.metric("Dernier délai d'envoi", f"{dernier_delai:.1f} s" if dernier_delai is not None else "-")
+    col_file4.metric("Envoyées / rejetées", f"{stats_file['envoyees']} / {stats_file['rejetees']}",
+                     help=f"{stats_file['echecs']} essais en échec depuis le démarrage")
+    if stats_file['derniere_erreur'] and stats_file['profondeur']:
+        st.caption(f"Dernière erreur d'envoi : {stats_file['derniere_erreur']}")
+    if stats_file['entrees_rejetees']:
+        st.warning(f"{len(stats_file['entrees_rejetees'])} sauvegarde(s) refusée(s) par la base")
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    'Entrée': r['id'],
+                    'Opération': r['operation'],
+                    'Ajoutée le': datetime.fromtimestamp(r['date_ajout']).strftime("%d/%m/%Y %H:%M:%S"),
+                    'Erreur': r['erreur'],
+                }
+                for r in stats_file['entrees_rejetees']
+            ]),
+            use_container_width=True,
+            hide_index=True
         )
-        elements.append(Spacer(1, 3*cm))
-        elements.append(placeholder_text)
-        elements.append(Spacer(1, 3*cm))
-        
-        instruction_text = Paragraph(
-            "Pour ajouter l'image du barème, veuillez la télécharger dans la section '📸 Image du Barème' avant de générer le PDF.",
-            ParagraphStyle('InstructionStyle', parent=normal_style, fontSize=9, textColor=colors.HexColor('#666666'), alignment=TA_CENTER, fontName='Helvetica-Oblique')
+        if st.button("📤 Renvoyer les sauvegardes rejetées", key="renvoyer_sauvegardes"):
+            file_sauvegardes.renvoyer_rejetees()
+            st.rerun()
+    volumes = chronometre.volumes()
+    if volumes:
+        st.markdown("#### 📦 Volume des réponses")
+        st.caption("Taille JSON des lignes reçues par requête de liste ou de détail.")
+        df_volumes = pd.DataFrame([
+            {
+                'Section': v['section'],
+                'Requêtes': v['mesures'],
+                'p50 (Ko)': v['p50_octets'] / 1024,
+                'Max (Ko)': v['max_octets'] / 1024,
+                'Total (Ko)': v['total_octets'] / 1024,
+            }
+            for v in volumes
+        ])
+        st.dataframe(
+            df_volumes.style.format({c: "{:.1f}" for c in ['p50 (Ko)', 'Max (Ko)', 'Total (Ko)']}),
+            use_container_width=True,
+            hide_index=True
+        )
+    if st.button("🔄 Réinitialiser les mesures", key="reinit_mesures"):
+        chronometre.reinitialiser()
+        st.rerun()
+
+
+def etat_pagination(nom: str, filtres: Tuple) -> Dict[str, Any]:
+    """
+    État de navigation d'une liste paginée (taille, curseurs, numéro de page).
+    Revient à la première page lorsque les filtres changent.
+    """
+    cle = f"pagination_{nom}"
+    etat = st.session_state.get(cle)
+    if etat is None or etat['filtres'] != filtres:
+        etat = st.session_state[cle] = {
+            'filtres': filtres,
+            'taille': etat['taille'] if etat else TAILLE_PAGE_DEFAUT,
+            'apres': None,
+            'avant': None,
+            'numero': 1,
+        }
+    return etat
+
+
+STATUTS_POLICES = {"En cours": "en_cours", "Suspendue": "suspendue", "Résiliée": "resiliee"}
+
+
+def parametres_liste_polices() -> Dict[str, Any]:
+    """Arguments de db.lister_polices d'après les filtres et la page de l'onglet Polices."""
+    recherche = st.session_state.get("search_police", "")
+    type_police = st.session_state.get("filter_type_police", "Tous")
+    statut = st.session_state.get("filter_statut_police", "Tous")
+    etat = etat_pagination("polices", (recherche, type_police, statut))
+    filtre = {}
+    if recherche:
+        filtre["recherche"] = recherche
+    if type_police != "Tous":
+        filtre["type_police"] = type_police.lower()
+    if statut != "Tous":
+        filtre["statut"] = STATUTS_POLICES[statut]
+    return {'filtre': filtre, 'limite': etat['taille'], 'apres': etat['apres'], 'avant': etat['avant']}
+
+
+def parametres_liste_devis() -> Dict[str, Any]:
+    """Arguments de rechercher_devis d'après les filtres et la page de la liste des cotations."""
+    texte = st.session_state.get("search_cotation", "")
+    branche = st.session_state.get("filter_branche", "Toutes")
+    statut = st.session_state.get("filter_statut", "Tous")
+    etat = etat_pagination("devis", (texte, branche, statut))
+    return {
+        'type_marche': branche if branche != "Toutes" else None,
+        'statut': statut if statut != "Tous" else None,
+        'texte': texte or None,
+        'limit': etat['taille'],
+        'apres': etat['apres'],
+        'avant': etat['avant'],
+    }
+
+
+def lancer_chargements_page() -> ChargementPage:
+    """
+    Lance ensemble, avant de dessiner les onglets, les lectures des onglets
+    Polices et Liste des cotations et les statistiques du portefeuille.
+    """
+    chargement = ChargementPage()
+    try:
+        from supabase_config import db
+    except Exception:
+        # L'onglet Polices affiche lui-même l'erreur de connexion
+        db = None
+    if db is not None:
+        parametres_polices = parametres_liste_polices()
+        chargement.lancer("polices", parametres_polices, lambda: db.lister_polices(**parametres_polices))
+    db_manager = st.session_state.db_manager
+    if db_manager is not None:
+        parametres_devis = parametres_liste_devis()
+        # Hors du thread du script : les erreurs sont relevées, puis affichées par obtenir
+        chargement.lancer(
+            "devis", parametres_devis, lambda: db_manager.rechercher_devis(**parametres_devis, lever_erreurs=True)
+        )
+        chargement.lancer("statistiques", None, lambda: db_manager.get_statistiques_globales(lever_erreurs=True))
+    return chargement
+
+
+def erreur_chargement(message: str, defaut: Any) -> Callable[[Exception], Any]:
+    """Affiche l'erreur d'une lecture lancée en arrière-plan (dans le thread du script) et retourne `defaut`."""
+    def afficher(e: Exception) -> Any:
+        st.error(f"❌ {message} : {str(e)}")
+        return defaut
+    return afficher
+
+
+def _changer_page(nom: str, apres=None, avant=None, decalage: int = 0):
+    etat = st.session_state[f"pagination_{nom}"]
+    etat.update(apres=apres, avant=avant, numero=max(1, etat['numero'] + decalage))
+
+
+def _changer_taille_page(nom: str):
+    etat = st.session_state[f"pagination_{nom}"]
+    etat.update(taille=st.session_state[f"taille_page_{nom}"], apres=None, avant=None, numero=1)
+
+
+def afficher_navigation_pages(nom: str, page: Page):
+    """Boutons page précédente / suivante et choix du nombre de lignes par page."""
+    etat = st.session_state[f"pagination_{nom}"]
+    tailles = sorted(set(TAILLES_PAGE) | {etat['taille']})
+    col_prec, col_info, col_taille, col_suiv = st.columns([1, 2, 1, 1])
+    with col_prec:
+        st.button(
+            "◀ Précédente", key=f"page_precedente_{nom}", use_container_width=True,
+            disabled=not page.a_precedente,
+            on_click=_changer_page, args=(nom,), kwargs={'avant': page.curseur_precedent, 'decalage': -1}
+        )
+    with col_info:
+        st.caption(f"Page {etat['numero']} — {len(page)} ligne(s)")
+    with col_taille:
+        st.selectbox(
+            "Lignes par page", tailles, index=tailles.index(etat['taille']),
+            key=f"taille_page_{nom}", label_visibility="collapsed",
+            on_change=_changer_taille_page, args=(nom,)
+        )
+    with col_suiv:
+        st.button(
+            "Suivante ▶", key=f"page_suivante_{nom}", use_container_width=True,
+            disabled=not page.a_suivante,
+            on_click=_changer_page, args=(nom,), kwargs={'apres': page.curseur_suivant, 'decalage': 1}
         )
-        elements.append(instruction_text)
-    
-    # Construire le PDF avec le bas de page sur chaque page
-    doc.build(elements, onFirstPage=ajouter_bas_de_page, onLaterPages=ajouter_bas_de_page)
-    
-    pdf_bytes = buffer.getvalue()
-    buffer.close()
-    
-    return pdf_bytes
 
 
 # ==============================================================================
@@ -1088,7 +1146,6 @@ def generer_recapitulatif_particulier(resultats_multi: Dict[int, Dict], baremes_
     """Génère un récapitulatif comparatif intelligent avec regroupement automatique."""
     from collections import defaultdict
     import uuid
-    from datetime import datetime
     
     # Récupérer les configurations et infos principales
     configurations_baremes = st.session_state.get('configurations_baremes', {})
@@ -1268,35 +1325,73 @@ def generer_recapitulatif_particulier(resultats_multi: Dict[int, Dict], baremes_
     
     data_frame = pd.DataFrame(df_dict)
     
-    pdf_bytes = generer_pdf_proposition(data_frame, options_data, nb_options)
-    
-    st.success(f"✅ Proposition commerciale générée avec succès ({nb_options} option{'s' if nb_options > 1 else ''}) !")
-    
     # Stocker les données PDF dans session_state pour sauvegarde ultérieure
     st.session_state['pdf_options_data'] = options_data
     st.session_state['pdf_principal_data'] = principal_data
-    st.session_state['pdf_bytes_generated'] = pdf_bytes
     st.session_state['pdf_nb_options'] = nb_options
+    st.session_state['baremes_affiches_saved'] = baremes_affiches
+    stocker_blob('resultats_multi_saved', resultats_multi)
+    
+    # Le PDF n'est rendu qu'au téléchargement (voir afficher_proposition_generee) ;
+    # des entrées identiques réutilisent le PDF déjà rendu, quelle que soit la session
+    # La date de la proposition est celle du récapitulatif, pas celle du téléchargement
+    bareme_image_bytes = lire_blob('bareme_image_bytes')
+    date_proposition = date.today()
+    stocker_blob('proposition_entrees', {
+        'data_frame': data_frame,
+        'options_data': options_data,
+        'nb_options': nb_options,
+        'principal_data': principal_data,
+        'bareme_image_bytes': bareme_image_bytes,
+        'date_document': date_proposition,
+    })
+    st.session_state['pdf_cle'] = cle_proposition(
+        data_frame, options_data, nb_options, principal_data, bareme_image_bytes, date_proposition
+    )
+    st.session_state['proposition_generee'] = True
+
+
+def afficher_proposition_generee(cle: str):
+    """Affiche les boutons de téléchargement (rendu du PDF à la demande) et d'enregistrement."""
+    cle_pdf = st.session_state.get('pdf_cle')
+    if not (st.session_state.get('proposition_generee') and cle_pdf and blob_present('proposition_entrees')):
+        return
+    
+    session_id = identifiant_session()
+    nb_options = st.session_state.get('pdf_nb_options', 1)
+    st.markdown("---")
+    st.success(f"✅ Proposition commerciale prête ({nb_options} option{'s' if nb_options > 1 else ''}) !")
+    if cache_pdf.contient(cle_pdf):
+        st.caption("⚡ PDF déjà rendu pour ces données : téléchargement immédiat.")
+    else:
+        st.caption("Le PDF est mis en page au moment du téléchargement.")
     
     col_dl, col_save = st.columns(2)
     
     with col_dl:
         st.download_button(
             label="📥 TÉLÉCHARGER LA PROPOSITION (PDF)",
-            data=pdf_bytes,
+            data=lambda: pdf_proposition_session(session_id, cle_pdf),
             file_name=f"Proposition_Sante_Particulier_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
             mime="application/pdf",
             type="primary",
-            use_container_width=True
+            use_container_width=True,
+            key=f"dl_proposition_{cle}"
         )
     
     with col_save:
         if st.session_state.db_manager is not None:
-            if st.button("💾 ENREGISTRER AVEC PDF", type="secondary", use_container_width=True, key="btn_save_with_pdf"):
-                # Récupérer le PDF depuis session_state (car pdf_bytes n'existe plus après rerun)
-                pdf_bytes_to_save = st.session_state.get('pdf_bytes_generated')
+            if st.button("💾 ENREGISTRER AVEC PDF", type="secondary", use_container_width=True, key=f"btn_save_with_pdf_{cle}"):
+                try:
+                    pdf_bytes_to_save = pdf_proposition_session(session_id, cle_pdf)
+                except Exception as e:
+                    st.error(f"❌ Erreur lors de la génération du PDF : {str(e)}")
+                    pdf_bytes_to_save = None
                 saved_options_data = st.session_state.get('pdf_options_data')
                 saved_principal_data = st.session_state.get('pdf_principal_data')
+                saved_resultats = lire_blob('resultats_multi_saved', {})
+                saved_baremes = st.session_state.get('baremes_affiches_saved', [])
+                configurations_baremes = st.session_state.get('configurations_baremes', {})
                 if not pdf_bytes_to_save:
                     st.error("❌ Aucun PDF généré. Cliquez d'abord sur 'GÉNÉRER PROPOSITION COMMERCIALE'.")
                 else:
@@ -1304,9 +1399,9 @@ def generer_recapitulatif_particulier(resultats_multi: Dict[int, Dict], baremes_
                         nb_saved = 0
                         errors = []
                         
-                        for idx in range(len(baremes_affiches)):
-                            bareme_key = baremes_affiches[idx]
-                            resultat = resultats_multi[idx]['resultat']
+                        for idx in range(len(saved_baremes)):
+                            bareme_key = saved_baremes[idx]
+                            resultat = saved_resultats[idx]['resultat']
                             config = configurations_baremes.get(idx, {})
                             
                             client_info = {
@@ -1319,7 +1414,7 @@ def generer_recapitulatif_particulier(resultats_multi: Dict[int, Dict], baremes_
                             
                             success = sauvegarder_cotation_supabase(
                                 type_marche="Particulier",
-                                produit=PRODUITS_PARTICULIERS_UI[bareme_key],
+                                produit=PRODUITS_PARTICULIERS_UI.get(bareme_key, bareme_key),
                                 resultat=resultat,
                                 client_info=client_info,
                                 duree_contrat=resultat.get('facteurs', {}).get('duree_contrat', 12),
@@ -1332,11 +1427,13 @@ def generer_recapitulatif_particulier(resultats_multi: Dict[int, Dict], baremes_
                             if success:
                                 nb_saved += 1
                             else:
-                                errors.append(PRODUITS_PARTICULIERS_UI[bareme_key])
+                                errors.append(PRODUITS_PARTICULIERS_UI.get(bareme_key, bareme_key))
                         
                         if nb_saved > 0:
                             st.balloons()
                             st.success(f"✅ {nb_saved} cotation(s) enregistrée(s) avec le PDF !")
+                            # Réinitialiser l'état
+                            st.session_state['proposition_generee'] = False
                         
                         if errors:
                             st.error(f"❌ Échec pour: {', '.join(errors)}")
@@ -1346,9 +1443,17 @@ def generer_recapitulatif_particulier(resultats_multi: Dict[int, Dict], baremes_
                         import traceback
                         st.code(traceback.format_exc())
 
+
 # --- 3. INTERFACE STREAMLIT ---
 
+# Suivi des tâches en arrière-plan de la session
+with st.sidebar:
+    afficher_taches_arriere_plan()
+
 # Tabs horizontaux pour la navigation
+# Lectures des onglets lancées ensemble : la page attend la plus lente, pas leur somme
+chargements_page = lancer_chargements_page()
+
 tab_dashboard, tab_cotation, tab_polices, tab_parametrages = st.tabs([
     "Dashboard",
     "Cotation", 
@@ -1359,7 +1464,7 @@ tab_dashboard, tab_cotation, tab_polices, tab_parametrages = st.tabs([
 # ============================================
 # TAB DASHBOARD
 # ============================================
-with tab_dashboard:
+with tab_dashboard, chronometre.section("onglet.dashboard"):
     st.title("📊 Dashboard")
     st.markdown("---")
     
@@ -1415,36 +1520,10 @@ with tab_dashboard:
 # ============================================
 # TAB POLICES
 # ============================================
-with tab_polices:
+with tab_polices, chronometre.section("onglet.polices"):
     st.title("📋 Gestion des Polices")
     st.markdown("---")
     
-    # Charger les polices depuis Supabase
-    polices_data = []
-    
-    try:
-        from supabase_config import db
-        polices_list = db.lister_polices(limite=100)
-        
-        for police in polices_list:
-            date_effet = police.get('date_effet', '')
-            date_echeance = police.get('date_echeance', '')
-            
-            polices_data.append({
-                'id': police.get('id'),
-                'N° Police': police.get('numero_police', 'N/A'),
-                'Assuré': police.get('assure_principal', 'N/A'),
-                'Type': police.get('type_police', 'N/A').capitalize(),
-                'Produit': police.get('produit', 'N/A'),
-                'Date effet': date_effet[:10] if date_effet else 'N/A',
-                'Date échéance': date_echeance[:10] if date_echeance else 'N/A',
-                'Prime annuelle': f"{int(police.get('prime_annuelle', 0) or 0):,} FCFA".replace(',', ' '),
-                'Statut': police.get('statut', 'en_cours').replace('_', ' ').capitalize(),
-                '_prime': police.get('prime_annuelle', 0) or 0
-            })
-    except Exception as e:
-        st.error(f"Erreur chargement polices : {e}")
-    
     # === BARRE DE RECHERCHE ===
     with st.container(border=True):
         col_s1, col_s2, col_s3, col_s4 = st.columns([2, 1, 1, 1])
@@ -1465,38 +1544,67 @@ with tab_polices:
     
     st.markdown("---")
     
-    # === FILTRAGE ===
-    polices_filtered = polices_data.copy()
-    
-    if search_police:
-        polices_filtered = [p for p in polices_filtered if 
-            search_police.lower() in p['N° Police'].lower() or
-            search_police.lower() in p['Assuré'].lower()
-        ]
+    # Page de polices (filtres appliqués côté serveur), lancée en début de rerun
+    polices_data = []
+    page_polices = Page()
+    parametres_polices = parametres_liste_polices()
+    filtre_polices = parametres_polices['filtre']
     
-    if filter_type_police != "Tous":
-        polices_filtered = [p for p in polices_filtered if p['Type'].lower() == filter_type_police.lower()]
+    try:
+        from supabase_config import db
+        page_polices = chargements_page.obtenir(
+            "polices", parametres_polices, lambda: db.lister_polices(**parametres_polices)
+        )
+        
+        for police in page_polices:
+            date_effet = police.get('date_effet', '')
+            date_echeance = police.get('date_echeance', '')
+            
+            polices_data.append({
+                'id': police.get('id'),
+                'N° Police': police.get('numero_police', 'N/A'),
+                'Assuré': police.get('assure_principal', 'N/A'),
+                'Type': police.get('type_police', 'N/A').capitalize(),
+                'Produit': police.get('produit', 'N/A'),
+                'Date effet': date_effet[:10] if date_effet else 'N/A',
+                'Date échéance': date_echeance[:10] if date_echeance else 'N/A',
+                'Prime annuelle': f"{int(police.get('prime_annuelle', 0) or 0):,} FCFA".replace(',', ' '),
+                'Statut': police.get('statut', 'en_cours').replace('_', ' ').capitalize(),
+            })
+    except Exception as e:
+        st.error(f"Erreur chargement polices : {e}")
     
-    if filter_statut_police != "Tous":
-        polices_filtered = [p for p in polices_filtered if p['Statut'].lower() == filter_statut_police.lower()]
+    polices_filtered = polices_data
     
     # === STATISTIQUES ===
+    # Agrégées par la base sur tout le portefeuille (filtres Type et Statut), pas seulement la page
+    groupes_polices = []
+    try:
+        groupes_polices = db.obtenir_statistiques_generales().get('polices', [])
+    except Exception as e:
+        st.error(f"Erreur statistiques polices : {e}")
+    criteres_polices = {k: v for k, v in filtre_polices.items() if k in ('type_police', 'statut')}
+    criteres_type = {k: v for k, v in criteres_polices.items() if k == 'type_police'}
+    statuts_retenus = {filtre_polices['statut']} if 'statut' in filtre_polices else {'en_cours', 'suspendue', 'resiliee'}
+    
     col_p1, col_p2, col_p3, col_p4 = st.columns(4)
     
     with col_p1:
-        st.metric("📋 Total Polices", len(polices_filtered))
+        nb_polices, total_primes = cumuler(groupes_polices, **criteres_polices)
+        st.metric("📋 Total Polices", nb_polices)
     
     with col_p2:
-        nb_actives = len([p for p in polices_filtered if p['Statut'] == 'En cours'])
+        nb_actives = cumuler(groupes_polices, **criteres_type, statut={'en_cours'} & statuts_retenus)[0]
         st.metric("✅ Actives", nb_actives)
     
     with col_p3:
-        nb_suspendues = len([p for p in polices_filtered if p['Statut'] in ['Suspendue', 'Résiliée']])
+        nb_suspendues = cumuler(groupes_polices, **criteres_type, statut={'suspendue', 'resiliee'} & statuts_retenus)[0]
         st.metric("⏸️ Suspendues", nb_suspendues)
     
     with col_p4:
-        total_primes = sum([p['_prime'] for p in polices_filtered])
         st.metric("💰 Primes", f"{total_primes/1000000:.1f}M" if total_primes >= 1000000 else f"{int(total_primes):,}".replace(',', ' '))
+    if search_police:
+        st.caption("Indicateurs calculés sur toutes les polices du type et du statut choisis, hors recherche texte.")
     
     st.markdown("---")
     
@@ -1512,6 +1620,7 @@ with tab_polices:
             use_container_width=True,
             hide_index=True
         )
+        afficher_navigation_pages("polices", page_polices)
         
         # === ACTIONS SUR UNE POLICE ===
         st.markdown("---")
@@ -1535,6 +1644,11 @@ with tab_polices:
             with col_act1:
                 if action_police == "📄 Voir détails" and police_data:
                     if st.button("👁️ Afficher", type="primary", use_container_width=True):
+                        # La liste ne charge que les colonnes affichées : le détail est lu à la demande
+                        police_detail = db.obtenir_police(police_data['id']) or {}
+                        beneficiaires = police_detail.get('beneficiaires') or []
+                        if isinstance(beneficiaires, str):
+                            beneficiaires = json.loads(beneficiaires)
                         st.markdown("### Détails de la Police")
                         col_d1, col_d2 = st.columns(2)
                         with col_d1:
@@ -1542,11 +1656,14 @@ with tab_polices:
                             st.write(f"**Assuré:** {police_data['Assuré']}")
                             st.write(f"**Type:** {police_data['Type']}")
                             st.write(f"**Produit:** {police_data['Produit']}")
+                            st.write(f"**Bénéficiaires:** {len(beneficiaires)}")
                         with col_d2:
                             st.write(f"**Date effet:** {police_data['Date effet']}")
                             st.write(f"**Date échéance:** {police_data['Date échéance']}")
                             st.write(f"**Prime annuelle:** {police_data['Prime annuelle']}")
                             st.write(f"**Statut:** {police_data['Statut']}")
+                            if police_detail.get('cotation_id'):
+                                st.write(f"**Cotation d'origine:** {police_detail['cotation_id']}")
             
             with col_act2:
                 if action_police == "✏️ Modifier statut" and police_data:
@@ -1565,7 +1682,7 @@ with tab_polices:
 # ============================================
 # TAB PARAMÉTRAGES
 # ============================================
-with tab_parametrages:
+with tab_parametrages, chronometre.section("onglet.parametrages"):
     st.title("⚙️ Paramétrages")
     st.markdown("---")
     
@@ -1589,12 +1706,12 @@ with tab_parametrages:
     
     with tab_system:
         st.subheader("Configuration système")
-        st.info("⚙️ Paramètres système à venir")
+        afficher_mesures_performances()
 
 # ============================================
 # TAB COTATION (TOUT LE CONTENU ACTUEL)
 # ============================================
-with tab_cotation:
+with tab_cotation, chronometre.section("onglet.cotation"):
     st.title("Cotation Santé +")
 
     tab_liste, tab_particulier, tab_corporate = st.tabs([
@@ -1604,7 +1721,7 @@ with tab_cotation:
     ])
     
     # --- LISTE DES COTATIONS ---
-    with tab_liste:
+    with tab_liste, chronometre.section("onglet.cotation.liste"):
         st.subheader("📋 Liste des Cotations")
         
         # === BARRE DE RECHERCHE ===
@@ -1627,16 +1744,28 @@ with tab_cotation:
         
         st.markdown("---")
         
-        # Charger les données réelles depuis Supabase
+        en_attente_envoi = file_sauvegardes.statistiques()['profondeur']
+        if en_attente_envoi:
+            st.caption(
+                f"⏳ {en_attente_envoi} devis en cours d'envoi vers la base : "
+                "ils apparaîtront dans la liste une fois envoyés."
+            )
+        
+        # Page de cotations (filtres appliqués côté serveur), lancée en début de rerun
         data_cotations = []
-        devis_bruts = []  # Pour stocker les données brutes
+        page_devis = Page()
+        parametres_devis = parametres_liste_devis()
         
         if st.session_state.db_manager is not None:
             try:
-                devis_list = st.session_state.db_manager.recuperer_devis(limit=100)
-                devis_bruts = devis_list  # Garder les données brutes
+                # Projection de liste : le détail d'un devis n'est lu que pour une action
+                page_devis = chargements_page.obtenir(
+                    "devis", parametres_devis,
+                    lambda: st.session_state.db_manager.rechercher_devis(**parametres_devis),
+                    en_erreur=erreur_chargement("Erreur lors de la recherche", Page())
+                )
                 
-                for devis in devis_list:
+                for devis in page_devis:
                     date_creation = devis.get('date_creation', '')
                     if date_creation:
                         try:
@@ -1647,7 +1776,6 @@ with tab_cotation:
                     else:
                         date_str = "N/A"
                     
-                    prime_nette = devis.get('prime_nette', 0) or 0
                     prime_finale = devis.get('prime_finale', 0) or 0
                     
                     data_cotations.append({
@@ -1660,16 +1788,7 @@ with tab_cotation:
                         "Prime TTC": f"{int(prime_finale):,} FCFA".replace(',', ' '),
                         "Créé le": date_str,
                         "Statut": devis.get('statut', 'En attente'),
-                        # Données brutes pour PDF
-                        "_prime_nette": prime_nette,
                         "_prime_finale": prime_finale,
-                        "_accessoires": devis.get('accessoires', 0) or 0,
-                        "_taxe": devis.get('taxe', 0) or 0,
-                        "_services": devis.get('services', 0) or 0,
-                        "_type_couverture": devis.get('type_couverture', ''),
-                        "_duree": devis.get('duree_contrat', 12),
-                        "_details": devis.get('details', {}),
-                        "_pdf_data": devis.get('pdf_data')  # PDF stocké en base64
                     })
                     
             except Exception as e:
@@ -1677,43 +1796,39 @@ with tab_cotation:
         else:
             st.warning("⚠️ Connexion Supabase non disponible.")
         
-        # === FILTRAGE ===
-        df_cotations_filtered = data_cotations.copy()
-        
-        # Filtre par texte
-        if search_text:
-            df_cotations_filtered = [c for c in df_cotations_filtered if 
-                search_text.lower() in c['N° Cotation'].lower() or
-                search_text.lower() in c['Nom client'].lower() or
-                search_text.lower() in c['Produit'].lower()
-            ]
+        df_cotations_filtered = data_cotations
         
-        # Filtre par branche
+        # === STATISTIQUES ===
+        # Agrégées par la base sur toutes les cotations (filtres Branche et Statut), pas seulement la page
+        groupes_devis = []
+        if st.session_state.db_manager is not None:
+            groupes_devis = chargements_page.obtenir(
+                "statistiques", None, st.session_state.db_manager.get_statistiques_globales,
+                en_erreur=erreur_chargement("Erreur lors de la récupération des statistiques", {})
+            ).get('groupes', [])
+        criteres_devis = {}
         if filter_branche != "Toutes":
-            df_cotations_filtered = [c for c in df_cotations_filtered if c['Branche'] == filter_branche]
-        
-        # Filtre par statut
+            criteres_devis['type_marche'] = filter_branche
+        statuts_devis = {filter_statut} if filter_statut != "Tous" else {'Finalisé', 'En cours', 'En attente'}
+        criteres_branche = dict(criteres_devis)
         if filter_statut != "Tous":
-            df_cotations_filtered = [c for c in df_cotations_filtered if c['Statut'] == filter_statut]
+            criteres_devis['statut'] = filter_statut
         
-        # === STATISTIQUES ===
         col_stat1, col_stat2, col_stat3, col_stat4 = st.columns(4)
-        total_cotations = len(df_cotations_filtered)
+        total_cotations, prime_totale = cumuler(groupes_devis, **criteres_devis)
         
         with col_stat1:
             st.metric("📊 Total", total_cotations)
         with col_stat2:
-            nb_finalise = len([c for c in df_cotations_filtered if c['Statut'] == 'Finalisé'])
+            nb_finalise = cumuler(groupes_devis, **criteres_branche, statut={'Finalisé'} & statuts_devis)[0]
             st.metric("✅ Finalisées", nb_finalise)
         with col_stat3:
-            nb_en_attente = len([c for c in df_cotations_filtered if c['Statut'] in ['En cours', 'En attente']])
+            nb_en_attente = cumuler(groupes_devis, **criteres_branche, statut={'En cours', 'En attente'} & statuts_devis)[0]
             st.metric("⏳ En attente", nb_en_attente)
         with col_stat4:
-            try:
-                prime_totale = sum([c['_prime_finale'] for c in df_cotations_filtered])
-                st.metric("💰 Volume", f"{prime_totale/1000000:.1f}M" if prime_totale >= 1000000 else f"{int(prime_totale):,}".replace(',', ' '))
-            except:
-                st.metric("💰 Volume", "0")
+            st.metric("💰 Volume", f"{prime_totale/1000000:.1f}M" if prime_totale >= 1000000 else f"{int(prime_totale):,}".replace(',', ' '))
+        if search_text:
+            st.caption("Indicateurs calculés sur toutes les cotations de la branche et du statut choisis, hors recherche texte.")
         
         st.markdown("---")
         
@@ -1730,6 +1845,7 @@ with tab_cotation:
                 use_container_width=True,
                 hide_index=True
             )
+            afficher_navigation_pages("devis", page_devis)
             
             # === ACTIONS SUR UNE COTATION ===
             st.markdown("---")
@@ -1764,15 +1880,10 @@ with tab_cotation:
                     if action_type == "📥 Télécharger PDF":
                         if cotation_data and st.button("📥 Télécharger PDF", type="primary", use_container_width=True):
                             try:
-                                import base64
-                                
-                                # SOLUTION RADICALE : Récupérer le PDF BINAIRE stocké
-                                pdf_base64 = cotation_data.get('_pdf_data')
+                                # Récupérer le PDF BINAIRE stocké, à la demande (la liste ne le charge pas)
+                                pdf_bytes = st.session_state.db_manager.recuperer_pdf_devis(cotation_data['N° Cotation'])
                                 
-                                if pdf_base64:
-                                    # Décoder le PDF stocké en base64
-                                    pdf_bytes = base64.b64decode(pdf_base64)
-                                    
+                                if pdf_bytes:
                                     st.download_button(
                                         "⬇️ Télécharger le PDF ORIGINAL",
                                         data=pdf_bytes,
@@ -1785,8 +1896,10 @@ with tab_cotation:
                                     st.warning("⚠️ Pas de PDF stocké. Recréez la cotation avec 'ENREGISTRER AVEC PDF'.")
                                     
                                     # Essayer de régénérer avec les données disponibles
-                                    details = cotation_data.get('_details', {})
-                                    pdf_options_data = details.get('pdf_options_data')
+                                    # Seul le sous-champ utile de details est lu (projection JSON côté base)
+                                    pdf_options_data = st.session_state.db_manager.obtenir_champs_details(
+                                        cotation_data['id'], 'pdf_options_data'
+                                    ).get('pdf_options_data')
                                     
                                     if pdf_options_data:
                                         designations = [
@@ -1905,7 +2018,7 @@ with tab_cotation:
                                         st.error(f"Erreur : {e}")
 
     # --- PARCOURS PARTICULIER ---
-    with tab_particulier:
+    with tab_particulier, chronometre.section("onglet.cotation.particulier"):
         
         # === STYLES DES SECTIONS ===
         st.markdown("""
@@ -3131,20 +3244,20 @@ with tab_cotation:
                                         'resultat': resultat
                                     }
                                 
-                                st.session_state['resultats_part_multi'] = resultats_multi
                                 st.session_state['baremes_selectionnes'] = baremes_selectionnes
                                 st.session_state['configurations_baremes'] = configurations_baremes
-                                st.rerun()
+                                if stocker_blob('resultats_part_multi', resultats_multi):
+                                    st.rerun()
                         except ValueError as e:
                             st.error(f"❌ Erreur de validation : {str(e)}")
                         except Exception as e:
                             st.error(f"❌ Erreur inattendue : {str(e)}")
                 
                 # Affichage des résultats
-                if 'resultats_part_multi' in st.session_state and st.session_state.get('baremes_selectionnes'):
+                if blob_present('resultats_part_multi') and st.session_state.get('baremes_selectionnes'):
                     st.markdown("---")
                     
-                    resultats_multi = st.session_state['resultats_part_multi']
+                    resultats_multi = lire_blob('resultats_part_multi')
                     baremes_affiches = st.session_state['baremes_selectionnes']
                     type_cotation_resultats = st.session_state.get('type_cotation_part', "Une cotation, différentes propositions")
                     
@@ -3233,10 +3346,11 @@ with tab_cotation:
                             }
                             bareme_name = f"COMBINÉ ({len(baremes_affiches)} barèmes)"
                             generer_recapitulatif_particulier({0: {'resultat': resultat_combine}}, [bareme_name])
+                        afficher_proposition_generee("combine")
                     
                     elif len(baremes_affiches) == 1:
                         # Stocker les résultats pour persistence
-                        st.session_state['resultats_multi_saved'] = resultats_multi
+                        stocker_blob('resultats_multi_saved', resultats_multi)
                         st.session_state['baremes_affiches_saved'] = baremes_affiches
                         
                         # Une seule proposition : affichage détaillé normal
@@ -3253,69 +3367,10 @@ with tab_cotation:
                         # Bouton de génération du récapitulatif pour option unique
                         st.markdown("---")
                         if st.button("📝 GÉNÉRER PROPOSITION COMMERCIALE", key="btn_generer_prop_simple", type="secondary"):
-                            st.session_state['proposition_generee'] = True
                             generer_recapitulatif_particulier(resultats_multi, baremes_affiches)
                         
-                        # Afficher les boutons si la proposition a déjà été générée (persistence)
-                        if st.session_state.get('proposition_generee') and st.session_state.get('pdf_bytes_generated'):
-                            st.markdown("---")
-                            col_dl2, col_save2 = st.columns(2)
-                            
-                            with col_dl2:
-                                st.download_button(
-                                    label="📥 TÉLÉCHARGER LE PDF",
-                                    data=st.session_state['pdf_bytes_generated'],
-                                    file_name=f"Proposition_Sante_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
-                                    mime="application/pdf",
-                                    type="primary",
-                                    use_container_width=True,
-                                    key="dl_btn_persist"
-                                )
-                            
-                            with col_save2:
-                                if st.button("💾 ENREGISTRER AVEC PDF", type="secondary", use_container_width=True, key="btn_save_persist"):
-                                    pdf_bytes_to_save = st.session_state.get('pdf_bytes_generated')
-                                    saved_options_data = st.session_state.get('pdf_options_data')
-                                    saved_principal_data = st.session_state.get('pdf_principal_data')
-                                    saved_resultats = st.session_state.get('resultats_multi_saved', resultats_multi)
-                                    saved_baremes = st.session_state.get('baremes_affiches_saved', baremes_affiches)
-                                    configs_baremes = st.session_state.get('configurations_baremes', {})
-                                    
-                                    if pdf_bytes_to_save:
-                                        try:
-                                            for idx in range(len(saved_baremes)):
-                                                bareme_key = saved_baremes[idx]
-                                                resultat = saved_resultats[idx]['resultat']
-                                                config = configs_baremes.get(idx, {})
-                                                
-                                                client_info = {
-                                                    'nom': saved_principal_data.get('prospect', '') if saved_principal_data else '',
-                                                    'prenom': '',
-                                                    'type_couverture': config.get('type_couverture', 'Personne seule'),
-                                                    'nb_adultes': 2 if config.get('type_couverture') == 'Famille' else 1,
-                                                    'nb_enfants': 3 + config.get('enfants_supp', 0) if config.get('type_couverture') == 'Famille' else 0
-                                                }
-                                                
-                                                success = sauvegarder_cotation_supabase(
-                                                    type_marche="Particulier",
-                                                    produit=PRODUITS_PARTICULIERS_UI.get(bareme_key, bareme_key),
-                                                    resultat=resultat,
-                                                    client_info=client_info,
-                                                    duree_contrat=resultat.get('facteurs', {}).get('duree_contrat', 12),
-                                                    reduction_commerciale=resultat.get('facteurs', {}).get('reduction', 0),
-                                                    pdf_options_data=saved_options_data,
-                                                    pdf_principal_data=saved_principal_data,
-                                                    pdf_bytes=pdf_bytes_to_save
-                                                )
-                                            
-                                            st.balloons()
-                                            st.success("✅ Cotation enregistrée avec le PDF !")
-                                            # Réinitialiser l'état
-                                            st.session_state['proposition_generee'] = False
-                                        except Exception as e:
-                                            st.error(f"❌ Erreur: {e}")
-                                    else:
-                                        st.error("❌ Aucun PDF en mémoire")
+                        # Suivi de la génération puis boutons de téléchargement/enregistrement (persistence)
+                        afficher_proposition_generee("simple")
                         
                         # === BOUTON SAUVEGARDE SUPABASE (1 barème) ===
                         st.markdown("---")
@@ -3567,9 +3622,9 @@ with tab_cotation:
                                         resultat['prime_ttc_totale'] = resultat['prime_ttc_taxable'] + prime_lsp_f + prime_assist_psy_f
                                         resultat['prime_forcee'] = True
                                     
-                                    st.session_state['resultats_part_multi'] = resultats_multi
-                                    st.success("✅ Primes forcées appliquées avec succès !")
-                                    st.rerun()
+                                    if stocker_blob('resultats_part_multi', resultats_multi):
+                                        st.success("✅ Primes forcées appliquées avec succès !")
+                                        st.rerun()
 
                         st.markdown("---")
                         
@@ -3601,14 +3656,31 @@ with tab_cotation:
                         )
                         
                         if bareme_image:
-                            st.success(f"✅ Image chargée : {bareme_image.name}")
-                            # Stocker dans session_state
-                            st.session_state['bareme_image_bytes'] = bareme_image.read()
-                            bareme_image.seek(0)  # Reset pour réutilisation
+                            # Normalisée une fois par fichier importé : seule la version
+                            # redimensionnée et recompressée est gardée en session
+                            if st.session_state.get('bareme_image_id') != bareme_image.file_id:
+                                original = bareme_image.getvalue()
+                                bareme = registre_assets.image_importee(original, TAILLE_BAREME)
+                                st.session_state['bareme_image_id'] = bareme_image.file_id
+                                st.session_state['bareme_image_tailles'] = (
+                                    (len(original), len(bareme[0])) if bareme is not None else None
+                                )
+                                if bareme is None or not stocker_blob('bareme_image_bytes', bareme[0]):
+                                    supprimer_blob('bareme_image_bytes')
+                                    st.session_state['bareme_image_tailles'] = None
+                            tailles = st.session_state.get('bareme_image_tailles')
+                            if tailles:
+                                st.success(
+                                    f"✅ Image chargée : {bareme_image.name} "
+                                    f"({tailles[0] / 1024:,.0f} Ko → {tailles[1] / 1024:,.0f} Ko)".replace(",", " ")
+                                )
+                            else:
+                                st.error(f"❌ {bareme_image.name} n'est pas une image lisible")
                         
                         st.markdown("---")
                         if st.button("📝 GÉNÉRER LA PROPOSITION COMMERCIALE", key="btn_generer_prop", type="secondary", use_container_width=True):
                             generer_recapitulatif_particulier(resultats_multi, baremes_affiches)
+                        afficher_proposition_generee("multi")
                         
                         # === BOUTON SAUVEGARDE SUPABASE ===
                         st.markdown("---")
@@ -3652,7 +3724,7 @@ with tab_cotation:
                                 st.warning("⚠️ Connexion à la base de données non disponible. Vérifiez la configuration Supabase.")
     
     # --- PARCOURS CORPORATE ---
-    with tab_corporate:
+    with tab_corporate, chronometre.section("onglet.cotation.corporate"):
         
         # Choix de la méthode de tarification
         st.markdown("<h3 style='color: #6A0DAD;'>Choix de la Méthode de Tarification</h3>", unsafe_allow_html=True)
@@ -3936,23 +4008,23 @@ with tab_cotation:
                             prime_ttc_finale = prime_ttc_totale * (100 - reduction_rapide) / 100
                             
                             # Sauvegarder les résultats
-                            st.session_state['resultats_multi_formules'] = {
+                            if stocker_blob('resultats_multi_formules', {
                                 'formules': resultats_formules,
                                 'prime_nette_totale': prime_nette_totale,
                                 'prime_ttc_totale': prime_ttc_totale,
                                 'reduction_commerciale': reduction_rapide,
                                 'prime_ttc_finale': prime_ttc_finale,
                                 'duree_contrat': duree_contrat_rapide
-                            }
-                            st.rerun()
+                            }):
+                                st.rerun()
                             
                     except ValueError as e:
                         st.error(f"❌ Erreur : {str(e)}")
                 
                 # Affichage des résultats
-                if 'resultats_multi_formules' in st.session_state:
+                if blob_present('resultats_multi_formules'):
                     st.markdown("---")
-                    resultats = st.session_state['resultats_multi_formules']
+                    resultats = lire_blob('resultats_multi_formules')
                     
                     st.markdown("### 📊 Résultats de l'Estimation Multi-Formules")
                     st.info("ℹ️ **ESTIMATION INDICATIVE** - Non contractuelle")
@@ -4087,9 +4159,9 @@ with tab_cotation:
                                 resultats['prime_ttc_totale'] = prime_ttc_totale_forcee
                                 resultats['prime_ttc_finale'] = prime_finale_forcee
                                 resultats['prime_forcee'] = True
-                                st.session_state['resultats_multi_formules'] = resultats
-                                st.success("✅ Prime forcée appliquée avec succès !")
-                                st.rerun()
+                                if stocker_blob('resultats_multi_formules', resultats):
+                                    st.success("✅ Prime forcée appliquée avec succès !")
+                                    st.rerun()
                     
                     st.markdown("---")
                     st.warning(
@@ -4236,7 +4308,8 @@ with tab_cotation:
                                 st.error(f"❌ **Erreur de Validation :** {error_msg}")
                                 st.stop()
                             
-                            st.session_state['df_corporate'] = df_clean
+                            if not stocker_blob('df_corporate', df_clean):
+                                st.stop()
                             st.success(f"✅ Fichier validé : **{len(df_clean)}** lignes détectées")
                             
                             # Aperçu des données
@@ -4247,7 +4320,7 @@ with tab_cotation:
                         st.error(f"❌ Erreur lors de la lecture du fichier : {str(e)}")
             
             # Étape 4 : Micro-Tarification
-            if 'df_corporate' in st.session_state:
+            if blob_present('df_corporate'):
                 st.markdown("---")
                 st.markdown("#### Étape 4 : Micro-Tarification et Gestion du Risque")
                 
@@ -4261,24 +4334,28 @@ with tab_cotation:
                     )
                     
                     if st.button("⚙️ LANCER LA MICRO-TARIFICATION", type="primary", use_container_width=True):
-                        try:
-                            with st.spinner("Analyse ligne par ligne en cours..."):
-                                resultat_micro = calc_micro_tarification_excel(
-                                    st.session_state['df_corporate'],
-                                    produit_key_corp,
-                                    duree_contrat_excel
-                                )
-                                st.session_state['resultat_corp_excel'] = resultat_micro
-                                st.rerun()
-                        except Exception as e:
-                            st.error(f"❌ Erreur lors de la micro-tarification : {str(e)}")
+                        df_a_tarifer = lire_blob('df_corporate')
+                        soumettre_job(
+                            'micro_tarification',
+                            f"Micro-tarification ({len(df_a_tarifer)} lignes)",
+                            _job_micro_tarification,
+                            df_a_tarifer,
+                            produit_key_corp,
+                            duree_contrat_excel,
+                            priorite=priorite_micro_tarification(len(df_a_tarifer))
+                        )
+                    
+                    # Analyse ligne par ligne en arrière-plan : suivi de la progression
+                    job_micro = job_runner.dernier(identifiant_session(), 'micro_tarification')
+                    if job_micro:
+                        suivre_job(job_micro['id'], 'resultat_corp_excel')
                 
                 # Affichage des résultats de micro-tarification
-                if 'resultat_corp_excel' in st.session_state:
+                if blob_present('resultat_corp_excel'):
                     st.markdown("---")
                     st.markdown("#### Étape 5 : Finalisation et Ajustement Commercial")
                     
-                    resultat_micro = st.session_state['resultat_corp_excel']
+                    resultat_micro = lire_blob('resultat_corp_excel')
                     
                     # Saisie des informations administratives
                     with st.container(border=True):
@@ -4332,6 +4409,76 @@ with tab_cotation:
                         reduction_finale
                     )
                     
+                    # Propositions individuelles : rendu en lot en arrière-plan
+                    if resultat_micro['nb_total'] > 0:
+                        st.markdown("---")
+                        st.markdown("### 📦 Propositions Individuelles")
+                        with st.container(border=True):
+                            if st.button(
+                                f"📄 GÉNÉRER {resultat_micro['nb_eligibles']} PROPOSITIONS (ZIP)",
+                                use_container_width=True,
+                                disabled=resultat_micro['nb_eligibles'] == 0,
+                                key="generer_lot_pdf_assures"
+                            ):
+                                supprimer_blob('zip_propositions_assures')
+                                soumettre_job(
+                                    'pdf_lot',
+                                    f"Propositions individuelles ({resultat_micro['nb_eligibles']} PDF)",
+                                    _job_pdf_lot_assures,
+                                    resultat_micro,
+                                    produit_key_corp,
+                                    PRODUITS_CORPORATE_UI[produit_key_corp],
+                                    {'nom': nom_entreprise, 'secteur': secteur},
+                                )
+                            
+                            job_lot = job_runner.dernier(identifiant_session(), 'pdf_lot')
+                            if job_lot:
+                                suivre_job(job_lot['id'], 'zip_propositions_assures')
+                            elif blob_present('zip_propositions_assures'):
+                                # Archive lue sur disque au clic seulement, pas à chaque rerun
+                                session_id = identifiant_session()
+                                st.download_button(
+                                    label="📥 Télécharger les propositions (ZIP)",
+                                    data=lambda: session_store.lire(session_id, 'zip_propositions_assures'),
+                                    file_name=f"Propositions_{(nom_entreprise or 'Entreprise').replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.zip",
+                                    mime="application/zip",
+                                    use_container_width=True
+                                )
+                            
+                            if st.button(
+                                f"📋 ANNEXE : LISTE DES {resultat_micro['nb_total']} ASSURÉS (PDF)",
+                                use_container_width=True,
+                                key="generer_annexe_assures"
+                            ):
+                                supprimer_blob('annexe_assures')
+                                soumettre_job(
+                                    'pdf_annexe',
+                                    f"Annexe liste des assurés ({resultat_micro['nb_total']} lignes)",
+                                    _job_annexe_assures,
+                                    resultat_micro,
+                                    produit_key_corp,
+                                    PRODUITS_CORPORATE_UI[produit_key_corp],
+                                    nom_entreprise or "Entreprise",
+                                )
+                            
+                            job_annexe = job_runner.dernier(identifiant_session(), 'pdf_annexe')
+                            if job_annexe:
+                                suivre_job(job_annexe['id'], 'annexe_assures')
+                            elif blob_present('annexe_assures'):
+                                annexe = lire_blob('annexe_assures')
+                                stats_annexe = annexe['statistiques']
+                                st.caption(
+                                    f"{stats_annexe['nb_lignes']} lignes · {stats_annexe['nb_pages']} pages · "
+                                    f"{stats_annexe['pages_par_seconde']:.0f} pages/s"
+                                )
+                                st.download_button(
+                                    label="📥 Télécharger l'annexe (PDF)",
+                                    data=annexe['pdf'],
+                                    file_name=f"Annexe_Assures_{(nom_entreprise or 'Entreprise').replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.pdf",
+                                    mime="application/pdf",
+                                    use_container_width=True
+                                )
+                    
                     st.markdown("---")
                     st.markdown("### ⚙️ Forçage Manuel de la Prime (Optionnel)")
                     
@@ -4444,9 +4591,9 @@ with tab_cotation:
                                     resultat_micro['motif_forcage'] = motif_forcage
                                     resultat_micro['validateur_forcage'] = validateur_forcage
                                     
-                                    st.session_state['resultat_corp_excel'] = resultat_micro
-                                    st.success("✅ Prime forcée appliquée avec succès !")
-                                    st.rerun()
+                                    if stocker_blob('resultat_corp_excel', resultat_micro):
+                                        st.success("✅ Prime forcée appliquée avec succès !")
+                                        st.rerun()
                     
                     st.markdown("---")
                     col_final1, col_final2 = st.columns([3, 1])
@@ -4482,4 +4629,7 @@ with tab_cotation:
                                     **Motif du forçage :** {resultat_micro.get('motif_forcage', 'N/A')}
                                     """
                                 
-                                st.markdown(recap_text)
\ No newline at end of file
+                                st.markdown(recap_text)
+
+# Fin du rerun (les reruns interrompus par st.rerun()/st.stop() ne sont pas comptés)
+chronometre.enregistrer("rerun", time.perf_counter() - _debut_rerun)
@@ -0,0 +1,304 @@
+"""
+Ordonnanceur des traitements lourds (micro-tarification, PDF, exports)
+Assur Defender - Cotation Santé +
+
+Contrôle d'admission devant les traitements coûteux :
+- nombre global de créneaux CPU partagés par tout le serveur ;
+- nombre maximal de traitements simultanés par utilisateur ;
+- file prioritaire pour les petites demandes interactives, qui disposent
+  de créneaux réservés que les traitements lourds ne peuvent pas occuper ;
+- partage équitable : à priorité égale, l'utilisateur ayant le moins de
+  traitements en cours, puis le moins récemment servi, passe en premier.
+
+Deux façons d'obtenir un créneau, servies par la même file :
+- `creneau()` bloque le thread appelant jusqu'à l'admission ;
+- `reserver()` dépose la demande sans bloquer et appelle `lancer` à
+  l'admission (tâches en arrière-plan : jobs.py ne confie au pool de
+  threads que des tâches déjà admises).
+
+Les cotations interactives exécutées dans le script Streamlit ne passent pas
+par la file : elles se signalent (`interactif()`) et les traitements lourds
+cèdent le processeur à chaque point de progression tant qu'elles tournent.
+"""
+
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+
+NB_CRENEAUX_CPU = int(os.environ.get("AKORA_CRENEAUX_CPU", os.cpu_count() or 2))
+CRENEAUX_RESERVES_INTERACTIFS = int(os.environ.get("AKORA_CRENEAUX_INTERACTIFS", 1))
+MAX_TACHES_PAR_UTILISATEUR = int(os.environ.get("AKORA_MAX_TACHES_UTILISATEUR", 2))
+SEUIL_LIGNES_INTERACTIF = int(os.environ.get("AKORA_SEUIL_LIGNES_INTERACTIF", 500))
+TAILLE_HISTORIQUE_ATTENTES = 500
+
+# Priorités (la plus petite valeur passe en premier)
+PRIORITE_INTERACTIVE = 0
+PRIORITE_LOURDE = 1
+LIBELLES_PRIORITE = {PRIORITE_INTERACTIVE: "interactive", PRIORITE_LOURDE: "lourde"}
+
+
+class AttenteAnnulee(Exception):
+    """Levée quand une demande est annulée avant d'avoir obtenu un créneau."""
+
+
+class _Demande:
+    """Demande de créneau en file d'attente."""
+
+    def __init__(self, proprietaire: str, priorite: int, sequence: int,
+                 lancer: Optional[Callable[["_Demande"], None]] = None):
+        self.proprietaire = proprietaire
+        self.priorite = priorite
+        self.sequence = sequence
+        self.lancer = lancer
+        self.admise = False
+        self.date_arrivee = time.time()
+
+
+class Ordonnanceur:
+    """Contrôle d'admission et ordonnancement équitable des traitements lourds."""
+
+    def __init__(
+        self,
+        nb_creneaux: int = NB_CRENEAUX_CPU,
+        creneaux_reserves_interactifs: int = CRENEAUX_RESERVES_INTERACTIFS,
+        max_par_utilisateur: int = MAX_TACHES_PAR_UTILISATEUR
+    ):
+        self.nb_creneaux = max(1, nb_creneaux)
+        # Au moins un créneau doit rester accessible aux traitements lourds
+        self.creneaux_reserves_interactifs = min(creneaux_reserves_interactifs, self.nb_creneaux - 1)
+        self.max_par_utilisateur = max(1, max_par_utilisateur)
+
+        self._condition = threading.Condition()
+        self._file: List[_Demande] = []
+        self._sequence = itertools.count()
+        self._actifs_par_utilisateur: Dict[str, int] = {}
+        self._derniere_admission: Dict[str, float] = {}
+        self._actifs = 0
+        self._actifs_lourds = 0
+        self._interactifs_en_cours = 0
+        self._attentes: Dict[int, deque] = {
+            p: deque(maxlen=TAILLE_HISTORIQUE_ATTENTES) for p in LIBELLES_PRIORITE
+        }
+        self._nb_admis = 0
+
+    # ==================== CRÉNEAUX ====================
+
+    @contextmanager
+    def creneau(
+        self,
+        proprietaire: str,
+        priorite: int = PRIORITE_LOURDE,
+        annulation: Optional[threading.Event] = None,
+        en_attente: Optional[Callable[[int], None]] = None
+    ):
+        """
+        Bloque jusqu'à l'obtention d'un créneau CPU, puis le libère en sortie.
+
+        Args:
+            proprietaire: Identifiant de l'utilisateur (session)
+            priorite: PRIORITE_INTERACTIVE ou PRIORITE_LOURDE
+            annulation: Événement interrompant l'attente (lève AttenteAnnulee)
+            en_attente: Appelé avec la position dans la file pendant l'attente
+        """
+        demande = self._admettre(proprietaire, priorite, annulation, en_attente)
+        try:
+            yield
+        finally:
+            self._liberer(demande)
+
+    def reserver(self, proprietaire: str, priorite: int, lancer: Callable[[_Demande], None]) -> _Demande:
+        """
+        Dépose une demande sans bloquer : `lancer(demande)` est appelé dès son
+        admission (sous le verrou de l'ordonnanceur : il doit seulement
+        démarrer le traitement, qui appellera `liberer(demande)` en fin).
+        """
+        with self._condition:
+            demande = _Demande(proprietaire, priorite, next(self._sequence), lancer)
+            self._file.append(demande)
+            self._lancer_elues()
+            return demande
+
+    def retirer(self, demande: _Demande) -> bool:
+        """Retire une demande déposée par `reserver` tant qu'elle n'est pas admise."""
+        with self._condition:
+            if demande.admise or demande not in self._file:
+                return False
+            self._file.remove(demande)
+            self._lancer_elues()
+            self._condition.notify_all()
+            return True
+
+    def liberer(self, demande: _Demande):
+        """Libère le créneau d'une demande admise via `reserver`."""
+        self._liberer(demande)
+
+    @contextmanager
+    def interactif(self):
+        """Signale une cotation interactive en cours (les traitements lourds lui cèdent le CPU)."""
+        with self._condition:
+            self._interactifs_en_cours += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._interactifs_en_cours -= 1
+
+    def ceder(self, priorite: int = PRIORITE_LOURDE):
+        """
+        Point de préemption coopérative, appelé par les traitements lourds à
+        chaque étape de progression : libère le GIL tant qu'une cotation
+        interactive est en cours.
+        """
+        if priorite == PRIORITE_INTERACTIVE:
+            return
+        debut = time.time()
+        while self._interactifs_en_cours and time.time() - debut < 0.5:
+            time.sleep(0.005)
+
+    # ==================== SUIVI ====================
+
+    def statistiques(self) -> Dict[str, Any]:
+        """Profondeur de file, créneaux occupés et temps d'attente par priorité."""
+        with self._condition:
+            file_par_priorite = {
+                LIBELLES_PRIORITE[p]: len([d for d in self._file if d.priorite == p])
+                for p in LIBELLES_PRIORITE
+            }
+            attentes = {
+                LIBELLES_PRIORITE[p]: sorted(self._attentes[p]) for p in LIBELLES_PRIORITE
+            }
+            stats = {
+                "nb_creneaux": self.nb_creneaux,
+                "creneaux_reserves_interactifs": self.creneaux_reserves_interactifs,
+                "max_par_utilisateur": self.max_par_utilisateur,
+                "actifs": self._actifs,
+                "actifs_lourds": self._actifs_lourds,
+                "interactifs_en_cours": self._interactifs_en_cours,
+                "profondeur_file": len(self._file),
+                "file_par_priorite": file_par_priorite,
+                "nb_admis": self._nb_admis,
+            }
+        stats["attente_moyenne"] = {
+            p: (sum(a) / len(a)) if a else 0.0 for p, a in attentes.items()
+        }
+        stats["attente_p95"] = {
+            p: a[min(len(a) - 1, int(len(a) * 0.95))] if a else 0.0 for p, a in attentes.items()
+        }
+        return stats
+
+    def rang(self, demande: _Demande) -> int:
+        """Nombre de demandes qui passeront avant `demande` (0 si elle est admise)."""
+        with self._condition:
+            return 0 if demande.admise else self._rang(demande)
+
+    def position(self, proprietaire: str) -> int:
+        """Nombre de demandes en attente d'un utilisateur."""
+        with self._condition:
+            return len([d for d in self._file if d.proprietaire == proprietaire])
+
+    # ==================== INTERNE ====================
+
+    def _admettre(self, proprietaire, priorite, annulation, en_attente) -> _Demande:
+        with self._condition:
+            demande = _Demande(proprietaire, priorite, next(self._sequence))
+            self._file.append(demande)
+            try:
+                self._lancer_elues()
+                while self._elue() is not demande:
+                    if annulation is not None and annulation.is_set():
+                        raise AttenteAnnulee()
+                    if en_attente is not None:
+                        en_attente(self._rang(demande))
+                    self._condition.wait(timeout=0.5)
+            except BaseException:
+                self._file.remove(demande)
+                self._lancer_elues()
+                self._condition.notify_all()
+                raise
+
+            self._prendre(demande)
+            # D'autres demandes peuvent encore être admissibles
+            self._lancer_elues()
+            self._condition.notify_all()
+            return demande
+
+    def _prendre(self, demande: _Demande):
+        """Admet `demande` : la retire de la file et lui attribue un créneau."""
+        self._file.remove(demande)
+        demande.admise = True
+        self._actifs += 1
+        if demande.priorite != PRIORITE_INTERACTIVE:
+            self._actifs_lourds += 1
+        proprietaire = demande.proprietaire
+        self._actifs_par_utilisateur[proprietaire] = self._actifs_par_utilisateur.get(proprietaire, 0) + 1
+        self._derniere_admission[proprietaire] = time.time()
+        self._attentes[demande.priorite].append(time.time() - demande.date_arrivee)
+        self._nb_admis += 1
+
+    def _lancer_elues(self):
+        """Admet et lance les demandes non bloquantes élues (les demandes bloquantes s'admettent elles-mêmes)."""
+        demande = self._elue()
+        while demande is not None and demande.lancer is not None:
+            self._prendre(demande)
+            try:
+                demande.lancer(demande)
+            except Exception:
+                # Lancement impossible (pool arrêté) : créneau rendu
+                self._liberer(demande)
+            demande = self._elue()
+
+    def _liberer(self, demande: _Demande):
+        with self._condition:
+            self._actifs -= 1
+            if demande.priorite != PRIORITE_INTERACTIVE:
+                self._actifs_lourds -= 1
+            restant = self._actifs_par_utilisateur.get(demande.proprietaire, 1) - 1
+            if restant > 0:
+                self._actifs_par_utilisateur[demande.proprietaire] = restant
+            else:
+                self._actifs_par_utilisateur.pop(demande.proprietaire, None)
+                if not any(d.proprietaire == demande.proprietaire for d in self._file):
+                    self._derniere_admission.pop(demande.proprietaire, None)
+            self._lancer_elues()
+            self._condition.notify_all()
+
+    def _admissible(self, demande: _Demande) -> bool:
+        if self._actifs >= self.nb_creneaux:
+            return False
+        if self._actifs_par_utilisateur.get(demande.proprietaire, 0) >= self.max_par_utilisateur:
+            return False
+        if demande.priorite != PRIORITE_INTERACTIVE:
+            return self._actifs_lourds < self.nb_creneaux - self.creneaux_reserves_interactifs
+        return True
+
+    def _cle_ordre(self, demande: _Demande):
+        # Priorité, puis équité entre utilisateurs, puis ordre d'arrivée
+        return (
+            demande.priorite,
+            self._actifs_par_utilisateur.get(demande.proprietaire, 0),
+            self._derniere_admission.get(demande.proprietaire, 0.0),
+            demande.sequence,
+        )
+
+    def _elue(self) -> Optional[_Demande]:
+        """Prochaine demande à admettre (None si aucune ne peut l'être)."""
+        admissibles = [d for d in self._file if self._admissible(d)]
+        return min(admissibles, key=self._cle_ordre) if admissibles else None
+
+    def _rang(self, demande: _Demande) -> int:
+        cle = self._cle_ordre(demande)
+        return len([d for d in self._file if self._cle_ordre(d) < cle])
+
+
+def priorite_micro_tarification(nb_lignes: int) -> int:
+    """Les petits fichiers passent dans la file interactive."""
+    return PRIORITE_INTERACTIVE if nb_lignes <= SEUIL_LIGNES_INTERACTIF else PRIORITE_LOURDE
+
+
+# Instance globale de l'ordonnanceur
+ordonnanceur = Ordonnanceur()
@@ -0,0 +1,351 @@
+"""
+Stockage des objets volumineux de session (PDF, images, DataFrames, résultats)
+Assur Defender - Cotation Santé +
+
+Les petits objets restent en mémoire, les gros sont déplacés dans un cache
+disque local ; un fichier déjà écrit sur disque (FichierSession, ex: archive
+ZIP d'un lot) y est déplacé sans être relu. Chaque session dispose d'un budget en octets et le processus
+d'un budget global ; au-delà, les entrées les moins récemment utilisées
+(LRU) sont évincées.
+
+Les objets sont rangés sous un jeton de session émis par le serveur
+(JetonsSession) et placé dans l'URL : après un rechargement de la page, la
+nouvelle session Streamlit retrouve ainsi ses documents et ses tâches.
+"""
+
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import atexit
+import hashlib
+import secrets
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+# Configuration (surchargeable par variables d'environnement)
+SEUIL_MEMOIRE_OCTETS = int(os.environ.get("AKORA_SEUIL_MEMOIRE_KO", 256)) * 1024
+BUDGET_MEMOIRE_GLOBAL_OCTETS = int(os.environ.get("AKORA_BUDGET_MEMOIRE_MO", 128)) * 1024 * 1024
+BUDGET_SESSION_OCTETS = int(os.environ.get("AKORA_BUDGET_SESSION_MO", 64)) * 1024 * 1024
+BUDGET_GLOBAL_OCTETS = int(os.environ.get("AKORA_BUDGET_GLOBAL_MO", 1024)) * 1024 * 1024
+DUREE_INACTIVITE_SECONDES = int(os.environ.get("AKORA_SESSION_TTL_MIN", 360)) * 60
+REPERTOIRE_CACHE = os.environ.get(
+    "AKORA_CACHE_DIR",
+    os.path.join(tempfile.gettempdir(), "akora_sessions")
+)
+
+
+class FichierSession:
+    """Fichier temporaire confié au stockage tel quel : déplacé dans le cache disque, lu en bytes."""
+
+    def __init__(self, chemin: str):
+        self.chemin = chemin
+
+
+class SessionBlobStore:
+    """Stockage à deux niveaux (mémoire / disque) des objets de session."""
+
+    def __init__(
+        self,
+        repertoire: str = REPERTOIRE_CACHE,
+        seuil_memoire: int = SEUIL_MEMOIRE_OCTETS,
+        budget_memoire_global: int = BUDGET_MEMOIRE_GLOBAL_OCTETS,
+        budget_session: int = BUDGET_SESSION_OCTETS,
+        budget_global: int = BUDGET_GLOBAL_OCTETS,
+        duree_inactivite: int = DUREE_INACTIVITE_SECONDES
+    ):
+        # Un sous-répertoire par processus : deux serveurs ne se marchent pas dessus
+        self.repertoire = os.path.join(repertoire, str(os.getpid()))
+        self.seuil_memoire = seuil_memoire
+        self.budget_memoire_global = budget_memoire_global
+        self.budget_session = budget_session
+        self.budget_global = budget_global
+        self.duree_inactivite = duree_inactivite
+
+        # (session_id, cle) -> entrée ; l'ordre reflète l'utilisation (LRU en tête)
+        self._entrees: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._octets_session: Dict[str, int] = {}
+        self._dernier_acces: Dict[str, float] = {}
+        self._octets_memoire = 0
+        self._octets_disque = 0
+        self._evictions = 0
+        self._deversements = 0
+        self._verrou = threading.RLock()
+
+        os.makedirs(self.repertoire, exist_ok=True)
+        atexit.register(self.vider)
+
+    # ==================== API ====================
+
+    def stocker(self, session_id: str, cle: str, valeur: Any) -> bool:
+        """
+        Stocke un objet pour une session.
+
+        Args:
+            session_id: Identifiant de la session Streamlit
+            cle: Nom de l'objet (ex: 'pdf_bytes_generated')
+            valeur: bytes, FichierSession ou tout objet sérialisable par pickle
+
+        Returns:
+            True si l'objet est stocké, False s'il dépasse le budget de session
+        """
+        if isinstance(valeur, FichierSession):
+            return self._adopter_fichier(session_id, cle, valeur.chemin)
+        if isinstance(valeur, (bytes, bytearray)):
+            donnees, format_ = bytes(valeur), "bytes"
+        else:
+            donnees, format_ = pickle.dumps(valeur, protocol=pickle.HIGHEST_PROTOCOL), "pickle"
+        taille = len(donnees)
+
+        if taille > self.budget_session:
+            return False
+
+        with self._verrou:
+            self._retirer((session_id, cle))
+            self._purger_sessions_inactives()
+
+            entree = {"taille": taille, "format": format_, "valeur": None, "chemin": None}
+            if taille <= self.seuil_memoire:
+                entree["valeur"] = valeur
+                self._octets_memoire += taille
+            else:
+                entree["chemin"] = self._ecrire_disque(session_id, cle, donnees)
+                self._octets_disque += taille
+
+            self._entrees[(session_id, cle)] = entree
+            self._octets_session[session_id] = self._octets_session.get(session_id, 0) + taille
+            self._dernier_acces[session_id] = time.time()
+
+            self._appliquer_budgets(session_id)
+            return (session_id, cle) in self._entrees
+
+    def lire(self, session_id: str, cle: str, defaut: Any = None) -> Any:
+        """Lit un objet de session, ou retourne `defaut` s'il est absent ou évincé."""
+        with self._verrou:
+            entree = self._entrees.get((session_id, cle))
+            if entree is None:
+                return defaut
+            self._entrees.move_to_end((session_id, cle))
+            self._dernier_acces[session_id] = time.time()
+
+            if entree["chemin"] is None:
+                return entree["valeur"]
+
+            try:
+                with open(entree["chemin"], "rb") as f:
+                    donnees = f.read()
+            except OSError:
+                self._retirer((session_id, cle))
+                return defaut
+
+        if entree["format"] == "bytes":
+            return donnees
+        return pickle.loads(donnees)
+
+    def renommer(self, session_id: str, cle: str, nouvelle_cle: str) -> bool:
+        """Range un objet de la session sous une autre clé, sans le relire ; False s'il est absent."""
+        with self._verrou:
+            entree = self._entrees.pop((session_id, cle), None)
+            if entree is None:
+                return False
+            self._retirer((session_id, nouvelle_cle))
+            if entree["chemin"] is not None:
+                chemin = self._chemin(session_id, nouvelle_cle)
+                os.replace(entree["chemin"], chemin)
+                entree["chemin"] = chemin
+            self._entrees[(session_id, nouvelle_cle)] = entree
+            self._dernier_acces[session_id] = time.time()
+            return True
+
+    def contient(self, session_id: str, cle: str) -> bool:
+        """Indique si un objet est présent pour la session."""
+        with self._verrou:
+            return (session_id, cle) in self._entrees
+
+    def supprimer(self, session_id: str, cle: str) -> None:
+        """Supprime un objet de la session."""
+        with self._verrou:
+            self._retirer((session_id, cle))
+
+    def purger_session(self, session_id: str) -> None:
+        """Supprime tous les objets d'une session."""
+        with self._verrou:
+            for cle_entree in [c for c in self._entrees if c[0] == session_id]:
+                self._retirer(cle_entree)
+            self._octets_session.pop(session_id, None)
+            self._dernier_acces.pop(session_id, None)
+
+    def vider(self) -> None:
+        """Supprime tous les objets et le répertoire de cache du processus."""
+        with self._verrou:
+            self._entrees.clear()
+            self._octets_session.clear()
+            self._dernier_acces.clear()
+            self._octets_memoire = 0
+            self._octets_disque = 0
+            shutil.rmtree(self.repertoire, ignore_errors=True)
+
+    def statistiques(self) -> Dict[str, Any]:
+        """Retourne l'occupation mémoire/disque et les compteurs d'éviction."""
+        with self._verrou:
+            return {
+                "nb_sessions": len(self._octets_session),
+                "nb_objets": len(self._entrees),
+                "octets_memoire": self._octets_memoire,
+                "octets_disque": self._octets_disque,
+                "budget_session": self.budget_session,
+                "budget_global": self.budget_global,
+                "evictions": self._evictions,
+                "deversements_disque": self._deversements,
+            }
+
+    # ==================== INTERNE ====================
+
+    def _chemin(self, session_id: str, cle: str) -> str:
+        nom_session = hashlib.sha1(session_id.encode("utf-8")).hexdigest()[:16]
+        nom_cle = hashlib.sha1(cle.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.repertoire, nom_session, f"{nom_cle}.bin")
+
+    def _ecrire_disque(self, session_id: str, cle: str, donnees: bytes) -> str:
+        chemin = self._chemin(session_id, cle)
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        chemin_tmp = f"{chemin}.tmp"
+        with open(chemin_tmp, "wb") as f:
+            f.write(donnees)
+        os.replace(chemin_tmp, chemin)
+        return chemin
+
+    def _adopter_fichier(self, session_id: str, cle: str, chemin_source: str) -> bool:
+        taille = os.path.getsize(chemin_source)
+        if taille > self.budget_session:
+            os.remove(chemin_source)
+            return False
+
+        with self._verrou:
+            self._retirer((session_id, cle))
+            self._purger_sessions_inactives()
+
+            chemin = self._chemin(session_id, cle)
+            os.makedirs(os.path.dirname(chemin), exist_ok=True)
+            shutil.move(chemin_source, chemin)
+            self._entrees[(session_id, cle)] = {"taille": taille, "format": "bytes", "valeur": None, "chemin": chemin}
+            self._octets_disque += taille
+            self._octets_session[session_id] = self._octets_session.get(session_id, 0) + taille
+            self._dernier_acces[session_id] = time.time()
+
+            self._appliquer_budgets(session_id)
+            return (session_id, cle) in self._entrees
+
+    def _retirer(self, cle_entree: Tuple[str, str]) -> None:
+        entree = self._entrees.pop(cle_entree, None)
+        if entree is None:
+            return
+        session_id = cle_entree[0]
+        self._octets_session[session_id] = self._octets_session.get(session_id, 0) - entree["taille"]
+        if entree["chemin"] is None:
+            self._octets_memoire -= entree["taille"]
+        else:
+            self._octets_disque -= entree["taille"]
+            try:
+                os.remove(entree["chemin"])
+            except OSError:
+                pass
+
+    def _deverser(self, cle_entree: Tuple[str, str]) -> None:
+        """Déplace une entrée mémoire vers le disque."""
+        entree = self._entrees[cle_entree]
+        valeur = entree["valeur"]
+        if entree["format"] == "bytes":
+            donnees = bytes(valeur)
+        else:
+            donnees = pickle.dumps(valeur, protocol=pickle.HIGHEST_PROTOCOL)
+        entree["chemin"] = self._ecrire_disque(cle_entree[0], cle_entree[1], donnees)
+        entree["valeur"] = None
+        self._octets_memoire -= entree["taille"]
+        self._octets_disque += entree["taille"]
+        self._deversements += 1
+
+    def _appliquer_budgets(self, session_id: str) -> None:
+        # 1. Budget de la session : évincer ses objets les plus anciens
+        for cle_entree in list(self._entrees):
+            if self._octets_session.get(session_id, 0) <= self.budget_session:
+                break
+            if cle_entree[0] == session_id:
+                self._retirer(cle_entree)
+                self._evictions += 1
+
+        # 2. Budget mémoire global : déverser sur disque plutôt qu'évincer
+        for cle_entree, entree in list(self._entrees.items()):
+            if self._octets_memoire <= self.budget_memoire_global:
+                break
+            if entree["chemin"] is None:
+                self._deverser(cle_entree)
+
+        # 3. Budget global (mémoire + disque) : évincer toutes sessions confondues
+        for cle_entree in list(self._entrees):
+            if self._octets_memoire + self._octets_disque <= self.budget_global:
+                break
+            self._retirer(cle_entree)
+            self._evictions += 1
+
+    def _purger_sessions_inactives(self) -> None:
+        limite = time.time() - self.duree_inactivite
+        for session_id in [s for s, t in self._dernier_acces.items() if t < limite]:
+            self.purger_session(session_id)
+
+
+class JetonsSession:
+    """
+    Jetons de reprise de session (secrets.token_urlsafe), émis par le serveur.
+
+    Un jeton n'est repris que s'il a été émis par ce processus, n'a pas
+    expiré et que la session Streamlit qui le détient est fermée (page
+    rechargée) : un jeton inventé, expiré ou copié vers un second onglet
+    pendant que le premier est ouvert donne lieu à un nouveau jeton.
+    """
+
+    def __init__(self, duree_inactivite: int = DUREE_INACTIVITE_SECONDES):
+        self.duree_inactivite = duree_inactivite
+        # jeton -> (session Streamlit détentrice, dernier accès)
+        self._jetons: Dict[str, Tuple[str, float]] = {}
+        self._verrou = threading.Lock()
+
+    def emettre(self, session_streamlit: str) -> str:
+        """Émet un nouveau jeton détenu par `session_streamlit`."""
+        jeton = secrets.token_urlsafe(24)
+        with self._verrou:
+            self._purger()
+            self._jetons[jeton] = (session_streamlit, time.time())
+        return jeton
+
+    def reprendre(self, jeton: Optional[str], session_streamlit: str,
+                  session_active: Callable[[str], bool]) -> bool:
+        """Transfère `jeton` à `session_streamlit` si sa détentrice n'est plus active."""
+        with self._verrou:
+            self._purger()
+            entree = self._jetons.get(jeton) if jeton else None
+            if entree is None:
+                return False
+            if entree[0] != session_streamlit and session_active(entree[0]):
+                return False
+            self._jetons[jeton] = (session_streamlit, time.time())
+            return True
+
+    def toucher(self, jeton: str) -> None:
+        """Repousse l'expiration du jeton (session utilisée)."""
+        with self._verrou:
+            if jeton in self._jetons:
+                self._jetons[jeton] = (self._jetons[jeton][0], time.time())
+
+    def _purger(self) -> None:
+        limite = time.time() - self.duree_inactivite
+        for jeton in [j for j, (_, t) in self._jetons.items() if t < limite]:
+            del self._jetons[jeton]
+
+
+# Instances globales du stockage et des jetons de session
+session_store = SessionBlobStore()
+jetons_session = JetonsSession()
@@ -0,0 +1,148 @@
+"""
+Statistiques du portefeuille agrégées côté serveur, en un seul aller-retour
+Assur Defender - Cotation Santé +
+
+Les compteurs (devis par statut et par branche, polices par statut et par
+type, cotations, clients, sinistres en cours) et les sommes de primes sont
+calculés par la base dans une seule fonction : le client ne reçoit que
+quelques dizaines de lignes agrégées, quel que soit le nombre de devis.
+
+Fonction à créer une fois dans Supabase (SQL Editor), voir SQL_POSTGRES.
+SQL_SQLITE en est l'équivalent local (développement, tests) : même forme
+de résultat, exécuté sur une connexion sqlite3 contenant les mêmes tables.
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from donnees_json import lire_json
+from instrumentation import mesurer
+from transport import transport_base
+
+
+FONCTION_STATISTIQUES = "statistiques_portefeuille"
+
+# Le résultat est partagé par les onglets d'un même rerun et par les sessions
+DUREE_CACHE_STATISTIQUES = float(os.environ.get("AKORA_CACHE_STATISTIQUES_S", 5))
+
+SQL_POSTGRES = """
+create or replace function statistiques_portefeuille()
+returns json
+language sql
+stable
+as $$
+    select json_build_object(
+        'devis', coalesce((
+            select json_agg(g) from (
+                select statut, type_marche, count(*) as nombre,
+                       coalesce(sum(prime_finale), 0) as total_primes
+                from devis
+                group by statut, type_marche
+            ) g
+        ), '[]'::json),
+        'polices', coalesce((
+            select json_agg(g) from (
+                select statut, type_police, count(*) as nombre,
+                       coalesce(sum(prime_annuelle), 0) as total_primes
+                from polices
+                group by statut, type_police
+            ) g
+        ), '[]'::json),
+        'nb_cotations', (select count(*) from cotations),
+        'nb_clients', (select count(*) from clients),
+        'nb_sinistres_en_cours', (select count(*) from sinistres where statut = 'en_cours')
+    );
+$$;
+"""
+
+SQL_SQLITE = """
+select json_object(
+    'devis', (
+        select coalesce(json_group_array(json_object(
+            'statut', statut, 'type_marche', type_marche,
+            'nombre', nombre, 'total_primes', total_primes
+        )), json_array())
+        from (
+            select statut, type_marche, count(*) as nombre,
+                   coalesce(sum(prime_finale), 0) as total_primes
+            from devis
+            group by statut, type_marche
+        )
+    ),
+    'polices', (
+        select coalesce(json_group_array(json_object(
+            'statut', statut, 'type_police', type_police,
+            'nombre', nombre, 'total_primes', total_primes
+        )), json_array())
+        from (
+            select statut, type_police, count(*) as nombre,
+                   coalesce(sum(prime_annuelle), 0) as total_primes
+            from polices
+            group by statut, type_police
+        )
+    ),
+    'nb_cotations', (select count(*) from cotations),
+    'nb_clients', (select count(*) from clients),
+    'nb_sinistres_en_cours', (select count(*) from sinistres where statut = 'en_cours')
+)
+"""
+
+
+def statistiques_sqlite(connexion) -> Dict[str, Any]:
+    """Agrégat du portefeuille calculé par SQLite (même forme que la fonction Supabase)."""
+    return lire_json(connexion.execute(SQL_SQLITE).fetchone()[0])
+
+
+@mesurer("supabase.statistiques_portefeuille")
+def statistiques_supabase(client) -> Dict[str, Any]:
+    """Agrégat du portefeuille calculé par la fonction Supabase, en une requête."""
+    # Fonction STABLE : la lecture peut être réessayée
+    return transport_base.lire(FONCTION_STATISTIQUES, client.rpc(FONCTION_STATISTIQUES)).data or {}
+
+
+def cumuler(groupes: Iterable[Dict[str, Any]], **criteres: Any) -> Tuple[int, float]:
+    """
+    Nombre de lignes et somme des primes des groupes correspondant aux critères.
+    Un critère peut être une valeur ou un ensemble de valeurs acceptées
+    (ex: cumuler(agregat['devis'], statut={'En cours', 'En attente'})).
+    """
+    nombre, total = 0, 0.0
+    for groupe in groupes:
+        if all(
+            groupe.get(cle) in attendu if isinstance(attendu, (set, frozenset, list, tuple))
+            else groupe.get(cle) == attendu
+            for cle, attendu in criteres.items()
+        ):
+            nombre += groupe.get('nombre') or 0
+            total += float(groupe.get('total_primes') or 0)
+    return nombre, total
+
+
+class CacheStatistiques:
+    """Dernier agrégat lu, réutilisé pendant quelques secondes (un appel par rerun au plus)."""
+
+    def __init__(self, duree: float = DUREE_CACHE_STATISTIQUES):
+        self.duree = duree
+        self._agregat: Optional[Dict[str, Any]] = None
+        self._date = 0.0
+        self._verrou = threading.Lock()
+
+    def obtenir(self, lecture: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Agrégat en cache s'il est récent, sinon relu avec `lecture()`."""
+        with self._verrou:
+            if self._agregat is not None and time.monotonic() - self._date < self.duree:
+                return self._agregat
+            self._agregat = lecture()
+            self._date = time.monotonic()
+            return self._agregat
+
+    def invalider(self):
+        """À appeler après une écriture qui modifie les compteurs."""
+        with self._verrou:
+            self._agregat = None
+
+
+# Instance globale du cache des statistiques
+cache_statistiques = CacheStatistiques()
@@ -0,0 +1,181 @@
+"""
+Stockage des documents (PDF des propositions) hors des lignes de la base
+Assur Defender - Cotation Santé +
+
+Les PDF ne sont plus encodés en base64 dans `devis.pdf_data` : ils sont
+déposés dans un stockage de documents (Supabase Storage en production, un
+répertoire local en développement) et la ligne ne garde qu'une référence
+courte « blob:<clé> ». La liste des cotations ne transporte donc plus les
+PDF ; un PDF n'est téléchargé que lorsqu'il est demandé.
+
+Les clés sont adressées par le contenu (empreinte SHA-256) : un même PDF
+enregistré deux fois n'est stocké qu'une fois, et un dépôt répété est
+sans effet.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+from instrumentation import mesurer
+from transport import transport_stockage
+
+
+# 'supabase' (production) ou 'local' (développement, tests)
+BACKEND_DOCUMENTS = os.environ.get("AKORA_STOCKAGE_DOCUMENTS", "supabase")
+BUCKET_DOCUMENTS = os.environ.get("AKORA_BUCKET_DOCUMENTS", "documents")
+REPERTOIRE_DOCUMENTS = os.environ.get(
+    "AKORA_DOCUMENTS_DIR",
+    os.path.join(tempfile.gettempdir(), "akora_documents")
+)
+
+PREFIXE_REFERENCE = "blob:"
+TYPES_CONTENU = {'pdf': "application/pdf", 'zip': "application/zip"}
+
+
+def cle_contenu(donnees: bytes, extension: str = 'pdf') -> str:
+    """Clé adressée par le contenu : '<extension>/<2 premiers car.>/<sha256>.<extension>'."""
+    empreinte = hashlib.sha256(donnees).hexdigest()
+    return f"{extension}/{empreinte[:2]}/{empreinte}.{extension}"
+
+
+def est_reference(valeur: Any) -> bool:
+    """Indique si une valeur de colonne est une référence de document (et non un PDF en base64)."""
+    return isinstance(valeur, str) and valeur.startswith(PREFIXE_REFERENCE)
+
+
+class StockageLocal:
+    """Stockage de documents dans un répertoire local (développement, tests)."""
+
+    nom = 'local'
+
+    def __init__(self, repertoire: str = REPERTOIRE_DOCUMENTS):
+        self.repertoire = repertoire
+
+    def _chemin(self, cle: str) -> str:
+        return os.path.join(self.repertoire, *cle.split('/'))
+
+    def deposer(self, cle: str, donnees: bytes, type_contenu: str):
+        chemin = self._chemin(cle)
+        if os.path.exists(chemin):
+            return
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        # Écriture atomique : un lecteur ne voit jamais un fichier partiel
+        descripteur, chemin_tmp = tempfile.mkstemp(dir=os.path.dirname(chemin))
+        with os.fdopen(descripteur, 'wb') as fichier:
+            fichier.write(donnees)
+        os.replace(chemin_tmp, chemin)
+
+    def lire(self, cle: str) -> Optional[bytes]:
+        try:
+            with open(self._chemin(cle), 'rb') as fichier:
+                return fichier.read()
+        except FileNotFoundError:
+            return None
+
+    def supprimer(self, cle: str):
+        try:
+            os.remove(self._chemin(cle))
+        except FileNotFoundError:
+            pass
+
+
+class StockageSupabase:
+    """Stockage de documents dans un bucket Supabase Storage."""
+
+    nom = 'supabase'
+
+    def __init__(self, bucket: str = BUCKET_DOCUMENTS, client=None):
+        self.bucket = bucket
+        self._client = client
+
+    def _bucket(self):
+        if self._client is None:
+            from supabase_config import supabase
+            self._client = supabase
+        return self._client.storage.from_(self.bucket)
+
+    def deposer(self, cle: str, donnees: bytes, type_contenu: str):
+        # Clé adressée par le contenu : écraser un objet existant est sans
+        # effet, le dépôt peut donc être réessayé comme une lecture
+        bucket = self._bucket()
+        transport_stockage.appeler(
+            "deposer",
+            lambda: bucket.upload(cle, donnees, {"content-type": type_contenu, "upsert": "true"}),
+            idempotent=True
+        )
+
+    def lire(self, cle: str) -> Optional[bytes]:
+        try:
+            bucket = self._bucket()
+            return transport_stockage.appeler("lire", lambda: bucket.download(cle), idempotent=True)
+        except Exception as e:
+            if "not found" in str(e).lower().replace('_', ' '):
+                return None
+            raise
+
+    def supprimer(self, cle: str):
+        bucket = self._bucket()
+        transport_stockage.appeler("supprimer", lambda: bucket.remove([cle]))
+
+
+class StockageDocuments:
+    """Dépôt et lecture des documents par référence, quel que soit le stockage."""
+
+    def __init__(self, stockage=None):
+        self.stockage = stockage if stockage is not None else creer_stockage()
+        self._verrou = threading.Lock()
+        self._depots = 0
+        self._octets_deposes = 0
+        self._lectures = 0
+        self._octets_lus = 0
+
+    @mesurer("documents.deposer")
+    def deposer(self, donnees: bytes, extension: str = 'pdf') -> str:
+        """
+        Dépose un document et retourne sa référence, à enregistrer à la place
+        du contenu (ex: 'blob:pdf/3f/3f9a....pdf').
+        """
+        cle = cle_contenu(donnees, extension)
+        self.stockage.deposer(cle, donnees, TYPES_CONTENU.get(extension, "application/octet-stream"))
+        with self._verrou:
+            self._depots += 1
+            self._octets_deposes += len(donnees)
+        return PREFIXE_REFERENCE + cle
+
+    @mesurer("documents.lire")
+    def lire(self, reference: str) -> Optional[bytes]:
+        """Contenu du document référencé, ou None s'il n'existe pas (plus)."""
+        if not est_reference(reference):
+            return None
+        donnees = self.stockage.lire(reference[len(PREFIXE_REFERENCE):])
+        if donnees is not None:
+            with self._verrou:
+                self._lectures += 1
+                self._octets_lus += len(donnees)
+        return donnees
+
+    def statistiques(self) -> Dict[str, Any]:
+        with self._verrou:
+            return {
+                "stockage": self.stockage.nom,
+                "depots": self._depots,
+                "octets_deposes": self._octets_deposes,
+                "lectures": self._lectures,
+                "octets_lus": self._octets_lus,
+            }
+
+
+def creer_stockage(backend: str = BACKEND_DOCUMENTS):
+    """Stockage correspondant à la configuration (AKORA_STOCKAGE_DOCUMENTS)."""
+    if backend == 'local':
+        return StockageLocal()
+    if backend == 'supabase':
+        return StockageSupabase()
+    raise ValueError(f"Stockage de documents inconnu : {backend}")
+
+
+# Instance globale du stockage de documents
+stockage_documents = StockageDocuments()
@@ -2,27 +2,77 @@
 Configuration et connexion à Supabase pour l'application Assur Defender
 """
 import os
-from supabase import create_client, Client
+import httpx
+from supabase import create_client, Client, ClientOptions
 from typing import Dict, List, Optional, Any
 from datetime import datetime
 import json
 
+from instrumentation import chronometre, mesurer, noter_reponse_http
+from pagination import Curseur, Page, TAILLE_PAGE_DEFAUT, paginer
+from statistiques import cache_statistiques, cumuler, statistiques_supabase
+from transport import DELAI_REQUETE, DELAI_STOCKAGE, transport_base
+
 # Configuration Supabase
 SUPABASE_URL = "https://wzrgcuapmdosgwnymsvi.supabase.co"
 SUPABASE_KEY = "sb_secret_pp_K106G8v5u4gc8FSWM9g_3K9VmEO0"
 
-# Créer le client Supabase
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Créer le client Supabase, avec des délais bornés (voir transport.py)
+supabase: Client = create_client(
+    SUPABASE_URL,
+    SUPABASE_KEY,
+    options=ClientOptions(
+        postgrest_client_timeout=httpx.Timeout(DELAI_REQUETE, connect=min(DELAI_REQUETE, 5.0)),
+        storage_client_timeout=int(DELAI_STOCKAGE),
+    )
+)
+# Volume des réponses PostgREST relevé sur l'en-tête Content-Length (voir instrumentation.py)
+supabase.postgrest.session.event_hooks['response'].append(noter_reponse_http)
+
+
+# 'supabase' (production) ou 'sqlite' (hors ligne : développement, bancs de mesure)
+BACKEND_BASE = os.environ.get("AKORA_BACKEND_BASE", "supabase")
+
+
+def creer_client(backend: str = BACKEND_BASE):
+    """Client de base correspondant à la configuration (AKORA_BACKEND_BASE)."""
+    if backend == 'sqlite':
+        from base_sqlite import ClientSQLite
+        return ClientSQLite()
+    if backend == 'supabase':
+        return supabase
+    raise ValueError(f"Backend de base inconnu : {backend}")
+
+
+client_base = creer_client()
+
+
+def get_supabase_client():
+    """Client de base partagé par les gestionnaires (DatabaseManager, SupabaseManager)."""
+    return client_base
+
+# Projections des listes : colonnes affichées uniquement, le détail complet
+# (details JSON, montants) est lu par obtenir_cotation / obtenir_police
+COLONNES_LISTE_COTATIONS = (
+    "id, reference, type_client, prospect, apporteur, produit, "
+    "prime_ttc, statut, date_creation"
+)
+COLONNES_LISTE_POLICES = (
+    "id, numero_police, assure_principal, type_police, produit, "
+    "date_effet, date_echeance, prime_annuelle, statut, date_creation"
+)
 
 
 class SupabaseManager:
     """Gestionnaire pour toutes les opérations Supabase"""
     
-    def __init__(self):
-        self.client = supabase
+    def __init__(self, client=None):
+        # Un client peut être fourni (banc de mesure, base locale)
+        self.client = client if client is not None else get_supabase_client()
     
     # ==================== COTATIONS ====================
     
+    @mesurer("supabase.creer_cotation")
     def creer_cotation(self, data: Dict[str, Any]) -> Dict:
         """
         Créer une nouvelle cotation
@@ -67,15 +117,17 @@ class SupabaseManager:
                 "date_modification": datetime.now().isoformat()
             }
             
-            result = self.client.table("cotations").insert(cotation_data).execute()
+            result = transport_base.ecrire("creer_cotation", self.client.table("cotations").insert(cotation_data))
+            cache_statistiques.invalider()
             return {"success": True, "data": result.data}
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    @mesurer("supabase.obtenir_cotation")
     def obtenir_cotation(self, cotation_id: int) -> Optional[Dict]:
         """Obtenir une cotation par son ID"""
         try:
-            result = self.client.table("cotations").select("*").eq("id", cotation_id).execute()
+            result = transport_base.lire("obtenir_cotation", self.client.table("cotations").select("*").eq("id", cotation_id))
             if result.data:
                 return result.data[0]
             return None
@@ -83,10 +135,11 @@ class SupabaseManager:
             print(f"Erreur lors de la récupération de la cotation: {e}")
             return None
     
+    @mesurer("supabase.obtenir_cotation_par_reference")
     def obtenir_cotation_par_reference(self, reference: str) -> Optional[Dict]:
         """Obtenir une cotation par sa référence"""
         try:
-            result = self.client.table("cotations").select("*").eq("reference", reference).execute()
+            result = transport_base.lire("obtenir_cotation_par_reference", self.client.table("cotations").select("*").eq("reference", reference))
             if result.data:
                 return result.data[0]
             return None
@@ -94,16 +147,20 @@ class SupabaseManager:
             print(f"Erreur lors de la récupération de la cotation: {e}")
             return None
     
-    def lister_cotations(self, filtre: Optional[Dict] = None, limite: int = 50) -> List[Dict]:
+    @mesurer("supabase.lister_cotations")
+    def lister_cotations(self, filtre: Optional[Dict] = None, limite: int = TAILLE_PAGE_DEFAUT,
+                         apres: Optional[Curseur] = None, avant: Optional[Curseur] = None) -> Page:
         """
-        Lister les cotations avec filtres optionnels
+        Lister les cotations avec filtres optionnels, page par page
         
         Args:
             filtre: Dictionnaire de filtres (statut, type_client, apporteur, etc.)
-            limite: Nombre maximum de résultats
+            limite: Nombre de cotations par page
+            apres: Curseur de la page suivante (page.curseur_suivant)
+            avant: Curseur de la page précédente (page.curseur_precedent)
         """
         try:
-            query = self.client.table("cotations").select("*")
+            query = self.client.table("cotations").select(COLONNES_LISTE_COTATIONS)
             
             if filtre:
                 if "statut" in filtre:
@@ -113,12 +170,14 @@ class SupabaseManager:
                 if "apporteur" in filtre:
                     query = query.eq("apporteur", filtre["apporteur"])
             
-            result = query.order("date_creation", desc=True).limit(limite).execute()
-            return result.data
+            page = paginer(query, limite, apres=apres, avant=avant, nom="lister_cotations")
+            chronometre.enregistrer_volume_reponse("supabase.lister_cotations", page)
+            return page
         except Exception as e:
             print(f"Erreur lors du listage des cotations: {e}")
-            return []
+            return Page()
     
+    @mesurer("supabase.mettre_a_jour_cotation")
     def mettre_a_jour_cotation(self, cotation_id: int, data: Dict) -> Dict:
         """Mettre à jour une cotation existante"""
         try:
@@ -126,21 +185,24 @@ class SupabaseManager:
             if "details" in data and isinstance(data["details"], dict):
                 data["details"] = json.dumps(data["details"])
             
-            result = self.client.table("cotations").update(data).eq("id", cotation_id).execute()
+            result = transport_base.ecrire("mettre_a_jour_cotation", self.client.table("cotations").update(data).eq("id", cotation_id))
             return {"success": True, "data": result.data}
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    @mesurer("supabase.supprimer_cotation")
     def supprimer_cotation(self, cotation_id: int) -> Dict:
         """Supprimer une cotation"""
         try:
-            result = self.client.table("cotations").delete().eq("id", cotation_id).execute()
+            result = transport_base.ecrire("supprimer_cotation", self.client.table("cotations").delete().eq("id", cotation_id))
+            cache_statistiques.invalider()
             return {"success": True, "data": result.data}
         except Exception as e:
             return {"success": False, "error": str(e)}
     
     # ==================== POLICES ====================
     
+    @mesurer("supabase.creer_police")
     def creer_police(self, data: Dict[str, Any]) -> Dict:
         """
         Créer une nouvelle police d'assurance
@@ -176,15 +238,17 @@ class SupabaseManager:
                 "date_modification": datetime.now().isoformat()
             }
             
-            result = self.client.table("polices").insert(police_data).execute()
+            result = transport_base.ecrire("creer_police", self.client.table("polices").insert(police_data))
+            cache_statistiques.invalider()
             return {"success": True, "data": result.data}
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    @mesurer("supabase.obtenir_police")
     def obtenir_police(self, police_id: int) -> Optional[Dict]:
         """Obtenir une police par son ID"""
         try:
-            result = self.client.table("polices").select("*").eq("id", police_id).execute()
+            result = transport_base.lire("obtenir_police", self.client.table("polices").select("*").eq("id", police_id))
             if result.data:
                 return result.data[0]
             return None
@@ -192,10 +256,11 @@ class SupabaseManager:
             print(f"Erreur lors de la récupération de la police: {e}")
             return None
     
+    @mesurer("supabase.obtenir_police_par_numero")
     def obtenir_police_par_numero(self, numero_police: str) -> Optional[Dict]:
         """Obtenir une police par son numéro"""
         try:
-            result = self.client.table("polices").select("*").eq("numero_police", numero_police).execute()
+            result = transport_base.lire("obtenir_police_par_numero", self.client.table("polices").select("*").eq("numero_police", numero_police))
             if result.data:
                 return result.data[0]
             return None
@@ -203,10 +268,12 @@ class SupabaseManager:
             print(f"Erreur lors de la récupération de la police: {e}")
             return None
     
-    def lister_polices(self, filtre: Optional[Dict] = None, limite: int = 50) -> List[Dict]:
-        """Lister les polices avec filtres optionnels"""
+    @mesurer("supabase.lister_polices")
+    def lister_polices(self, filtre: Optional[Dict] = None, limite: int = TAILLE_PAGE_DEFAUT,
+                       apres: Optional[Curseur] = None, avant: Optional[Curseur] = None) -> Page:
+        """Lister les polices avec filtres optionnels, page par page (voir lister_cotations)"""
         try:
-            query = self.client.table("polices").select("*")
+            query = self.client.table("polices").select(COLONNES_LISTE_POLICES)
             
             if filtre:
                 if "statut" in filtre:
@@ -215,13 +282,19 @@ class SupabaseManager:
                     query = query.eq("type_police", filtre["type_police"])
                 if "assure_principal" in filtre:
                     query = query.ilike("assure_principal", f"%{filtre['assure_principal']}%")
+                if "recherche" in filtre:
+                    terme = filtre["recherche"].replace('"', '')
+                    motif = f'"%{terme}%"'
+                    query = query.or_(f"numero_police.ilike.{motif},assure_principal.ilike.{motif}")
             
-            result = query.order("date_creation", desc=True).limit(limite).execute()
-            return result.data
+            page = paginer(query, limite, apres=apres, avant=avant, nom="lister_polices")
+            chronometre.enregistrer_volume_reponse("supabase.lister_polices", page)
+            return page
         except Exception as e:
             print(f"Erreur lors du listage des polices: {e}")
-            return []
+            return Page()
     
+    @mesurer("supabase.mettre_a_jour_police")
     def mettre_a_jour_police(self, police_id: int, data: Dict) -> Dict:
         """Mettre à jour une police existante"""
         try:
@@ -231,13 +304,15 @@ class SupabaseManager:
             if "documents" in data and isinstance(data["documents"], dict):
                 data["documents"] = json.dumps(data["documents"])
             
-            result = self.client.table("polices").update(data).eq("id", police_id).execute()
+            result = transport_base.ecrire("mettre_a_jour_police", self.client.table("polices").update(data).eq("id", police_id))
+            cache_statistiques.invalider()
             return {"success": True, "data": result.data}
         except Exception as e:
             return {"success": False, "error": str(e)}
     
     # ==================== CLIENTS ====================
     
+    @mesurer("supabase.creer_client")
     def creer_client(self, data: Dict[str, Any]) -> Dict:
         """
         Créer un nouveau client
@@ -267,15 +342,17 @@ class SupabaseManager:
                 "date_modification": datetime.now().isoformat()
             }
             
-            result = self.client.table("clients").insert(client_data).execute()
+            result = transport_base.ecrire("creer_client", self.client.table("clients").insert(client_data))
+            cache_statistiques.invalider()
             return {"success": True, "data": result.data}
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    @mesurer("supabase.obtenir_client")
     def obtenir_client(self, client_id: int) -> Optional[Dict]:
         """Obtenir un client par son ID"""
         try:
-            result = self.client.table("clients").select("*").eq("id", client_id).execute()
+            result = transport_base.lire("obtenir_client", self.client.table("clients").select("*").eq("id", client_id))
             if result.data:
                 return result.data[0]
             return None
@@ -283,21 +360,23 @@ class SupabaseManager:
             print(f"Erreur lors de la récupération du client: {e}")
             return None
     
+    @mesurer("supabase.rechercher_clients")
     def rechercher_clients(self, terme: str) -> List[Dict]:
         """Rechercher des clients par nom, email ou téléphone"""
         try:
-            result = self.client.table("clients").select("*").or_(
+            result = transport_base.lire("rechercher_clients", self.client.table("clients").select("*").or_(
                 f"nom.ilike.%{terme}%,email.ilike.%{terme}%,telephone.ilike.%{terme}%"
-            ).execute()
+            ))
             return result.data
         except Exception as e:
             print(f"Erreur lors de la recherche de clients: {e}")
             return []
     
+    @mesurer("supabase.lister_clients")
     def lister_clients(self, limite: int = 50) -> List[Dict]:
         """Lister tous les clients"""
         try:
-            result = self.client.table("clients").select("*").order("date_creation", desc=True).limit(limite).execute()
+            result = transport_base.lire("lister_clients", self.client.table("clients").select("*").order("date_creation", desc=True).limit(limite))
             return result.data
         except Exception as e:
             print(f"Erreur lors du listage des clients: {e}")
@@ -305,6 +384,7 @@ class SupabaseManager:
     
     # ==================== SINISTRES ====================
     
+    @mesurer("supabase.creer_sinistre")
     def creer_sinistre(self, data: Dict[str, Any]) -> Dict:
         """
         Créer une déclaration de sinistre
@@ -336,15 +416,17 @@ class SupabaseManager:
                 "date_modification": datetime.now().isoformat()
             }
             
-            result = self.client.table("sinistres").insert(sinistre_data).execute()
+            result = transport_base.ecrire("creer_sinistre", self.client.table("sinistres").insert(sinistre_data))
+            cache_statistiques.invalider()
             return {"success": True, "data": result.data}
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    @mesurer("supabase.lister_sinistres_police")
     def lister_sinistres_police(self, police_id: int) -> List[Dict]:
         """Lister tous les sinistres d'une police"""
         try:
-            result = self.client.table("sinistres").select("*").eq("police_id", police_id).order("date_sinistre", desc=True).execute()
+            result = transport_base.lire("lister_sinistres_police", self.client.table("sinistres").select("*").eq("police_id", police_id).order("date_sinistre", desc=True))
             return result.data
         except Exception as e:
             print(f"Erreur lors du listage des sinistres: {e}")
@@ -352,30 +434,23 @@ class SupabaseManager:
     
     # ==================== STATISTIQUES ====================
     
+    @mesurer("supabase.obtenir_statistiques_generales")
     def obtenir_statistiques_generales(self) -> Dict:
-        """Obtenir les statistiques générales du portefeuille"""
+        """
+        Obtenir les statistiques générales du portefeuille, agrégées par la base
+        en une requête (fonction statistiques_portefeuille, voir statistiques.py).
+        `polices` détaille les compteurs par (statut, type_police) pour les filtres.
+        """
         try:
-            # Nombre de cotations
-            cotations = self.client.table("cotations").select("*", count="exact").execute()
-            nb_cotations = cotations.count if cotations.count else 0
-            
-            # Nombre de polices actives
-            polices_actives = self.client.table("polices").select("*", count="exact").eq("statut", "en_cours").execute()
-            nb_polices_actives = polices_actives.count if polices_actives.count else 0
-            
-            # Nombre de clients
-            clients = self.client.table("clients").select("*", count="exact").execute()
-            nb_clients = clients.count if clients.count else 0
-            
-            # Nombre de sinistres en cours
-            sinistres_en_cours = self.client.table("sinistres").select("*", count="exact").eq("statut", "en_cours").execute()
-            nb_sinistres_en_cours = sinistres_en_cours.count if sinistres_en_cours.count else 0
+            agregat = cache_statistiques.obtenir(lambda: statistiques_supabase(self.client))
+            polices = agregat.get('polices') or []
             
             return {
-                "nb_cotations": nb_cotations,
-                "nb_polices_actives": nb_polices_actives,
-                "nb_clients": nb_clients,
-                "nb_sinistres_en_cours": nb_sinistres_en_cours
+                "nb_cotations": agregat.get('nb_cotations') or 0,
+                "nb_polices_actives": cumuler(polices, statut="en_cours")[0],
+                "nb_clients": agregat.get('nb_clients') or 0,
+                "nb_sinistres_en_cours": agregat.get('nb_sinistres_en_cours') or 0,
+                "polices": polices
             }
         except Exception as e:
             print(f"Erreur lors du calcul des statistiques: {e}")
@@ -383,7 +458,8 @@ class SupabaseManager:
                 "nb_cotations": 0,
                 "nb_polices_actives": 0,
                 "nb_clients": 0,
-                "nb_sinistres_en_cours": 0
+                "nb_sinistres_en_cours": 0,
+                "polices": []
             }
 
 
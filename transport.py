@@ -0,0 +1,246 @@
+"""
+Transport résilient vers Supabase : délais, nouvelles tentatives, disjoncteur
+Assur Defender - Cotation Santé +
+
+Tous les appels réseau des gestionnaires (base PostgREST, stockage de
+documents) passent par un Transport :
+
+- délai par appel : le client Supabase est créé avec un délai PostgREST
+  (AKORA_DELAI_REQUETE_S) et stockage (AKORA_DELAI_STOCKAGE_S) au lieu des
+  120 s par défaut ; un backend lent ne bloque plus un rerun indéfiniment ;
+- nouvelles tentatives pour les lectures uniquement (requêtes idempotentes),
+  sur erreurs transitoires (réseau, délai dépassé, HTTP 5xx / 429), avec une
+  attente exponentielle tirée au hasard (« full jitter ») et un budget total
+  par appel ; les écritures ne sont jamais rejouées ;
+- disjoncteur : après AKORA_SEUIL_DISJONCTEUR échecs transitoires
+  consécutifs, les appels échouent immédiatement (ServiceIndisponible) sans
+  toucher le réseau pendant AKORA_DISJONCTEUR_S secondes, puis un seul appel
+  d'essai décide de la refermeture. Les sessions ne s'empilent donc pas
+  derrière un backend en panne.
+
+Chaque événement (nouvelle tentative, échec, ouverture / fermeture du
+disjoncteur, rejet) est journalisé sur le logger « akora.transport »
+(message clé=valeur, champs aussi passés en `extra`) et compté ; les
+compteurs sont affichés dans Paramétrages > Système.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+from postgrest.exceptions import APIError
+
+from instrumentation import chronometre
+
+
+DELAI_REQUETE = float(os.environ.get("AKORA_DELAI_REQUETE_S", 10))
+DELAI_STOCKAGE = float(os.environ.get("AKORA_DELAI_STOCKAGE_S", 30))
+NB_TENTATIVES_LECTURE = int(os.environ.get("AKORA_TENTATIVES_LECTURE", 3))
+ATTENTE_BASE = float(os.environ.get("AKORA_ATTENTE_BASE_S", 0.2))
+ATTENTE_MAX = float(os.environ.get("AKORA_ATTENTE_MAX_S", 2.0))
+BUDGET_APPEL = float(os.environ.get("AKORA_BUDGET_APPEL_S", 20))
+SEUIL_DISJONCTEUR = int(os.environ.get("AKORA_SEUIL_DISJONCTEUR", 5))
+DUREE_OUVERTURE = float(os.environ.get("AKORA_DISJONCTEUR_S", 30))
+
+FERME, OUVERT, SEMI_OUVERT = 'fermé', 'ouvert', 'semi-ouvert'
+
+# Codes PostgreSQL transitoires : connexion, ressources, annulation / délai
+PREFIXES_SQL_TRANSITOIRES = ('08', '53', '57')
+
+journal = logging.getLogger("akora.transport")
+
+
+class ServiceIndisponible(Exception):
+    """Levée sans appel réseau lorsque le disjoncteur d'un service est ouvert."""
+
+
+def est_transitoire(erreur: BaseException) -> bool:
+    """Indique si l'erreur peut disparaître en réessayant (réseau, délai, surcharge)."""
+    if isinstance(erreur, httpx.TransportError):
+        # Délais dépassés, connexion refusée ou coupée, DNS...
+        return True
+    if isinstance(erreur, APIError):
+        code = str(erreur.code or '')
+        if len(code) == 3:
+            # Code HTTP (réponse non JSON)
+            return code.startswith('5') or code in ('408', '429')
+        return code.startswith(PREFIXES_SQL_TRANSITOIRES)
+    return False
+
+
+def _journaliser(niveau: int, evenement: str, **champs: Any):
+    message = " ".join([f"evenement={evenement}"] + [f"{cle}={valeur}" for cle, valeur in champs.items()])
+    journal.log(niveau, message, extra={'evenement': evenement, **champs})
+
+
+class Disjoncteur:
+    """Disjoncteur fermé / ouvert / semi-ouvert d'un service."""
+
+    def __init__(self, service: str, seuil: int = SEUIL_DISJONCTEUR, duree_ouverture: float = DUREE_OUVERTURE):
+        self.service = service
+        self.seuil = seuil
+        self.duree_ouverture = duree_ouverture
+        self.etat = FERME
+        self.echecs_consecutifs = 0
+        self._date_ouverture = 0.0
+        self._essai_en_cours = False
+        self._verrou = threading.Lock()
+
+    def autoriser(self) -> bool:
+        """Indique si un appel peut partir ; en semi-ouvert, un seul appel d'essai à la fois."""
+        with self._verrou:
+            if self.etat == OUVERT and time.monotonic() - self._date_ouverture >= self.duree_ouverture:
+                self.etat = SEMI_OUVERT
+                _journaliser(logging.INFO, "disjoncteur_semi_ouvert", service=self.service)
+            if self.etat == FERME:
+                return True
+            if self.etat == SEMI_OUVERT and not self._essai_en_cours:
+                self._essai_en_cours = True
+                return True
+            return False
+
+    def succes(self):
+        with self._verrou:
+            self._essai_en_cours = False
+            self.echecs_consecutifs = 0
+            if self.etat != FERME:
+                self.etat = FERME
+                _journaliser(logging.INFO, "disjoncteur_ferme", service=self.service)
+
+    def echec(self) -> bool:
+        """Enregistre un échec transitoire ; retourne True si le disjoncteur vient de s'ouvrir."""
+        with self._verrou:
+            self._essai_en_cours = False
+            self.echecs_consecutifs += 1
+            if self.etat == SEMI_OUVERT or (self.etat == FERME and self.echecs_consecutifs >= self.seuil):
+                self.etat = OUVERT
+                self._date_ouverture = time.monotonic()
+                _journaliser(logging.ERROR, "disjoncteur_ouvert", service=self.service,
+                             echecs_consecutifs=self.echecs_consecutifs, duree_s=self.duree_ouverture)
+                return True
+            return False
+
+
+class Transport:
+    """Appels vers un service (base, stockage) avec nouvelles tentatives et disjoncteur."""
+
+    def __init__(
+        self,
+        service: str,
+        nb_tentatives_lecture: int = NB_TENTATIVES_LECTURE,
+        attente_base: float = ATTENTE_BASE,
+        attente_max: float = ATTENTE_MAX,
+        budget: float = BUDGET_APPEL,
+        disjoncteur: Optional[Disjoncteur] = None
+    ):
+        self.service = service
+        self.nb_tentatives_lecture = max(1, nb_tentatives_lecture)
+        self.attente_base = attente_base
+        self.attente_max = attente_max
+        self.budget = budget
+        self.disjoncteur = disjoncteur if disjoncteur is not None else Disjoncteur(service)
+        self._hasard = random.Random()
+        self._verrou = threading.Lock()
+        self._compteurs: Dict[str, int] = {
+            'appels': 0,
+            'succes': 0,
+            'echecs': 0,
+            'echecs_transitoires': 0,
+            'delais_depasses': 0,
+            'nouvelles_tentatives': 0,
+            'rejets_disjoncteur': 0,
+            'ouvertures_disjoncteur': 0,
+        }
+
+    def _compter(self, *compteurs: str):
+        with self._verrou:
+            for compteur in compteurs:
+                self._compteurs[compteur] += 1
+
+    def attente(self, tentative: int) -> float:
+        """Attente avant la tentative suivante : tirage uniforme sous un plafond exponentiel."""
+        return self._hasard.uniform(0, min(self.attente_max, self.attente_base * (2 ** tentative)))
+
+    def appeler(self, nom: str, fonction: Callable[[], Any], idempotent: bool = False) -> Any:
+        """
+        Exécute `fonction()` (un appel réseau). Les appels idempotents sont
+        réessayés sur erreur transitoire ; l'erreur finale est relevée telle
+        quelle pour que les gestionnaires gardent leur traitement habituel.
+        """
+        debut = time.monotonic()
+        nb_tentatives = self.nb_tentatives_lecture if idempotent else 1
+        tentative = 0
+        while True:
+            if not self.disjoncteur.autoriser():
+                self._compter('rejets_disjoncteur')
+                chronometre.enregistrer(f"transport.{self.service}.rejet", 0.0, erreur=True)
+                _journaliser(logging.WARNING, "appel_rejete", service=self.service, appel=nom)
+                raise ServiceIndisponible(
+                    f"Service {self.service} momentanément indisponible "
+                    f"(nouvel essai dans {self.disjoncteur.duree_ouverture:.0f} s au plus)"
+                )
+
+            self._compter('appels')
+            try:
+                resultat = fonction()
+            except Exception as e:
+                if not est_transitoire(e):
+                    # Erreur applicative (4xx, contrainte...) : le service répond
+                    self.disjoncteur.succes()
+                    self._compter('echecs')
+                    raise
+                compteurs = ['echecs', 'echecs_transitoires']
+                if isinstance(e, httpx.TimeoutException):
+                    compteurs.append('delais_depasses')
+                vient_de_s_ouvrir = self.disjoncteur.echec()
+                if vient_de_s_ouvrir:
+                    compteurs.append('ouvertures_disjoncteur')
+                self._compter(*compteurs)
+
+                tentative += 1
+                attente = self.attente(tentative)
+                ecoule = time.monotonic() - debut
+                if tentative >= nb_tentatives or vient_de_s_ouvrir or ecoule + attente > self.budget:
+                    _journaliser(logging.ERROR, "appel_echoue", service=self.service, appel=nom,
+                                 tentatives=tentative, duree_ms=round(ecoule * 1000),
+                                 erreur=type(e).__name__, detail=str(e)[:200])
+                    raise
+                self._compter('nouvelles_tentatives')
+                _journaliser(logging.WARNING, "nouvelle_tentative", service=self.service, appel=nom,
+                             tentative=tentative + 1, attente_ms=round(attente * 1000),
+                             erreur=type(e).__name__)
+                time.sleep(attente)
+                continue
+
+            self.disjoncteur.succes()
+            self._compter('succes')
+            if tentative:
+                _journaliser(logging.INFO, "appel_retabli", service=self.service, appel=nom, tentatives=tentative + 1)
+            return resultat
+
+    def lire(self, nom: str, requete) -> Any:
+        """Exécute une requête PostgREST de lecture (select, fonction stable) : réessayée si besoin."""
+        return self.appeler(nom, requete.execute, idempotent=True)
+
+    def ecrire(self, nom: str, requete) -> Any:
+        """Exécute une requête PostgREST d'écriture : jamais rejouée."""
+        return self.appeler(nom, requete.execute, idempotent=False)
+
+    def statistiques(self) -> Dict[str, Any]:
+        with self._verrou:
+            compteurs = dict(self._compteurs)
+        return {
+            'service': self.service,
+            'disjoncteur': self.disjoncteur.etat,
+            'echecs_consecutifs': self.disjoncteur.echecs_consecutifs,
+            **compteurs,
+        }
+
+
+# Instances globales : une par service, chacune avec son disjoncteur
+transport_base = Transport("base")
+transport_stockage = Transport("stockage")